@@ -1,277 +1,51 @@
 import os
 import sys
 import json
+import time
 from pathlib import Path
-from dotenv import load_dotenv
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, Border, Side
-from openpyxl.utils import get_column_letter
-from collections import defaultdict
-from datetime import datetime
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton,
-                             QLabel, QProgressBar, QFileDialog, QMessageBox, QTextEdit,
-                             QHBoxLayout, QLineEdit, QComboBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+                             QLabel, QProgressBar, QFileDialog, QMessageBox,
+                             QHBoxLayout, QLineEdit, QComboBox, QCheckBox,
+                             QPlainTextEdit, QTreeWidget, QTreeWidgetItem)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QPalette, QColor
 
-
-class GoogleSheetsWorker(QThread):
-    """Поток для обработки данных из Google Sheets"""
-    progress = pyqtSignal(int)
-    message = pyqtSignal(str)
-    finished = pyqtSignal(object, object, object)
-    error = pyqtSignal(str)
-
-    def __init__(self, spreadsheet_url, credentials_file, sheet_name):
-        super().__init__()
-        self.spreadsheet_url = spreadsheet_url
-        self.credentials_file = credentials_file
-        self.sheet_name = sheet_name
-
-    def run(self):
-        try:
-            self.message.emit("Получение данных из Google Sheets...")
-            raw_data = self.get_google_sheets_data()
-            self.progress.emit(30)
-
-            self.message.emit("Обработка данных...")
-            address_data, camera_models, object_codes = self.process_camera_data(
-                raw_data)
-            self.progress.emit(70)
-
-            self.finished.emit(address_data, camera_models, object_codes)
-            self.progress.emit(100)
-            self.message.emit("Данные успешно обработаны!")
-        except Exception as e:
-            self.error.emit(f"Ошибка: {str(e)}")
-
-    def get_google_sheets_data(self):
-        """Получение данных из Google Sheets"""
-        scope = ["https://spreadsheets.google.com/feeds",
-                 "https://www.googleapis.com/auth/drive"]
-
-        if not os.path.exists(self.credentials_file):
-            raise FileNotFoundError(
-                f"Файл ключей {self.credentials_file} не найден!")
-
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            self.credentials_file, scope)
-        client = gspread.authorize(credentials)
-        spreadsheet = client.open_by_url(self.spreadsheet_url)
-        worksheet = spreadsheet.worksheet(self.sheet_name)
-
-        expected_headers = ["Код объекта", "Адрес установки", "Камера"]
-        return worksheet.get_all_records(expected_headers=expected_headers)
-
-    def process_camera_data(self, data):
-        """Обработка и группировка данных по адресам"""
-        if not data:
-            raise ValueError("В таблице нет данных!")
-
-        address_data = defaultdict(lambda: defaultdict(int))
-        all_models = set()
-        object_codes = {}
-
-        for row in data:
-            code = row.get("Код объекта", "").strip()
-            address = row.get("Адрес установки", "").strip()
-            model = row.get("Камера", "").strip()
-            if address and model:
-                address_data[address][model] += 1
-                all_models.add(model)
-                object_codes[address] = code
-
-        if not address_data:
-            raise ValueError("Нет данных для формирования отчета!")
-
-        return address_data, sorted(all_models), object_codes
-
-
-class ExcelReportGenerator(QThread):
-    """Поток для генерации Excel отчета"""
-    progress = pyqtSignal(int)
-    message = pyqtSignal(str)
-    finished = pyqtSignal(str)
-    error = pyqtSignal(str)
-
-    def __init__(self, address_data, camera_models, object_codes):
-        super().__init__()
-        self.address_data = address_data
-        self.camera_models = camera_models
-        self.object_codes = object_codes
-
-    def run(self):
-        try:
-            self.message.emit("Создание Excel отчета...")
-            report = self.create_excel_report()
-            self.progress.emit(50)
-
-            filename = self.save_report(report)
-            self.progress.emit(100)
-            self.finished.emit(filename)
-            self.message.emit("Отчет успешно создан!")
-        except Exception as e:
-            self.error.emit(f"Ошибка при создании отчета: {str(e)}")
-
-    def create_excel_report(self):
-        """Создание Excel файла с отчетом"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Лист1"
-
-        # Стили оформления
-        header_style = Font(bold=True)
-        horizontal_alignment = Alignment(
-            horizontal="center", vertical="center", wrap_text=True)
-        vertical_alignment = Alignment(
-            horizontal="center", vertical="center", wrap_text=True, text_rotation=90)
-        border_style = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        wrap_alignment = Alignment(wrap_text=True)
-
-        # Основной заголовок (A1:U1)
-        ws.merge_cells('A1:U1')
-        ws['A1'] = "Ведомость установленного и замонтированного оборудования по объекту:"
-        ws['A1'].font = header_style
-        ws['A1'].alignment = horizontal_alignment
-
-        # Название проекта (A2:U2)
-        ws.merge_cells('A2:U2')
-        ws['A2'] = "Реконструкция местных линий связи к объектам РСМОБ г. Бреста перекрестки, 8 этап"
-        ws['A2'].font = header_style
-        ws['A2'].alignment = horizontal_alignment
-
-        # Группы оборудования (строка 3)
-        ws.merge_cells('C3:M3')
-        ws['C3'] = "Видеокамеры"
-        ws['C3'].alignment = horizontal_alignment
-
-        ws.merge_cells('Q3:S3')
-        ws['Q3'] = "Коммутаторы"
-        ws['Q3'].alignment = horizontal_alignment
-
-        ws.merge_cells('T3:U3')
-        ws['T3'] = "Удлинитель"
-        ws['T3'].alignment = horizontal_alignment
-
-        # Заголовки столбцов (строка 4)
-        headers = [
-            "Код объекта",
-            "АДРЕС",
-            "(2 Мп) TIANDY TC-C32GS-I5EYCSD (2.8mm/V4.2)",
-            "(2МР) IPC2122LB-ADF28KM-G",
-            "DS-2CD1043G0-IUVSD 4mm",
-            "DS-2CD2123G2-IUVSD 4mm",
-            "DS-2CD2T23G2-2IUVSD",
-            "DS-2CD2T23G2-2IUVSD 4mm",
-            "DS-2CD3021G0-IUVSC 4mm",
-            "DS-2CD3123G2-IUUVSC 6mm",
-            "DS-2CD3626G2T-IZSUVSC (7-35mm)",
-            "DS-2CD3626G2T-IZSUVSC 7-35mm",
-            "DS-2CD3726G2T-IZSUVSC (7-35mm)",
-            "DS-2DE5425IW-AEUVSC",
-            "HIKVISION DS-2DE5425IW-A E (T5)",
-            "Uniview IPC2122LE-ADF28KMC-WL",
-            "Коммутатор ZTO L2S1900-4TP2S",
-            "Коммутатор ZTO L2S 1900-8TP2S",
-            "Коммутатор ZTO L2S 1900-16TP2S",
-            "Инжектор питания (PoE) OPL-POE-Ex802 3at-100-IP67",
-            "Удлинитель PoE ZTO POEEXT 100"
-        ]
-
-        # Заполняем строку 4 с разным выравниванием
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col, value=header)
-            cell.font = header_style
-            cell.border = border_style
-            cell.alignment = vertical_alignment if col >= 3 else horizontal_alignment
-
-        ws.row_dimensions[4].height = 150
-
-        # Заполнение данных
-        row_idx = 5
-        for address, counts in self.address_data.items():
-            ws.cell(row=row_idx, column=1,
-                    value=self.object_codes.get(address, ""))
-            ws.cell(row=row_idx, column=2, value=address)
-
-            for model, quantity in counts.items():
-                if model in headers:
-                    col_idx = headers.index(model) + 1
-                    ws.cell(row=row_idx, column=col_idx, value=quantity)
-
-            for col in range(17, 22):
-                ws.cell(row=row_idx, column=col, value="")
-
-            row_idx += 1
-
-        # Итоговая строка
-        total_row = row_idx
-        ws.cell(row=total_row, column=1, value="ИТОГО:")
-        ws.cell(row=total_row, column=2, value="")
-
-        for col in range(3, 22):
-            col_letter = get_column_letter(col)
-            ws.cell(row=total_row, column=col,
-                    value=f"=SUM({col_letter}5:{col_letter}{total_row-1})")
-
-        # Подпись
-        signature_row = total_row + 1
-        ws.merge_cells(f'A{signature_row}:U{signature_row}')
-        ws[f'A{signature_row}'] = "Подготовил: ведущий инженер ЛСС и АУ А.И. Козей"
-        ws[f'A{signature_row}'].alignment = horizontal_alignment
-
-        # Форматирование ячеек
-        for row in ws.iter_rows(min_row=1, max_row=signature_row, min_col=1, max_col=21):
-            for cell in row:
-                cell.alignment = wrap_alignment
-                cell.border = border_style
-
-        # Ширина столбцов
-        ws.column_dimensions['A'].width = 8
-        ws.column_dimensions['B'].width = 50
-        for col in range(3, 22):
-            ws.column_dimensions[get_column_letter(col)].width = 5
-
-        return wb
-
-    def save_report(self, report):
-        """Сохранение отчета в файл"""
-        output_dir = Path("output")
-        output_dir.mkdir(exist_ok=True)
-
-        first_code = next(iter(self.object_codes.values()),
-                          "") if self.object_codes else ""
-        id_number = first_code[1] if len(
-            first_code) > 1 and first_code[1].isdigit() else ""
-
-        filename = f"Ведомость-{id_number}.xlsx" if id_number else f"Ведомость-{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        filepath = output_dir / filename
-        report.save(filepath)
-        return str(filepath)
+# Движок формирования ведомостей общий с окном Tk и командной строкой
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from pipeline import (PipelineConfig, ReportService, ReportJobs, LogSink,  # noqa: E402
+                      preload_libraries)
 
 
 class MainWindow(QMainWindow):
     """Главное окно приложения"""
+    # Изменение задания очереди (испускается из рабочих потоков)
+    job_changed = pyqtSignal(object)
+
+    # Период вывода накопленных строк журнала, мс
+    LOG_FLUSH_MS = 100
+    # Сколько ждать остановки заданий при закрытии окна, с
+    SHUTDOWN_TIMEOUT = 10
 
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Генератор ведомостей оборудования")
         self.setMinimumSize(800, 600)
 
-        # Загрузка конфигурации
-        load_dotenv()
-        self.spreadsheet_url = os.getenv("GOOGLE_SHEETS_URL", "")
-        self.credentials_file = os.getenv(
-            "CREDENTIALS_JSON", "credentials.json")
-        self.sheet_name = os.getenv("SHEET_NAME", "Камеры")
+        # Загрузка конфигурации; по умолчанию - прежний вид ведомости окна Qt
+        self.settings = PipelineConfig.load(template="qt")
+        self.spreadsheet_url = self.settings.spreadsheet_url
+        self.credentials_file = self.settings.credentials_file
+        self.sheet_name = self.settings.sheet_name
         self.client_email = ""
+        # Журнал: в окне последние LOG_MAX_LINES строк, полностью - в файле
+        self.log_sink = LogSink(self.settings.log_file,
+                                max_lines=self.settings.log_max_lines)
+        # Очередь заданий: до JOB_CONCURRENCY отчетов одновременно
+        self.jobs = ReportJobs(ReportService(self.settings, self.log_message),
+                               self.log_message, self.on_job_changed)
+        self.job_changed.connect(self.show_job)
+        self.job_items = {}
 
         self.init_ui()
         self.load_credentials_info()
@@ -341,22 +115,84 @@ class MainWindow(QMainWindow):
         email_layout.addWidget(copy_button)
         settings_layout.addLayout(email_layout)
 
+        # Цели пакетного запуска: "URL;Имя листа" или "URL;*" на строку
+        batch_layout = QHBoxLayout()
+        batch_label = QLabel("Пакет (URL;лист):")
+        self.batch_edit = QPlainTextEdit()
+        self.batch_edit.setMaximumHeight(80)
+        batch_layout.addWidget(batch_label)
+        batch_layout.addWidget(self.batch_edit)
+        settings_layout.addLayout(batch_layout)
+
         layout.addLayout(settings_layout)
 
+        # Задания очереди
+        self.jobs_tree = QTreeWidget()
+        self.jobs_tree.setHeaderLabels(["№", "Лист", "Приоритет", "Состояние", "%"])
+        self.jobs_tree.setRootIsDecorated(False)
+        self.jobs_tree.setSelectionMode(QTreeWidget.ExtendedSelection)
+        self.jobs_tree.setMaximumHeight(140)
+        for column, width in enumerate((40, 160, 80, 360)):
+            self.jobs_tree.setColumnWidth(column, width)
+        layout.addWidget(self.jobs_tree)
+
+        jobs_layout = QHBoxLayout()
+        cancel_btn = QPushButton("Отменить выбранные")
+        cancel_btn.clicked.connect(self.cancel_selected_jobs)
+        clear_btn = QPushButton("Очистить завершенные")
+        clear_btn.clicked.connect(self.clear_finished_jobs)
+        jobs_layout.addWidget(cancel_btn)
+        jobs_layout.addWidget(clear_btn)
+        jobs_layout.addStretch()
+        layout.addLayout(jobs_layout)
+
         # Лог сообщений
-        self.log = QTextEdit()
+        self.log = QPlainTextEdit()
         self.log.setReadOnly(True)
+        self.log.setMaximumBlockCount(self.log_sink.max_lines)
         layout.addWidget(self.log)
+        # Строки журнала выводятся пачкой по таймеру
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(self.LOG_FLUSH_MS)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start()
 
         # Прогресс бар
         self.progress = QProgressBar()
         layout.addWidget(self.progress)
 
+        # Потоковая запись для больших ведомостей
+        self.streaming_check = QCheckBox("Потоковая запись (большие ведомости)")
+        layout.addWidget(self.streaming_check)
+
+        # Загрузка данных в обход локального кэша
+        self.force_refresh_check = QCheckBox("Принудительно обновить данные (без кэша)")
+        layout.addWidget(self.force_refresh_check)
+
+        # Профилирование этапов для диагностики медленных отчетов
+        self.profile_check = QCheckBox("Профилирование (cProfile и tracemalloc)")
+        self.profile_check.setChecked(self.settings.profile)
+        layout.addWidget(self.profile_check)
+
         # Кнопка запуска
         self.run_btn = QPushButton("Создать ведомость")
         self.run_btn.clicked.connect(self.run_report_generation)
         layout.addWidget(self.run_btn)
 
+        self.batch_btn = QPushButton("Пакетный запуск")
+        self.batch_btn.clicked.connect(self.run_batch_generation)
+        layout.addWidget(self.batch_btn)
+
+        # Приоритет новых заданий
+        priority_layout = QHBoxLayout()
+        priority_layout.addWidget(QLabel("Приоритет:"))
+        self.priority_combo = QComboBox()
+        self.priority_combo.addItems(list(ReportJobs.PRIORITIES))
+        self.priority_combo.setCurrentText("Обычный")
+        priority_layout.addWidget(self.priority_combo)
+        priority_layout.addStretch()
+        layout.addLayout(priority_layout)
+
         # Статус
         self.status_label = QLabel()
         layout.addWidget(self.status_label)
@@ -425,84 +261,120 @@ class MainWindow(QMainWindow):
 
     def log_message(self, message):
         """Добавление сообщения в лог"""
-        self.log.append(message)
-        self.log.ensureCursorVisible()
+        self.log_sink.write(message)
+
+    def flush_log(self):
+        """Вывод накопленных строк журнала одной вставкой"""
+        lines = self.log_sink.drain()
+        if lines:
+            self.log.appendPlainText("\n".join(lines))
+            self.log.ensureCursorVisible()
+
+    def on_job_changed(self, job):
+        """Изменение задания очереди (из любого потока)"""
+        self.job_changed.emit(job)
+
+    def show_job(self, job):
+        """Строка задания в списке; итог завершенного задания - один раз"""
+        item = self.job_items.get(job.job_id)
+        if item is None:
+            item = QTreeWidgetItem(self.jobs_tree)
+            item.setData(0, Qt.UserRole, job.job_id)
+            self.job_items[job.job_id] = item
+        for column, value in enumerate(self.jobs.row(job)):
+            item.setText(column, value)
+        self.show_queue_progress()
+
+        outcome = self.jobs.finish(job)
+        if outcome is not None:
+            self.show_outcome(outcome)
+
+    def show_queue_progress(self):
+        """Общий прогресс: среднее по выполняющимся и ожидающим заданиям"""
+        progress = self.jobs.progress()
+        if progress is not None:
+            percent, status = progress
+            self.progress.setValue(int(percent))
+            self.status_label.setText(status)
+
+    def closeEvent(self, event):
+        """Закрытие окна: задания отменяются, временные файлы удаляются"""
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.jobs.shutdown(self.SHUTDOWN_TIMEOUT)
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.flush_log()
+        self.log_sink.close()
+        super().closeEvent(event)
 
     def run_report_generation(self):
-        """Запуск процесса генерации отчета"""
-        if not all([self.spreadsheet_url, self.credentials_file]):
-            self.log_message("Ошибка: Не заданы все необходимые параметры!")
+        """Постановка ведомости по текущему листу в очередь"""
+        self.jobs.submit_single(self.spreadsheet_url, self.sheet_name, self.credentials_file,
+                                self.priority_combo.currentText(),
+                                streaming=self.streaming_check.isChecked(),
+                                force_refresh=self.force_refresh_check.isChecked(),
+                                profile=self.profile_check.isChecked())
+
+    def run_batch_generation(self):
+        """Постановка пакетного формирования ведомостей в очередь"""
+        self.jobs.submit_batch(self.batch_edit.toPlainText(), self.spreadsheet_url,
+                               self.sheet_name, self.credentials_file,
+                               self.priority_combo.currentText(),
+                               streaming=self.streaming_check.isChecked(),
+                               force_refresh=self.force_refresh_check.isChecked())
+
+    def show_outcome(self, outcome):
+        """Итог задания; когда очередь опустела - сводка за серию заданий"""
+        if outcome.status:
+            self.status_label.setText(outcome.status)
+        if outcome.error:
+            # Показать сообщение об ошибке
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Critical)
+            msg.setText("Произошла ошибка!")
+            msg.setInformativeText(outcome.error)
+            msg.setWindowTitle("Ошибка")
+            msg.exec_()
+        if outcome.summary is None:
             return
-
-        self.log_message("Начало обработки данных...")
-        self.progress.setValue(0)
-        self.run_btn.setEnabled(False)
-
-        # Создаем и запускаем worker для получения данных
-        self.sheets_worker = GoogleSheetsWorker(
-            self.spreadsheet_url,
-            self.credentials_file,
-            self.sheet_name
-        )
-
-        # Подключаем сигналы
-        self.sheets_worker.progress.connect(self.progress.setValue)
-        self.sheets_worker.message.connect(self.log_message)
-        self.sheets_worker.finished.connect(self.on_data_processed)
-        self.sheets_worker.error.connect(self.on_error)
-
-        self.sheets_worker.start()
-
-    def on_data_processed(self, address_data, camera_models, object_codes):
-        """Обработка завершения получения данных"""
-        self.log_message(f"Обработано {len(address_data)} адресов")
-        self.log_message(f"Найдено {len(camera_models)} моделей камер")
-
-        # Создаем и запускаем worker для генерации отчета
-        self.report_worker = ExcelReportGenerator(
-            address_data,
-            camera_models,
-            object_codes
-        )
-
-        # Подключаем сигналы
-        self.report_worker.progress.connect(self.progress.setValue)
-        self.report_worker.message.connect(self.log_message)
-        self.report_worker.finished.connect(self.on_report_generated)
-        self.report_worker.error.connect(self.on_error)
-
-        self.report_worker.start()
-
-    def on_report_generated(self, filename):
-        """Обработка завершения генерации отчета"""
-        self.run_btn.setEnabled(True)
-        self.status_label.setText(f"Отчет сохранен: {filename}")
-
-        # Показать сообщение об успехе
-        msg = QMessageBox()
-        msg.setIcon(QMessageBox.Information)
-        msg.setText("Отчет успешно создан!")
-        msg.setInformativeText(f"Файл сохранен как: {filename}")
-        msg.setWindowTitle("Успех")
-        msg.exec_()
-
-    def on_error(self, error_message):
-        """Обработка ошибок"""
-        self.log_message(error_message)
-        self.run_btn.setEnabled(True)
-        self.progress.setValue(0)
-
-        # Показать сообщение об ошибке
-        msg = QMessageBox()
-        msg.setIcon(QMessageBox.Critical)
-        msg.setText("Произошла ошибка!")
-        msg.setInformativeText(error_message)
-        msg.setWindowTitle("Ошибка")
-        msg.exec_()
+        done, failed = outcome.summary
+        self.progress.setValue(100 if done else 0)
+        if done:
+            # Показать сообщение об успехе
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Warning if failed else QMessageBox.Information)
+            msg.setText("Очередь заданий выполнена")
+            msg.setInformativeText(outcome.summary_text())
+            msg.setWindowTitle("Успех")
+            msg.exec_()
+
+    def cancel_selected_jobs(self):
+        """Отмена выбранных в списке заданий"""
+        for item in self.jobs_tree.selectedItems():
+            self.jobs.cancel(item.data(0, Qt.UserRole))
+
+    def clear_finished_jobs(self):
+        """Удаление завершенных заданий из списка"""
+        for job_id in self.jobs.clear_finished():
+            item = self.job_items.pop(job_id, None)
+            if item is not None:
+                self.jobs_tree.takeTopLevelItem(self.jobs_tree.indexOfTopLevelItem(item))
+
+
+def write_startup_probe(app, window, probe_file):
+    """Метка времени первой отрисовки окна для benchmarks/bench_startup.py"""
+    app.processEvents()
+    with open(probe_file, "w", encoding="utf-8") as f:
+        f.write(repr(time.time()))
+    window.close()
 
 
 def main():
     """Точка входа в приложение"""
+    # Пул процессов пакетного режима в собранном exe
+    multiprocessing.freeze_support()
+
     # Для корректного отображения в Windows
     if sys.platform == "win32":
         import ctypes
@@ -518,6 +390,11 @@ def main():
 
     window = MainWindow()
     window.show()
+    # Сначала окно, затем в фоне - gspread и openpyxl
+    QTimer.singleShot(0, preload_libraries)
+    probe_file = os.getenv("STARTUP_PROBE_FILE")
+    if probe_file:
+        QTimer.singleShot(0, lambda: write_startup_probe(app, window, probe_file))
 
     sys.exit(app.exec_())
 
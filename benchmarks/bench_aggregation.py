@@ -0,0 +1,112 @@
+"""Сравнение агрегации process_camera_data: цикл Python против pandas.
+
+    python benchmarks/bench_aggregation.py [10000 100000 1000000]
+
+Для каждого размера таблицы выводится время цикла Python по записям
+get_all_records и время pandas для двух форм входа: те же записи и уже
+разобранные столбцы. Отношение python/pandas больше 1 означает выигрыш;
+размер, с которого это выполняется, - порог для режима "auto"
+(GoogleSheetsWorker.VECTORIZE_MIN_ROWS).
+
+На записях get_all_records pandas обгоняет цикл примерно с 300 тыс.
+строк: основное время уходит на разбор самих словарей. На готовых
+столбцах выигрыш больше.
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pipeline import GoogleSheetsWorker, ExcelReportGenerator  # noqa: E402
+
+
+CITIES = ("Брест", "Минск", "Гродно", "Пинск", "Кобрин", "Барановичи")
+STREETS = ("Советская", "Московская", "Ленина", "Гоголя", "Пушкинская", "Кирова",
+           "Набережная", "Мицкевича", "Строителей", "Центральная", "Юбилейная")
+PADDING = (" ", "  ", "\t", " \t", "\u00a0")
+
+
+def make_records(rows, addresses=None, seed=0, models=14, duplicates=0.0, noise=0.1):
+    """Синтетический реестр камер в формате get_all_records
+
+    addresses - разных адресов (по умолчанию строк / 20), у каждого свой
+    код объекта; models - разных моделей: сначала из каталога ведомости,
+    сверх него - модели вне каталога. Модели встречаются неравномерно
+    (частота ~ 1/номер), как в настоящем реестре. duplicates - доля
+    строк-повторов предыдущей строки, noise - доля значений с пробелами
+    и табуляцией по краям. Камера пуста в 2% строк - такие строки
+    в ведомость не попадают.
+    """
+    rnd = random.Random(seed)
+    addresses = addresses or max(rows // 20, 1)
+    catalogue = ExcelReportGenerator.HEADERS[2:16]
+    names = catalogue[:models] + [f"Камера вне каталога {i}"
+                                  for i in range(1, models - len(catalogue) + 1)]
+    weights = [1 / rank for rank in range(1, len(names) + 1)]
+
+    def noisy(value):
+        if rnd.random() >= noise:
+            return value
+        # Неразрывный пробел - из скопированных ячеек, strip() убирает и его
+        return rnd.choice(PADDING) + value + rnd.choice(("",) + PADDING)
+
+    records = []
+    while len(records) < rows:
+        if records and rnd.random() < duplicates:
+            records.append(dict(records[-1]))
+            continue
+        i = rnd.randrange(addresses)
+        city = CITIES[i % len(CITIES)]
+        street = STREETS[i // len(CITIES) % len(STREETS)]
+        house = i // (len(CITIES) * len(STREETS)) + 1
+        model = rnd.choices(names, weights)[0] if rnd.random() >= 0.02 else ""
+        records.append({
+            "Код объекта": noisy(f"O{i % 9 + 1}-{i:06d}"),
+            "Адрес установки": noisy(f"г. {city}, ул. {street}, д. {house}"),
+            "Камера": noisy(model) if model else "",
+        })
+    return records
+
+
+def best_of(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 30000, 100000, 300000, 1000000]
+    worker = GoogleSheetsWorker("", "", "", None)
+
+    # Первый импорт pandas не должен попадать в замер
+    worker.process_camera_data_vectorized(make_records(10))
+
+    print(f"{'строк':>10} {'python, с':>10} {'pandas, с':>10} {'x':>6} "
+          f"{'столбцы, с':>11} {'x':>6}")
+    for rows in sizes:
+        records = make_records(rows)
+        columns = {name: [record[name] for record in records]
+                   for name in records[0]}
+
+        python_time, expected = best_of(lambda: worker.process_camera_data(records))
+        pandas_time, actual = best_of(
+            lambda: worker.process_camera_data_vectorized(records))
+        assert actual == expected, "результаты агрегации не совпадают"
+        columns_time, actual = best_of(
+            lambda: worker.process_camera_data_vectorized(columns))
+        assert actual == expected, "результаты агрегации не совпадают"
+
+        print(f"{rows:>10} {python_time:>10.3f} {pandas_time:>10.3f} "
+              f"{python_time / pandas_time:>6.2f} {columns_time:>11.3f} "
+              f"{python_time / columns_time:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
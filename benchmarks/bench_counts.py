@@ -0,0 +1,111 @@
+"""Память и pickle результата агрегации: CameraCounts против словарей.
+
+    python benchmarks/bench_counts.py [100000 1000000]
+
+Для каждого размера листа (записи как в bench_aggregation) результат
+process_camera_data - CameraCounts - сравнивается с прежним видом:
+defaultdict адресов со словарями моделей и отдельный словарь кодов
+объектов (legacy_aggregate повторяет прежний цикл). Выводятся время
+агрегации, память результата после агрегации и пик во время нее
+(tracemalloc, отдельным прогоном), размер pickle и время передачи
+в другой процесс (dumps + loads). Прежний вид перед pickle переводится в обычные словари,
+как это делал пакетный режим: defaultdict с lambda не сериализуется.
+Если результаты различаются, скрипт завершается с кодом 1.
+"""
+import gc
+import pickle
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pipeline import GoogleSheetsWorker  # noqa: E402
+from bench_aggregation import make_records  # noqa: E402
+
+
+def legacy_aggregate(records):
+    """Прежний результат process_camera_data: словари по адресам"""
+    address_data = defaultdict(lambda: defaultdict(int))
+    all_models = set()
+    object_codes = {}
+    for row in records:
+        code = row.get("Код объекта", "").strip()
+        address = row.get("Адрес установки", "").strip()
+        model = row.get("Камера", "").strip()
+        if address and model:
+            address_data[address][model] += 1
+            all_models.add(model)
+            object_codes[address] = code
+    return address_data, sorted(all_models), object_codes
+
+
+def legacy_payload(result):
+    address_data, camera_models, object_codes = result
+    return ({address: dict(counts) for address, counts in address_data.items()},
+            camera_models, object_codes)
+
+
+def measure(func):
+    """Время вызова, затем память результата и пик памяти во время вызова, МБ
+
+    Под tracemalloc вызов идет заметно дольше, поэтому время замеряется
+    отдельным прогоном без него.
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current / 2 ** 20, peak / 2 ** 20
+
+
+def transfer(payload):
+    """Размер pickle, МБ, и время dumps + loads"""
+    start = time.perf_counter()
+    data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.loads(data)
+    return len(data) / 2 ** 20, time.perf_counter() - start
+
+
+def normalized(result):
+    address_data, camera_models, object_codes = result
+    return ([(address, list(counts.items())) for address, counts in address_data.items()],
+            list(camera_models), list(object_codes.items()))
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    worker = GoogleSheetsWorker("", "", "", None)
+    mismatches = []
+
+    print(f"{'строк':>9} {'вид':>13} {'агрегация, с':>13} {'память, МБ':>11} "
+          f"{'пик, МБ':>8} {'pickle, МБ':>11} {'передача, с':>12}")
+    for rows in sizes:
+        records = make_records(rows)
+        results = {}
+        for name, aggregate, payload in (
+                ("словари", legacy_aggregate, legacy_payload),
+                ("CameraCounts", worker.process_camera_data, lambda result: result)):
+            result, elapsed, memory, peak = measure(lambda: aggregate(records))
+            size, seconds = transfer(payload(result))
+            results[name] = normalized(result)
+            print(f"{rows:>9} {name:>13} {elapsed:>13.2f} {memory:>11.1f} "
+                  f"{peak:>8.1f} {size:>11.2f} {seconds:>12.3f}")
+            del result
+        if results["словари"] != results["CameraCounts"]:
+            mismatches.append(rows)
+
+    for rows in mismatches:
+        print(f"расхождение результатов: {rows} строк")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Весь конвейер без сети: локальный файл и подмена Google Sheets API.
+
+    python benchmarks/bench_sources.py [1000000] [--latency 0.05] [--page-rows 5000]
+    python benchmarks/bench_sources.py --serve data.xlsx [--port 8765] [--latency 0.2]
+
+Синтетический лист (записи как в bench_aggregation) сохраняется в CSV,
+и ведомость строится целиком - загрузка, агрегация process_camera_data,
+ExcelReportGenerator - из двух источников: FileSource (тот же CSV)
+и HttpSheetsSource через SheetsStandIn с задержкой каждого ответа
+и выдачей не больше --page-rows строк диапазона за запрос. Каждый прогон
+идет в отдельном процессе, а подмена - в этом, поэтому ее память
+не попадает в RSS прогона. Выводятся время этапов, пиковый RSS и число
+запросов к подмене; результат агрегации сверяется с process_camera_data
+по исходным записям, при расхождении скрипт завершается с кодом 1.
+
+С --profile этапы профилируются (cProfile и tracemalloc, профили -
+в папке profiles). --serve поднимает подмену по файлу CSV/XLSX/JSON
+до Ctrl+C: ее URL можно указать в окне при SHEETS_SOURCE=http или
+в src/cli.py --source http.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pipeline import (FileSource, GoogleSheetsWorker, PipelineMetrics, SheetsStandIn,  # noqa: E402
+                      load_report_data, make_source, render_report)
+from bench_aggregation import make_records  # noqa: E402
+
+SHEET = "Камеры"
+STAGES = ("open_by_url", "fetch", "aggregate", "build", "save")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", nargs="?", type=int, default=1000000,
+                        help="строк в синтетическом листе")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="задержка каждого ответа подмены, с")
+    parser.add_argument("--page-rows", type=int, default=5000,
+                        help="не больше строк диапазона в одном ответе подмены")
+    parser.add_argument("--fetch-mode", choices=["columns", "records"], default="columns")
+    parser.add_argument("--aggregation", choices=["python", "pandas", "auto"],
+                        default="python")
+    parser.add_argument("--writer", choices=["openpyxl", "xlsxwriter"], default="openpyxl")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--serve", metavar="PATH",
+                        help="только поднять подмену по файлу CSV/XLSX/JSON")
+    parser.add_argument("--port", type=int, default=0,
+                        help="порт подмены для --serve (0 - свободный)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def digest(data):
+    """Отпечаток результата агрегации: порядок адресов важен, моделей в адресе - нет"""
+    address_data, camera_models, object_codes = data
+    normalized = ([(address, sorted(counts.items())) for address, counts in address_data.items()],
+                  list(camera_models), list(object_codes.items()))
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def run_case(case):
+    """Один прогон конвейера; итог - строка JSON с замерами"""
+    metrics = PipelineMetrics(profile=case["profile"])
+    data, context = load_report_data(case["url"], "", SHEET, metrics=metrics,
+                                     source=make_source(case["source"]),
+                                     fetch_mode=case["fetch_mode"],
+                                     aggregation=case["aggregation"])
+    render_report(*data, streaming=case["streaming"], output_dir=case["output_dir"],
+                  metrics=metrics, writer=case["writer"])
+    record = metrics.finish(source=case["source"], **context)
+    record["digest"] = digest(data)
+    print(json.dumps(record, ensure_ascii=False))
+
+
+def run_script(case):
+    """Прогон в отдельном процессе, результат - JSON последней строки"""
+    out = subprocess.run([sys.executable, __file__, "--case", json.dumps(case)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def write_sheet(path, records):
+    """Лист в CSV: лишний первый столбец, как в рабочей таблице"""
+    columns = GoogleSheetsWorker.COLUMNS
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["№"] + columns)
+        for number, record in enumerate(records, 1):
+            writer.writerow([number] + [record[name] for name in columns])
+
+
+def serve(args):
+    sheets = FileSource().load(args.serve)
+    standin = SheetsStandIn(sheets, latency=args.latency, page_rows=args.page_rows,
+                            port=args.port).start()
+    print(f"Подмена Google Sheets: {standin.url}", flush=True)
+    print(f"Листы: {', '.join(sheets)}. Остановка - Ctrl+C", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.stop()
+
+
+def main():
+    args = parse_args()
+    if args.case:
+        run_case(json.loads(args.case))
+        return
+    if args.serve:
+        serve(args)
+        return
+
+    records = make_records(args.rows, seed=1)
+    expected = digest(GoogleSheetsWorker("", "", "", None).process_camera_data(records))
+    mismatches = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{SHEET}.csv")
+        write_sheet(path, records)
+        del records
+        with SheetsStandIn(FileSource().load(path), latency=args.latency,
+                           page_rows=args.page_rows) as standin:
+            print(f"{'источник':>8} " + " ".join(f"{stage:>11}" for stage in STAGES)
+                  + f" {'всего, с':>9} {'RSS, МБ':>8} {'запросов':>9} {'совпадает':>10}")
+            for source, url in (("file", path), ("http", standin.url)):
+                requests = standin.requests
+                result = run_script({
+                    "source": source, "url": url, "output_dir": os.path.join(tmp, source),
+                    "fetch_mode": args.fetch_mode, "aggregation": args.aggregation,
+                    "writer": args.writer, "streaming": args.streaming,
+                    "profile": args.profile})
+                stages = result["stages"]
+                rss = max((entry["rss_mb"] or 0 for entry in stages.values()), default=0)
+                ok = result["digest"] == expected
+                if not ok:
+                    mismatches.append(source)
+                print(f"{source:>8} "
+                      + " ".join(f"{stages.get(stage, {}).get('wall', 0):>11.2f}"
+                                 for stage in STAGES)
+                      + f" {result['total_seconds']:>9.2f} {rss:>8.0f} "
+                      f"{standin.requests - requests:>9} {'да' if ok else 'нет':>10}")
+
+    for source in mismatches:
+        print(f"расхождение агрегации: {source}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Время холодного старта GUI: от запуска процесса до первой отрисовки окна.
+
+    python benchmarks/bench_startup.py [--repeat 5] [имя=путь_к_exe ...]
+
+Приложение запускается с переменной STARTUP_PROBE_FILE: после первой
+отрисовки окна оно записывает в файл метку времени и закрывается.
+Для каждого варианта выводятся минимум и медиана по нескольким запускам.
+
+Варианты из исходников:
+    qt, tk           - как есть (gspread и openpyxl догружаются в фоне);
+    qt-eager         - те же библиотеки импортируются до окна, как раньше.
+
+Собранные exe передаются аргументами, например onefile против onedir:
+    pyinstaller --distpath dist/onefile build.spec
+    BUILD_ONEDIR=1 pyinstaller --distpath dist/onedir build.spec
+    python benchmarks/bench_startup.py \\
+        onefile=dist/onefile/EquipmentReportGenerator \\
+        onedir=dist/onedir/EquipmentReportGenerator/EquipmentReportGenerator
+
+Вариант, который не запустился (например, tk без дисплея), пропускается.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+EAGER_IMPORTS = ("import gspread, openpyxl, oauth2client.service_account, runpy; "
+                 "runpy.run_path({path!r}, run_name='__main__')")
+
+
+def source_targets():
+    qt = str(ROOT / "app_qt_ui_1.py")
+    return {
+        "qt": [sys.executable, qt],
+        "qt-eager": [sys.executable, "-c", EAGER_IMPORTS.format(path=qt)],
+        "tk": [sys.executable, str(ROOT / "src" / "main.py")],
+    }
+
+
+def run_once(command, workdir):
+    """Время до первой отрисовки и до выхода, с"""
+    probe_file = os.path.join(workdir, "startup.probe")
+    if os.path.exists(probe_file):
+        os.remove(probe_file)
+    env = dict(os.environ, STARTUP_PROBE_FILE=probe_file)
+
+    # Папки output и logs создаются во временном каталоге, а не в репозитории
+    start = time.time()
+    subprocess.run(command, cwd=workdir, env=env, check=True, timeout=120,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    exited = time.time()
+    with open(probe_file, "r", encoding="utf-8") as f:
+        painted = float(f.read())
+    return painted - start, exited - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("exe", nargs="*", help="имя=путь к собранному exe")
+    args = parser.parse_args()
+
+    targets = source_targets()
+    for item in args.exe:
+        name, _, path = item.partition("=")
+        targets[name] = [os.path.abspath(path)]
+
+    print(f"{'вариант':>10} {'окно min, с':>12} {'окно med, с':>12} {'выход med, с':>13}")
+    for name, command in targets.items():
+        paints, exits = [], []
+        with tempfile.TemporaryDirectory() as workdir:
+            try:
+                # Первый запуск прогревает файловый кэш и .pyc
+                run_once(command, workdir)
+                for _ in range(args.repeat):
+                    painted, exited = run_once(command, workdir)
+                    paints.append(painted)
+                    exits.append(exited)
+            except (OSError, subprocess.SubprocessError) as e:
+                reason = getattr(e, "stderr", None) or str(e)
+                if isinstance(reason, bytes):
+                    reason = reason.decode(errors="replace")
+                lines = reason.strip().splitlines() or [type(e).__name__]
+                print(f"{name:>10} пропущен: {lines[-1]}")
+                continue
+        print(f"{name:>10} {min(paints):>12.3f} {statistics.median(paints):>12.3f} "
+              f"{statistics.median(exits):>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
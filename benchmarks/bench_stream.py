@@ -0,0 +1,129 @@
+"""Пиковая память потоковой ведомости против обычной на растущих листах.
+
+    python benchmarks/bench_stream.py [100000 1000000] [--stream-by address]
+                                      [--writer openpyxl] [--page-rows 5000]
+
+Для каждого размера синтетический лист (записи как в bench_aggregation)
+упорядочивается по адресу или коду объекта и отдается подменой Google
+Sheets API (SheetsStandIn) в этом процессе - FileSource держал бы весь
+файл в памяти прогона. Ведомость строится в отдельном процессе двумя
+способами: обычным (load_report_data и render_report с потоковой записью
+книги - лист и итоги по адресам собираются в памяти) и stream_report
+(лист читается постранично дважды, законченные группы адресов сразу
+уходят в запись). Выводятся время, пиковый RSS процесса и число запросов
+к подмене. У обычного способа пик растет вместе с листом и итогами по
+адресам, у потокового - только на хэши адресов законченных групп.
+
+Значения ячеек обеих книг (чтение read_only) и итоги .summary.json
+сравниваются; при расхождении скрипт завершается с кодом 1.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pipeline import (FileSource, SheetsStandIn, ReportSummary, load_report_data,  # noqa: E402
+                      make_source, peak_rss_mb, render_report, stream_report)
+from bench_aggregation import make_records  # noqa: E402
+from bench_sources import write_sheet  # noqa: E402
+
+SHEET = "Камеры"
+ORDER = {"address": "Адрес установки", "code": "Код объекта"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[100000, 1000000],
+                        help="строк в синтетическом листе")
+    parser.add_argument("--stream-by", choices=sorted(ORDER), default="address")
+    parser.add_argument("--writer", choices=["openpyxl", "xlsxwriter"], default="openpyxl")
+    parser.add_argument("--page-rows", type=int, default=5000,
+                        help="не больше строк диапазона в одном ответе подмены")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_case(case):
+    """Одна ведомость в этом процессе; итог - строка JSON"""
+    started = time.perf_counter()
+    source = make_source("http")
+    if case["mode"] == "stream":
+        filename, _ = stream_report(case["url"], "", SHEET, group_by=case["stream_by"],
+                                    output_dir=case["output_dir"], writer=case["writer"],
+                                    source=source)
+    else:
+        data, _ = load_report_data(case["url"], "", SHEET, source=source)
+        filename = render_report(*data, streaming=True, output_dir=case["output_dir"],
+                                 writer=case["writer"])
+    print(json.dumps({"file": filename, "seconds": time.perf_counter() - started,
+                      "rss_mb": peak_rss_mb()}, ensure_ascii=False))
+
+
+def run_script(case):
+    """Прогон в отдельном процессе, результат - JSON последней строки"""
+    out = subprocess.run([sys.executable, __file__, "--case", json.dumps(case)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def digest(path):
+    """Отпечаток значений ячеек книги и итогов рядом с ней"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    sha = hashlib.sha1()
+    for row in wb.active.iter_rows(values_only=True):
+        sha.update(repr(row).encode("utf-8"))
+    wb.close()
+    summary = json.loads(Path(path).with_suffix(ReportSummary.SUFFIX).read_text(encoding="utf-8"))
+    summary.pop("file")
+    sha.update(json.dumps(summary, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return sha.hexdigest()
+
+
+def main():
+    args = parse_args()
+    if args.case:
+        run_case(json.loads(args.case))
+        return
+
+    mismatches = []
+    print(f"{'строк':>9} {'способ':>10} {'время, с':>9} {'RSS, МБ':>8} "
+          f"{'запросов':>9} {'совпадает':>10}")
+    for rows in args.sizes:
+        records = make_records(rows, seed=1)
+        records.sort(key=lambda record: record[ORDER[args.stream_by]].strip())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"{SHEET}.csv")
+            write_sheet(path, records)
+            del records
+            with SheetsStandIn(FileSource().load(path), page_rows=args.page_rows) as standin:
+                digests = {}
+                for mode in ("single", "stream"):
+                    requests = standin.requests
+                    result = run_script({
+                        "mode": mode, "url": standin.url, "stream_by": args.stream_by,
+                        "writer": args.writer, "output_dir": os.path.join(tmp, mode)})
+                    digests[mode] = digest(result["file"])
+                    ok = digests[mode] == digests["single"]
+                    if not ok:
+                        mismatches.append(rows)
+                    print(f"{rows:>9} {mode:>10} {result['seconds']:>9.2f} "
+                          f"{result['rss_mb'] or 0:>8.0f} {standin.requests - requests:>9} "
+                          f"{'да' if ok else 'нет':>10}")
+
+    for rows in mismatches:
+        print(f"расхождение ведомостей: {rows} строк")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Сравнение обычной и потоковой (write-only) генерации ведомости.
+
+Каждый замер выполняется в отдельном процессе, чтобы пиковый RSS
+не накапливался между прогонами.
+
+    python benchmarks/bench_streaming.py [1000 10000 100000]
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pipeline import peak_rss_mb  # noqa: E402
+
+
+def make_address_data(addresses, models):
+    """Синтетические данные в формате process_camera_data"""
+    rnd = random.Random(addresses)
+    address_data = {}
+    object_codes = {}
+    for i in range(addresses):
+        address = f"г. Брест, ул. Тестовая, д. {i}"
+        address_data[address] = {
+            model: rnd.randint(1, 4) for model in rnd.sample(models, 3)}
+        object_codes[address] = f"O{i % 9 + 1}-{i}"
+    return address_data, object_codes
+
+
+def run_case(mode, addresses):
+    from pipeline import ExcelReportGenerator
+
+    models = ExcelReportGenerator.HEADERS[2:16]
+    address_data, object_codes = make_address_data(addresses, models)
+    generator = ExcelReportGenerator(
+        address_data, models, object_codes, None, streaming=mode == "streaming")
+
+    start = time.perf_counter()
+    if generator.streaming:
+        report = generator.create_streaming_report()
+    else:
+        report = generator.create_excel_report()
+    with tempfile.TemporaryDirectory() as tmp:
+        report.save(os.path.join(tmp, "report.xlsx"))
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({"mode": mode, "addresses": addresses,
+                      "seconds": round(elapsed, 3),
+                      "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--case":
+        run_case(sys.argv[2], int(sys.argv[3]))
+        return
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'адресов':>10} {'режим':>10} {'время, с':>10} {'RSS, МБ':>10}")
+    for addresses in sizes:
+        for mode in ("classic", "streaming"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--case", mode, str(addresses)],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            rss = result["peak_rss_mb"]
+            print(f"{addresses:>10} {mode:>10} {result['seconds']:>10.3f} "
+                  f"{rss if rss is None else round(rss, 1):>10}")
+
+
+if __name__ == "__main__":
+    main()
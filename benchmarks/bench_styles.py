@@ -0,0 +1,183 @@
+"""Оформление ячеек: объекты стилей на каждую ячейку против реестра стилей.
+
+    python benchmarks/bench_styles.py [50000]
+
+Режим per-cell повторяет прежнюю сборку ведомости: выравнивание
+назначается каждой ячейке отдельно, затем второй проход по всему листу
+назначает границы. Режимы registry и streaming - ExcelReportGenerator
+с реестром именованных стилей (ReportStyles): стиль ячейки выбирается
+в том же проходе, в котором пишется значение.
+
+Для каждого режима выводятся время сборки и сохранения, размер файла
+и число записей в таблицах стилей книги (cellXfs, шрифты, границы,
+выравнивания). Каждый замер - в отдельном процессе. Если реестр
+оказался медленнее, записей в таблицах стилей больше или файл больше
+сверх описаний именованных стилей (NAMED_STYLES_BYTES), скрипт
+завершается с кодом 1.
+
+openpyxl и раньше не дублировал одинаковые стили в таблицах книги,
+поэтому основной выигрыш реестра - время сборки: на 50 тыс. адресов
+сборка в 3-5 раз быстрее прежней.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from bench_streaming import make_address_data  # noqa: E402
+
+MODES = ("per-cell", "registry", "streaming")
+
+# Описания трех именованных стилей в styles.xml (около 100 байт сжатыми)
+NAMED_STYLES_BYTES = 1024
+
+
+def per_cell_report(generator):
+    """Прежняя сборка: стили назначаются каждой ячейке, границы - вторым проходом"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Font, Border, Side
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook()
+    ws = wb.active
+    header_style = Font(bold=True)
+    center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    vertical_alignment = Alignment(
+        textRotation=90, horizontal="center", vertical="center", wrap_text=True)
+    border_style = Border(left=Side(style='thin'), right=Side(style='thin'),
+                          top=Side(style='thin'), bottom=Side(style='thin'))
+
+    headers, model_columns = generator.column_layout()
+    last_col = len(headers)
+    last_letter = get_column_letter(last_col)
+    switch_col = last_col - 4
+    for row in range(1, 4):
+        for col in range(1, last_col + 1):
+            ws.cell(row=row, column=col).alignment = center_alignment
+    ws.merge_cells(f'A1:{last_letter}1')
+    ws['A1'] = "Ведомость установленного и замонтированного оборудования по объекту:"
+    ws['A1'].font = header_style
+    ws.merge_cells(f'A2:{last_letter}2')
+    ws['A2'] = "Реконструкция местных линий связи к объектам РСМОБ г. Бреста перекрестки, 8 этап"
+    ws['A2'].font = header_style
+    for first, last, title in ((3, 13, "Видеокамеры"), (switch_col, switch_col + 2, "Коммутаторы"),
+                               (switch_col + 3, last_col, "Удлинитель")):
+        ws.merge_cells(start_row=3, start_column=first, end_row=3, end_column=last)
+        cell = ws.cell(row=3, column=first, value=title)
+        cell.font = Font(bold=True)
+        cell.alignment = center_alignment
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=4, column=col, value=header)
+        cell.font = header_style
+        cell.alignment = vertical_alignment if col >= 3 else center_alignment
+    ws.row_dimensions[4].height = 150
+
+    row_idx = 5
+    for address, counts in generator.address_data.items():
+        ws.cell(row=row_idx, column=1, value=generator.object_codes.get(
+            address, "")).alignment = center_alignment
+        ws.cell(row=row_idx, column=2, value=address).alignment = Alignment(wrap_text=True)
+        for model, quantity in counts.items():
+            col_idx = model_columns.get(model)
+            if col_idx is not None:
+                ws.cell(row=row_idx, column=col_idx,
+                        value=quantity).alignment = center_alignment
+        for col in range(switch_col, last_col + 1):
+            ws.cell(row=row_idx, column=col, value="").alignment = center_alignment
+        row_idx += 1
+
+    ws.cell(row=row_idx, column=1, value="ИТОГО:").alignment = center_alignment
+    for col in range(3, last_col + 1):
+        letter = get_column_letter(col)
+        ws.cell(row=row_idx, column=col,
+                value=f"=SUM({letter}5:{letter}{row_idx - 1})").alignment = center_alignment
+
+    ws.cell(row=row_idx, column=2, value="").alignment = center_alignment
+    signature_row = row_idx + 1
+    ws.merge_cells(f'A{signature_row}:{last_letter}{signature_row}')
+    ws[f'A{signature_row}'] = "Подготовил: ведущий инженер ЛСС и АУ А.И. Козей"
+    ws[f'A{signature_row}'].alignment = center_alignment
+
+    for row in ws.iter_rows():
+        for cell in row:
+            cell.border = border_style
+
+    ws.column_dimensions['A'].width = 8
+    ws.column_dimensions['B'].width = 50
+    for col in range(3, last_col + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 8
+    return wb
+
+
+def run_case(mode, addresses):
+    from pipeline import ExcelReportGenerator
+
+    models = ExcelReportGenerator.HEADERS[2:16]
+    address_data, object_codes = make_address_data(addresses, models)
+    generator = ExcelReportGenerator(
+        address_data, models, object_codes, None, streaming=mode == "streaming")
+    # Встроенный шаблон разбирается один раз на процесс - не в замере
+    generator.default_template()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.xlsx")
+        start = time.perf_counter()
+        if mode == "per-cell":
+            report = per_cell_report(generator)
+        elif generator.streaming:
+            report = generator.create_streaming_report()
+        else:
+            report = generator.create_excel_report()
+        built = time.perf_counter()
+        report.save(path)
+        saved = time.perf_counter()
+        size = os.path.getsize(path)
+
+    print(json.dumps({
+        "mode": mode, "addresses": addresses,
+        "build": round(built - start, 3), "save": round(saved - built, 3),
+        "bytes": size, "cell_xfs": len(report._cell_styles),
+        "fonts": len(report._fonts), "borders": len(report._borders),
+        "alignments": len(report._alignments),
+    }))
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--case":
+        run_case(sys.argv[2], int(sys.argv[3]))
+        return
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50000]
+    regressions = []
+    print(f"{'адресов':>8} {'режим':>10} {'сборка, с':>10} {'запись, с':>10} "
+          f"{'размер, КБ':>11} {'cellXfs':>8} {'шрифты':>7} {'границы':>8} {'выравн.':>8}")
+    for addresses in sizes:
+        results = {}
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, __file__, "--case", mode, str(addresses)],
+                check=True, capture_output=True, text=True).stdout
+            result = results[mode] = json.loads(out.strip().splitlines()[-1])
+            print(f"{addresses:>8} {mode:>10} {result['build']:>10.3f} {result['save']:>10.3f} "
+                  f"{result['bytes'] / 1024:>11.1f} {result['cell_xfs']:>8} "
+                  f"{result['fonts']:>7} {result['borders']:>8} {result['alignments']:>8}")
+
+        old, new = results["per-cell"], results["registry"]
+        allowed = {"bytes": NAMED_STYLES_BYTES}
+        for key in ("build", "bytes", "cell_xfs", "fonts", "borders", "alignments"):
+            if new[key] > old[key] + allowed.get(key, 0):
+                regressions.append(f"{addresses}: {key} {old[key]} -> {new[key]}")
+
+    for line in regressions:
+        print(f"регрессия {line}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Набор замеров конвейера на синтетических реестрах камер.
+
+    python benchmarks/bench_suite.py [--size small|medium|large] [--output bench_suite.json]
+    python benchmarks/bench_suite.py --baseline old.json [--threshold 0.25]
+
+Реестр (bench_aggregation.make_records) задается числом строк и адресов,
+числом разных моделей (сверх каталога ведомости - модели вне каталога,
+то есть лишние столбцы), долей строк-повторов и долей значений с лишними
+пробелами и табуляцией. Каждый случай из CASES сохраняется в CSV и
+проходит весь конвейер через FileSource: загрузка, агрегация
+process_camera_data, сборка и сохранение книги. FileSource разбирает
+файл при чтении строк, поэтому разбор входит в этап fetch, а open_by_url -
+только поиск файла. Каждый прогон - в отдельном процессе,
+случай повторяется --repeat раз, время этапа - лучшее из повторов.
+
+Для каждого случая в JSON-файл пишутся время и процессорное время
+этапов, пиковый RSS и размер файла ведомости, а также коммит, версия
+Python и платформа. С --baseline результаты сравниваются с файлом
+прежнего прогона (например, с другого коммита): если время этапа
+выросло больше чем на --threshold (и больше чем на --min-seconds),
+а RSS или размер файла - больше чем на --memory-threshold, скрипт
+выводит регрессии и завершается с кодом 1. Сравниваются только случаи
+с теми же параметрами.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pipeline import ExcelReportGenerator  # noqa: E402
+from bench_aggregation import make_records  # noqa: E402
+from bench_sources import write_sheet  # noqa: E402
+
+SIZES = {"small": 20000, "medium": 200000, "large": 1000000}
+STAGES = ("open_by_url", "fetch", "aggregate", "build", "save")
+
+# Параметры реестра по умолчанию и случаи: отличия от них
+REGISTER = {"addresses_per_row": 1 / 20, "models": 14, "duplicates": 0.02, "noise": 0.1}
+PIPELINE = {"aggregation": "python", "writer": "openpyxl", "streaming": False,
+            "totals": "values"}
+CASES = (
+    ("base", {}),
+    ("many-models", {"models": 40}),
+    ("dense", {"addresses_per_row": 1 / 200}),
+    ("noisy", {"duplicates": 0.1, "noise": 0.5}),
+    ("pandas", {"aggregation": "pandas"}),
+    ("streaming", {"streaming": True}),
+    ("xlsxwriter", {"writer": "xlsxwriter"}),
+    ("formulas", {"totals": "formulas"}),
+)
+
+def case_params(name, rows):
+    """Полные параметры случая: реестр и настройки конвейера"""
+    params = dict(REGISTER, **PIPELINE)
+    params.update(dict(CASES)[name])
+    params["rows"] = rows
+    params["addresses"] = max(int(rows * params.pop("addresses_per_row")), 1)
+    return params
+
+
+def register_key(params):
+    return tuple(params[key] for key in ("rows", "addresses", "models", "duplicates", "noise"))
+
+
+def run_case(case):
+    """Один прогон конвейера в этом процессе; итог - строка JSON"""
+    from pipeline import FileSource, PipelineMetrics, load_report_data, render_report
+    from pipeline.metrics import peak_rss_mb
+
+    # Импорт библиотек и разбор встроенного шаблона - один раз на процесс,
+    # в замеры этапов не входят
+    ExcelReportGenerator.default_template()
+    if case["writer"] == "xlsxwriter":
+        importlib.import_module("xlsxwriter")
+    if case["aggregation"] != "python":
+        importlib.import_module("pandas")
+
+    metrics = PipelineMetrics()
+    data, context = load_report_data(case["path"], "", "Реестр", metrics=metrics,
+                                     source=FileSource(), aggregation=case["aggregation"])
+    filename = render_report(*data, streaming=case["streaming"],
+                             output_dir=case["output_dir"], metrics=metrics,
+                             writer=case["writer"], totals=case["totals"])
+    print(json.dumps({"stages": metrics.stages, "peak_rss_mb": peak_rss_mb(),
+                      "bytes": os.path.getsize(filename), **context}, ensure_ascii=False))
+
+
+def run_script(case):
+    """Прогон в отдельном процессе, результат - JSON последней строки"""
+    out = subprocess.run([sys.executable, __file__, "--case", json.dumps(case)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def best_of(runs):
+    """Итог повторов: лучшее время этапов, наибольший RSS"""
+    stages = {}
+    for name in runs[0]["stages"]:
+        best = min(runs, key=lambda run: run["stages"][name]["wall"])["stages"][name]
+        stages[name] = {"wall": round(best["wall"], 4), "cpu": round(best["cpu"], 4)}
+    totals = [sum(entry["wall"] for entry in run["stages"].values()) for run in runs]
+    rss = [run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None]
+    return {"stages": stages, "total": round(min(totals), 4),
+            "peak_rss_mb": round(max(rss), 1) if rss else None,
+            "bytes": runs[-1]["bytes"],
+            "output": {key: runs[-1][key] for key in ("rows", "addresses", "models")}}
+
+
+def git_revision():
+    """Коммит рабочей копии и наличие незафиксированных изменений"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                check=True, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(dirty.strip())
+
+
+def metric_values(result):
+    """Сравниваемые показатели случая: (имя, вид, значение)"""
+    for name, entry in result["stages"].items():
+        yield name, "time", entry["wall"]
+    yield "total", "time", result["total"]
+    yield "peak_rss_mb", "memory", result["peak_rss_mb"]
+    yield "bytes", "memory", result["bytes"]
+
+
+def compare(baseline, results, threshold, memory_threshold, min_seconds):
+    """Регрессии относительно прежних результатов и таблица сравнения"""
+    regressions = []
+    print(f"\nсравнение с {baseline.get('commit') or 'прежним прогоном'} "
+          f"({baseline.get('created', '')})")
+    print(f"{'случай':>12} {'показатель':>12} {'было':>12} {'стало':>12} {'изм., %':>8}")
+    for name, result in results["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old is None or old["params"] != result["params"]:
+            print(f"{name:>12} {'-':>12} нет в прежних результатах или другие параметры")
+            continue
+        old_values = {metric: value for metric, _, value in metric_values(old)}
+        for metric, kind, value in metric_values(result):
+            before = old_values.get(metric)
+            if not before or value is None:
+                continue
+            change = (value - before) / before
+            limit = threshold if kind == "time" else memory_threshold
+            regressed = change > limit and (kind != "time" or value - before > min_seconds)
+            if regressed:
+                regressions.append(f"{name} {metric}: {before} -> {value} ({change:+.0%})")
+            print(f"{name:>12} {metric:>12} {before:>12} {value:>12} {change * 100:>+8.1f}"
+                  + ("  регрессия" if regressed else ""))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="small",
+                        help="строк в реестре: small 20 тыс., medium 200 тыс., large 1 млн")
+    parser.add_argument("--rows", type=int, help="строк в реестре вместо --size")
+    parser.add_argument("--only", action="append", choices=[name for name, _ in CASES],
+                        help="только этот случай (можно указать несколько раз)")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов каждого случая")
+    parser.add_argument("--output", default="bench_suite.json",
+                        help="файл результатов JSON")
+    parser.add_argument("--baseline", help="результаты прежнего прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимый рост времени этапа (0.25 - на 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.10,
+                        help="допустимый рост пикового RSS и размера файла")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="меньший рост времени регрессией не считается")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.case:
+        run_case(json.loads(args.case))
+        return
+
+    rows = args.rows or SIZES[args.size]
+    names = args.only or [name for name, _ in CASES]
+    commit, dirty = git_revision()
+    results = {"created": datetime.now().isoformat(timespec="seconds"),
+               "commit": commit, "dirty": dirty,
+               "python": platform.python_version(), "platform": platform.platform(),
+               "cpus": os.cpu_count(), "repeat": args.repeat, "cases": {}}
+
+    print(f"{'случай':>12} " + " ".join(f"{stage:>11}" for stage in STAGES)
+          + f" {'всего, с':>9} {'RSS, МБ':>8} {'размер, КБ':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        sheets = {}
+        for name in names:
+            params = case_params(name, rows)
+            key = register_key(params)
+            if key not in sheets:
+                sheets[key] = os.path.join(tmp, f"Реестр-{len(sheets)}.csv")
+                write_sheet(sheets[key], make_records(
+                    params["rows"], params["addresses"], models=params["models"],
+                    duplicates=params["duplicates"], noise=params["noise"]))
+
+            case = {"path": sheets[key], "output_dir": os.path.join(tmp, name),
+                    **{key: params[key] for key in PIPELINE}}
+            result = best_of([run_script(case) for _ in range(args.repeat)])
+            results["cases"][name] = {"params": params, **result}
+
+            stages = result["stages"]
+            print(f"{name:>12} "
+                  + " ".join(f"{stages.get(stage, {}).get('wall', 0):>11.2f}"
+                             for stage in STAGES)
+                  + f" {result['total']:>9.2f} {result['peak_rss_mb'] or 0:>8.0f} "
+                  f"{result['bytes'] / 1024:>11.1f}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold,
+                              args.memory_threshold, args.min_seconds)
+        for line in regressions:
+            print(f"регрессия {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Способы записи ведомости: openpyxl против xlsxwriter.
+
+    python benchmarks/bench_writers.py [50000]
+
+Ведомость собирается всеми способами записи (openpyxl обычный
+и потоковый, xlsxwriter обычный и constant_memory), каждый замер -
+в отдельном процессе. Выводятся время сборки и сохранения, пиковый RSS
+и размер файла.
+
+Совпадение книг всех способов записи с книгой openpyxl проверяет
+tests/test_writers.py.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from pipeline import peak_rss_mb  # noqa: E402
+from bench_streaming import make_address_data  # noqa: E402
+
+# (имя, способ записи, потоковый режим)
+MODES = (
+    ("openpyxl", "openpyxl", False),
+    ("openpyxl-stream", "openpyxl", True),
+    ("xlsxwriter", "xlsxwriter", False),
+    ("xlsxwriter-stream", "xlsxwriter", True),
+)
+EXTRA_MODEL = "Камера вне каталога"
+
+
+def run_case(mode, addresses, path):
+    from pipeline import ExcelReportGenerator
+
+    writer, streaming = next((writer, streaming) for name, writer, streaming in MODES
+                             if name == mode)
+    models = ExcelReportGenerator.HEADERS[2:16] + [EXTRA_MODEL]
+    address_data, object_codes = make_address_data(addresses, models)
+    generator = ExcelReportGenerator(address_data, models, object_codes, None,
+                                     streaming=streaming, writer=writer)
+    # Встроенный шаблон разбирается один раз на процесс - не в замере
+    generator.default_template()
+
+    start = time.perf_counter()
+    report = generator.create_report()
+    built = time.perf_counter()
+    report.save(path)
+    saved = time.perf_counter()
+
+    print(json.dumps({"mode": mode, "addresses": addresses,
+                      "build": round(built - start, 3), "save": round(saved - built, 3),
+                      "peak_rss_mb": peak_rss_mb(), "bytes": os.path.getsize(path)}))
+
+
+def run_script(*args):
+    """Запуск этого скрипта в отдельном процессе, результат - JSON последней строки"""
+    out = subprocess.run([sys.executable, __file__, *args],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == "--case":
+        run_case(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+        return
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [50000]
+    print(f"{'адресов':>8} {'способ':>18} {'сборка, с':>10} {'запись, с':>10} "
+          f"{'RSS, МБ':>8} {'размер, КБ':>11}")
+    for addresses in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode, _, _ in MODES:
+                path = os.path.join(tmp, f"{mode}.xlsx")
+                result = run_script("--case", mode, str(addresses), path)
+                rss = result["peak_rss_mb"]
+                print(f"{addresses:>8} {mode:>18} {result['build']:>10.3f} "
+                      f"{result['save']:>10.3f} {rss if rss is None else round(rss, 1):>8} "
+                      f"{result['bytes'] / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 # build.spec
+#   pyinstaller build.spec                 - один exe (onefile)
+#   BUILD_ONEDIR=1 pyinstaller build.spec  - папка с exe (onedir)
+# onefile при каждом запуске распаковывает все библиотеки во временную
+# папку, onedir запускается сразу - сравнение: benchmarks/bench_startup.py
+import os
+
 block_cipher = None
+onedir = os.getenv("BUILD_ONEDIR", "0") == "1"
 
 a = Analysis(
     ['app_qt_ui_1.py'],  # Замените на имя вашего главного файла
-    pathex=[],
+    pathex=['src'],  # пакет pipeline - общий движок с окном Tk
     binaries=[],
     datas=[
         ('credentials.json', '.'),  # Включите необходимые файлы
@@ -24,10 +31,9 @@ pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
+    *([] if onedir else [a.binaries, a.zipfiles, a.datas]),
     [],
+    exclude_binaries=onedir,
     name='EquipmentReportGenerator',  # Имя вашего приложения
     debug=False,
     bootloader_ignore_signals=False,
@@ -42,4 +48,16 @@ exe = EXE(
     target_arch=None,
     codesign_identity=None,
     entitlements_file=None,
-)
\ No newline at end of file
+)
+
+if onedir:
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        name='EquipmentReportGenerator',
+    )
@@ -0,0 +1,151 @@
+import sys
+import json
+import time
+import argparse
+from pipeline import (PipelineConfig, ReportService, ExcelReportGenerator, AddressGroups,
+                      SOURCES, parse_batch_targets)
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки (значения по умолчанию - из .env)"""
+    config = PipelineConfig.load()
+    parser = argparse.ArgumentParser(
+        description="Формирование ведомостей оборудования без графического интерфейса")
+    parser.add_argument("--url", default=config.spreadsheet_url,
+                        help="URL таблицы Google Sheets")
+    parser.add_argument("--sheet", default=config.sheet_name,
+                        help="имя листа")
+    parser.add_argument("--credentials", default=config.credentials_file,
+                        help="файл ключей сервисного аккаунта")
+    parser.add_argument("--source", choices=SOURCES,
+                        default=config.source,
+                        help="откуда читать листы: Google Sheets, локальный файл "
+                             "(--url - путь к CSV/XLSX/JSON) или HTTP-подмена API "
+                             "(--url - адрес таблицы на ней, см. benchmarks/bench_sources.py)")
+    parser.add_argument("--output-dir", default=config.output_dir,
+                        help="папка для готовых ведомостей")
+    parser.add_argument("--target", action="append", default=[],
+                        help='цель пакетного запуска "URL;лист" ("URL;*" - все листы), '
+                             'можно указать несколько раз')
+    parser.add_argument("--targets-file",
+                        help="файл с целями пакетного запуска, по одной на строку")
+    parser.add_argument("--template", default=config.template,
+                        help="шаблон оформления ведомости (.xlsx) или имя встроенного: "
+                             + ", ".join(ExcelReportGenerator.BUILTIN_TEMPLATES))
+    parser.add_argument("--write-template", metavar="PATH",
+                        help="сохранить встроенный шаблон (--template qt - вид окна Qt) "
+                             "в файл для правки и выйти")
+    parser.add_argument("--writer", choices=sorted(ExcelReportGenerator.WRITERS),
+                        default=config.writer,
+                        help="способ записи книги (xlsxwriter быстрее на больших ведомостях)")
+    parser.add_argument("--totals", choices=ExcelReportGenerator.TOTALS_MODES,
+                        default=config.totals,
+                        help="итоговая строка: готовые числа или формулы SUM "
+                             "(значения формул сохраняет только --writer xlsxwriter)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="потоковая запись (большие ведомости)")
+    parser.add_argument("--stream-by", choices=AddressGroups.GROUP_BY,
+                        default=config.stream_by,
+                        help="потоковая ведомость по листу, упорядоченному по адресу "
+                             "или коду объекта: лист читается постранично дважды "
+                             "и не собирается в памяти (только один лист, без кэша)")
+    parser.add_argument("--force-refresh", action="store_true",
+                        help="загрузить данные в обход локального кэша")
+    parser.add_argument("--fetch-workers", type=int,
+                        default=config.fetch_workers,
+                        help="число одновременных загрузок в пакетном режиме")
+    parser.add_argument("--aggregation", choices=["python", "pandas", "auto"],
+                        default=config.aggregation,
+                        help="способ агрегации строк (auto - pandas для больших таблиц)")
+    parser.add_argument("--fetch-mode", choices=["columns", "records"],
+                        default=config.fetch_mode,
+                        help="загрузка только нужных столбцов или всего листа")
+    parser.add_argument("--incremental", action="store_true",
+                        default=config.incremental,
+                        help="пересчитывать только измененные блоки строк листа")
+    parser.add_argument("--metrics-file",
+                        default=config.metrics_file or "",
+                        help="файл JSON Lines для замеров этапов (пустая строка - не писать)")
+    parser.add_argument("--profile", action="store_true",
+                        default=config.profile,
+                        help="профилировать этапы (cProfile и tracemalloc)")
+    return parser.parse_args(argv)
+
+
+def emit(record):
+    """Вывод одной записи с замерами в формате JSON Lines"""
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def make_config(args):
+    """Настройки движка с учетом аргументов командной строки"""
+    return PipelineConfig.load(
+        spreadsheet_url=args.url, sheet_name=args.sheet, credentials_file=args.credentials,
+        source=args.source, output_dir=args.output_dir, template=args.template,
+        writer=args.writer, totals=args.totals, stream_by=args.stream_by,
+        fetch_workers=args.fetch_workers, aggregation=args.aggregation,
+        fetch_mode=args.fetch_mode, incremental=args.incremental,
+        metrics_file=args.metrics_file or None, profile=args.profile)
+
+
+def run_batch(args, service, targets):
+    """Пакетный запуск по нескольким листам"""
+    started = time.perf_counter()
+    filenames, failed = service.run_batch(targets, args.credentials, streaming=args.streaming,
+                                          force_refresh=args.force_refresh)
+    emit({
+        "mode": "batch",
+        "targets": len(filenames) + len(failed),
+        "files": filenames,
+        "failed": [{"url": url, "sheet": sheet} for url, sheet in failed],
+        "total_seconds": round(time.perf_counter() - started, 4),
+    })
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """Точка входа командной строки"""
+    args = parse_args(argv)
+
+    if args.write_template:
+        builtin = args.template if args.template in ExcelReportGenerator.BUILTIN_TEMPLATES \
+            else "default"
+        ExcelReportGenerator.write_template(args.write_template, builtin)
+        log(f"Шаблон сохранен: {args.write_template}")
+        return 0
+
+    targets = list(args.target)
+    if args.targets_file:
+        with open(args.targets_file, "r", encoding="utf-8") as f:
+            targets.append(f.read())
+    targets = parse_batch_targets("\n".join(targets), args.url, args.sheet)
+
+    config = make_config(args)
+    if config.missing_credentials(args.credentials) or not (args.url or targets):
+        log("Ошибка: Не заданы все необходимые параметры!")
+        return 2
+    if targets and args.stream_by:
+        log("Ошибка: потоковая ведомость строится только по одному листу")
+        return 2
+
+    service = ReportService(config, log)
+    try:
+        if targets:
+            return run_batch(args, service, targets)
+        # Один лист: загрузка -> обработка -> отчет, с замером каждого этапа
+        _, record = service.run_single(args.url, args.sheet, args.credentials,
+                                       streaming=args.streaming,
+                                       force_refresh=args.force_refresh)
+        emit(record)
+        return 0
+    except Exception as e:
+        log(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
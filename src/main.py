@@ -1,277 +1,66 @@
 import os
 import sys
 import json
+import time
+import queue
 from pathlib import Path
-from dotenv import load_dotenv
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, Border, Side
-from openpyxl.utils import get_column_letter
-from collections import defaultdict
-from datetime import datetime
-import threading
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 from tkinter.font import Font as TkFont
-
-
-class GoogleSheetsWorker:
-    """Класс для обработки данных из Google Sheets"""
-
-    def __init__(self, spreadsheet_url, credentials_file, sheet_name, callback):
-        self.spreadsheet_url = spreadsheet_url
-        self.credentials_file = credentials_file
-        self.sheet_name = sheet_name
-        self.callback = callback
-
-    def run(self):
-        try:
-            raw_data = self.get_google_sheets_data()
-            address_data, camera_models, object_codes = self.process_camera_data(
-                raw_data)
-            self.callback(address_data, camera_models, object_codes, None)
-        except Exception as e:
-            self.callback(None, None, None, str(e))
-
-    def get_google_sheets_data(self):
-        """Получение данных из Google Sheets"""
-        scope = ["https://spreadsheets.google.com/feeds",
-                 "https://www.googleapis.com/auth/drive"]
-
-        if not os.path.exists(self.credentials_file):
-            raise FileNotFoundError(
-                f"Файл ключей {self.credentials_file} не найден!")
-
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            self.credentials_file, scope)
-        client = gspread.authorize(credentials)
-        spreadsheet = client.open_by_url(self.spreadsheet_url)
-        worksheet = spreadsheet.worksheet(self.sheet_name)
-
-        expected_headers = ["Код объекта", "Адрес установки", "Камера"]
-        return worksheet.get_all_records(expected_headers=expected_headers)
-
-    def process_camera_data(self, data):
-        """Обработка и группировка данных по адресам"""
-        if not data:
-            raise ValueError("В таблице нет данных!")
-
-        address_data = defaultdict(lambda: defaultdict(int))
-        all_models = set()
-        object_codes = {}
-
-        for row in data:
-            code = row.get("Код объекта", "").strip()
-            address = row.get("Адрес установки", "").strip()
-            model = row.get("Камера", "").strip()
-            if address and model:
-                address_data[address][model] += 1
-                all_models.add(model)
-                object_codes[address] = code
-
-        if not address_data:
-            raise ValueError("Нет данных для формирования отчета!")
-
-        return address_data, sorted(all_models), object_codes
-
-
-class ExcelReportGenerator:
-    """Класс для генерации Excel отчета"""
-
-    def __init__(self, address_data, camera_models, object_codes, callback):
-        self.address_data = address_data
-        self.camera_models = camera_models
-        self.object_codes = object_codes
-        self.callback = callback
-
-    def run(self):
-        try:
-            report = self.create_excel_report()
-            filename = self.save_report(report)
-            self.callback(filename, None)
-        except Exception as e:
-            self.callback(None, str(e))
-
-    def create_excel_report(self):
-        """Создание Excel файла с отчетом"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Лист1"
-
-        # Стили оформления
-        header_style = Font(bold=True)
-        center_alignment = Alignment(
-            horizontal="center", vertical="center", wrap_text=True)
-        vertical_alignment = Alignment(
-            textRotation=90, horizontal="center", vertical="center", wrap_text=True)
-        border_style = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        # Выравнивание по центру для строк 1-3
-        for row in range(1, 4):
-            for col in range(1, 22):  # Предполагаем 21 столбец (A-X)
-                ws.cell(row=row, column=col).alignment = center_alignment
-
-        # Основной заголовок (A1:U1)
-        ws.merge_cells('A1:U1')
-        ws['A1'] = "Ведомость установленного и замонтированного оборудования по объекту:"
-        ws['A1'].font = header_style
-
-        # Название проекта (A2:U2)
-        ws.merge_cells('A2:U2')
-        ws['A2'] = "Реконструкция местных линий связи к объектам РСМОБ г. Бреста перекрестки, 8 этап"
-        ws['A2'].font = header_style
-
-        # Группы оборудования (строка 3)
-        ws.merge_cells('C3:M3')
-        c3 = ws['C3']
-        c3.value = "Видеокамеры"
-        c3.font = Font(bold=True)
-        c3.alignment = center_alignment
-
-        ws.merge_cells('Q3:S3')
-        q3 = ws['Q3']
-        q3.value = "Коммутаторы"
-        q3.font = Font(bold=True)
-        q3.alignment = center_alignment
-
-        ws.merge_cells('T3:U3')
-        t3 = ws['T3']
-        t3.value = "Удлинитель"
-        t3.font = Font(bold=True)
-        t3.alignment = center_alignment
-
-        # Заголовки столбцов (строка 4)
-        headers = [
-            "Код объекта",
-            "АДРЕС",
-            "(2 Мп) TIANDY TC-C32GS-I5EYCSD (2.8mm/V4.2)",
-            "(2МР) IPC2122LB-ADF28KM-G",
-            "DS-2CD1043G0-IUVSD 4mm",
-            "DS-2CD2123G2-IUVSD 4mm",
-            "DS-2CD2T23G2-2IUVSD",
-            "DS-2CD2T23G2-2IUVSD 4mm",
-            "DS-2CD3021G0-IUVSC 4mm",
-            "DS-2CD3123G2-IUUVSC 6mm",
-            "DS-2CD3626G2T-IZSUVSC (7-35mm)",
-            "DS-2CD3626G2T-IZSUVSC 7-35mm",
-            "DS-2CD3726G2T-IZSUVSC (7-35mm)",
-            "DS-2DE5425IW-AEUVSC",
-            "HIKVISION DS-2DE5425IW-A E (T5)",
-            "Uniview IPC2122LE-ADF28KMC-WL",
-            "Коммутатор ZTO L2S1900-4TP2S",
-            "Коммутатор ZTO L2S 1900-8TP2S",
-            "Коммутатор ZTO L2S 1900-16TP2S",
-            "Инжектор питания (PoE) OPL-POE-Ex802 3at-100-IP67",
-            "Удлинитель PoE ZTO POEEXT 100"
-        ]
-
-        # Заполняем строку 4 с разным выравниванием
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col, value=header)
-            cell.font = header_style
-            cell.border = border_style
-            cell.alignment = vertical_alignment if col >= 3 else center_alignment
-
-        ws.row_dimensions[4].height = 150
-
-        # Заполнение данных
-        row_idx = 5
-        for address, counts in self.address_data.items():
-            # Код объекта и адрес
-            ws.cell(row=row_idx, column=1, value=self.object_codes.get(
-                address, "")).alignment = center_alignment
-            ws.cell(row=row_idx, column=2, value=address).alignment = Alignment(
-                wrap_text=True)
-
-            # Видеокамеры
-            for model, quantity in counts.items():
-                if model in headers:
-                    col_idx = headers.index(model) + 1
-                    ws.cell(row=row_idx, column=col_idx,
-                            value=quantity).alignment = center_alignment
-
-            # Коммутаторы и удлинители оставляем пустыми
-            for col in range(17, 22):
-                ws.cell(row=row_idx, column=col,
-                        value="").alignment = center_alignment
-
-            row_idx += 1
-
-        # Итоговая строка
-        total_row = row_idx
-        ws.cell(row=total_row, column=1,
-                value="ИТОГО:").alignment = center_alignment
-        ws.cell(row=total_row, column=2, value="").alignment = center_alignment
-
-        # Формулы суммирования
-        for col in range(3, 22):
-            col_letter = get_column_letter(col)
-            ws.cell(row=total_row, column=col,
-                    value=f"=SUM({col_letter}5:{col_letter}{total_row-1})").alignment = center_alignment
-
-        # Подпись
-        signature_row = total_row + 1
-        ws.merge_cells(f'A{signature_row}:U{signature_row}')
-        ws[f'A{signature_row}'] = "Подготовил: ведущий инженер ЛСС и АУ А.И. Козей"
-        ws[f'A{signature_row}'].alignment = center_alignment
-
-        # Форматирование границ для всех ячеек
-        for row in ws.iter_rows():
-            for cell in row:
-                cell.border = border_style
-
-        # Ширина столбцов
-        ws.column_dimensions['A'].width = 8
-        ws.column_dimensions['B'].width = 50
-        for col in range(3, 22):
-            ws.column_dimensions[get_column_letter(col)].width = 8
-
-        return wb
-
-    def save_report(self, report):
-        """Сохранение отчета в файл"""
-        output_dir = Path("output")
-        output_dir.mkdir(exist_ok=True)
-
-        first_code = next(iter(self.object_codes.values()),
-                          "") if self.object_codes else ""
-        id_number = first_code[1] if len(
-            first_code) > 1 and first_code[1].isdigit() else ""
-
-        filename = f"Ведомость-{id_number}.xlsx" if id_number else f"Ведомость-{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        filepath = output_dir / filename
-        report.save(filepath)
-        return str(filepath)
+from pipeline import PipelineConfig, ReportService, ReportJobs, LogSink, preload_libraries
 
 
 class MainWindow(tk.Tk):
     """Главное окно приложения"""
 
+    # Период разбора очереди сообщений от рабочих потоков, мс
+    UI_PUMP_MS = 50
+    # Не больше стольких сообщений за один проход, остальные - в следующий
+    UI_PUMP_BATCH = 500
+    # Сколько ждать остановки заданий при закрытии окна, с
+    SHUTDOWN_TIMEOUT = 10
+
     def __init__(self):
         super().__init__()
         self.title("Генератор ведомостей оборудования")
-        self.geometry("800x600")
+        self.geometry("800x700")
 
         # Инициализация переменных Tkinter
         self.progress_var = tk.DoubleVar()
         self.progress_var.set(0)
+        self.streaming_var = tk.BooleanVar(value=False)
+        self.force_refresh_var = tk.BooleanVar(value=False)
 
         # Загрузка конфигурации
-        load_dotenv()
-        self.spreadsheet_url = os.getenv("GOOGLE_SHEETS_URL", "")
-        self.credentials_file = os.getenv(
-            "CREDENTIALS_JSON", "credentials.json")
-        self.sheet_name = os.getenv("SHEET_NAME", "Камеры")
+        self.settings = PipelineConfig.load()
+        self.spreadsheet_url = self.settings.spreadsheet_url
+        self.credentials_file = self.settings.credentials_file
+        self.sheet_name = self.settings.sheet_name
         self.client_email = ""
+        self.profile_var = tk.BooleanVar(value=self.settings.profile)
+
+        # Рабочие потоки не трогают Tk: изменения заданий идут через очередь
+        self.ui_queue = queue.Queue()
+        # Журнал: в окне последние LOG_MAX_LINES строк, полностью - в файле
+        self.log_sink = LogSink(self.settings.log_file,
+                                max_lines=self.settings.log_max_lines)
+        # Очередь заданий: до JOB_CONCURRENCY отчетов одновременно
+        self.jobs = ReportJobs(ReportService(self.settings, self.log_message),
+                               self.log_message, self.on_job_changed)
+        self.priority_var = tk.StringVar(value="Обычный")
 
         self.create_widgets()
         self.load_credentials_info()
+        self.after(self.UI_PUMP_MS, self.pump_ui_queue)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        """Закрытие окна: задания отменяются, временные файлы удаляются"""
+        self.config(cursor="watch")
+        self.update_idletasks()
+        self.jobs.shutdown(self.SHUTDOWN_TIMEOUT)
+        self.destroy()
 
     def create_widgets(self):
         """Создание элементов интерфейса"""
@@ -318,9 +107,17 @@ class MainWindow(tk.Tk):
         ttk.Button(email_frame, text="Копировать",
                    command=self.copy_client_email).pack(side=tk.LEFT)
 
+        # Цели пакетного запуска: "URL;Имя листа" или "URL;*" на строку
+        ttk.Label(settings_frame, text="Пакет (URL;лист):").grid(
+            row=4, column=0, sticky=tk.NW, padx=5, pady=2)
+        self.batch_text = scrolledtext.ScrolledText(
+            settings_frame, height=4, wrap=tk.NONE)
+        self.batch_text.grid(row=4, column=1, columnspan=2,
+                             sticky=tk.EW, padx=5, pady=2)
+
         # Кнопки запуска - теперь в вертикальном расположении под email
         button_frame = ttk.Frame(settings_frame)
-        button_frame.grid(row=4, column=0, columnspan=3,
+        button_frame.grid(row=5, column=0, columnspan=3,
                           sticky=tk.EW, padx=5, pady=(0, 5))
 
         self.run_button = ttk.Button(
@@ -331,6 +128,42 @@ class MainWindow(tk.Tk):
             button_frame, text="Быстрый запуск", command=self.quick_run_report)
         self.quick_run_button.pack(fill=tk.X, pady=2)
 
+        self.batch_button = ttk.Button(
+            button_frame, text="Пакетный запуск", command=self.run_batch_generation)
+        self.batch_button.pack(fill=tk.X, pady=2)
+
+        priority_frame = ttk.Frame(button_frame)
+        priority_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(priority_frame, text="Приоритет:").pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Combobox(priority_frame, textvariable=self.priority_var, state='readonly',
+                     values=list(ReportJobs.PRIORITIES)).pack(side=tk.LEFT)
+
+        ttk.Checkbutton(button_frame, text="Потоковая запись (большие ведомости)",
+                        variable=self.streaming_var).pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(button_frame, text="Принудительно обновить данные (без кэша)",
+                        variable=self.force_refresh_var).pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(button_frame, text="Профилирование (cProfile и tracemalloc)",
+                        variable=self.profile_var).pack(anchor=tk.W, pady=2)
+
+        # Задания очереди
+        jobs_frame = ttk.LabelFrame(main_frame, text="Задания")
+        jobs_frame.pack(fill=tk.X, pady=5)
+
+        columns = ("job", "title", "priority", "status", "progress")
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=columns, show="headings", height=5)
+        for column, title, width in zip(columns, ("№", "Лист", "Приоритет", "Состояние", "%"),
+                                        (40, 160, 80, 380, 50)):
+            self.jobs_tree.heading(column, text=title)
+            self.jobs_tree.column(column, width=width, stretch=column == "status")
+        self.jobs_tree.pack(fill=tk.X, padx=5, pady=(5, 0))
+
+        jobs_buttons = ttk.Frame(jobs_frame)
+        jobs_buttons.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(jobs_buttons, text="Отменить выбранные",
+                   command=self.cancel_selected_jobs).pack(side=tk.LEFT)
+        ttk.Button(jobs_buttons, text="Очистить завершенные",
+                   command=self.clear_finished_jobs).pack(side=tk.LEFT, padx=5)
+
         # Лог сообщений
         log_frame = ttk.LabelFrame(main_frame, text="Лог")
         log_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -383,112 +216,149 @@ class MainWindow(tk.Tk):
         self.log_message("Client email скопирован в буфер обмена")
 
     def log_message(self, message):
-        """Добавление сообщения в лог"""
+        """Добавление сообщения в лог (из любого потока)"""
+        self.log_sink.write(message)
+
+    def write_log(self, lines):
+        """Вставка пачки строк в лог одним обращением к виджету"""
         self.log_text.config(state='normal')
-        self.log_text.insert(tk.END, message + "\n")
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        # Последняя строка виджета всегда пустая
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.log_sink.max_lines
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
         self.log_text.config(state='disabled')
         self.log_text.see(tk.END)
 
-    def update_progress(self, value):
-        """Обновление прогресс бара"""
-        self.progress_var.set(value)
-        self.update_idletasks()
+    def on_job_changed(self, job):
+        """Изменение задания очереди (из любого потока)"""
+        self.ui_queue.put(job)
+
+    def pump_ui_queue(self):
+        """Разбор очереди сообщений от рабочих потоков
+
+        Строки лога (из LogSink) за проход выводятся одной вставкой,
+        из нескольких изменений одного задания показывается последнее.
+        """
+        # Следующий проход планируется сразу: итог задания может открыть
+        # модальное окно, внутри которого очередь продолжит разбираться
+        self.after(self.UI_PUMP_MS, self.pump_ui_queue)
+        jobs = {}
+        for _ in range(self.UI_PUMP_BATCH):
+            try:
+                job = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            jobs[job.job_id] = job
+        self.flush_ui(jobs)
+
+    def flush_ui(self, jobs):
+        lines = self.log_sink.drain()
+        if lines:
+            self.write_log(lines)
+        for job in jobs.values():
+            self.show_job(job)
+        if jobs:
+            self.show_queue_progress()
+
+    def show_job(self, job):
+        """Строка задания в списке; итог завершенного задания - один раз"""
+        iid = str(job.job_id)
+        values = self.jobs.row(job)
+        if self.jobs_tree.exists(iid):
+            self.jobs_tree.item(iid, values=values)
+        else:
+            self.jobs_tree.insert("", tk.END, iid=iid, values=values)
+
+        outcome = self.jobs.finish(job)
+        if outcome is not None:
+            self.show_outcome(outcome)
+
+    def show_queue_progress(self):
+        """Общий прогресс: среднее по выполняющимся и ожидающим заданиям"""
+        progress = self.jobs.progress()
+        if progress is not None:
+            percent, status = progress
+            self.progress_var.set(percent)
+            self.status_label.config(text=status)
 
     def run_report_generation(self):
-        """Запуск процесса генерации отчета"""
+        """Постановка ведомости по текущему листу в очередь"""
+        self.read_settings()
+        self.jobs.submit_single(self.spreadsheet_url, self.sheet_name, self.credentials_file,
+                                self.priority_var.get(), streaming=self.streaming_var.get(),
+                                force_refresh=self.force_refresh_var.get(),
+                                profile=self.profile_var.get())
+
+    def run_batch_generation(self):
+        """Постановка пакетного формирования ведомостей в очередь"""
+        self.read_settings()
+        self.jobs.submit_batch(self.batch_text.get("1.0", tk.END), self.spreadsheet_url,
+                               self.sheet_name, self.credentials_file, self.priority_var.get(),
+                               streaming=self.streaming_var.get(),
+                               force_refresh=self.force_refresh_var.get())
+
+    def read_settings(self):
+        """Параметры запуска из полей окна"""
         self.spreadsheet_url = self.url_entry.get().strip()
         self.sheet_name = self.sheet_entry.get().strip()
         self.credentials_file = self.creds_entry.get().strip()
 
-        if not all([self.spreadsheet_url, self.credentials_file]):
-            self.log_message("Ошибка: Не заданы все необходимые параметры!")
-            return
-
-        self.log_message("Начало обработки данных...")
-        self.progress_var.set(0)
-        self.run_button.config(state='disabled')
-        self.quick_run_button.config(state='disabled')
-
-        # Запускаем в отдельном потоке
-        worker = GoogleSheetsWorker(
-            self.spreadsheet_url,
-            self.credentials_file,
-            self.sheet_name,
-            self.on_data_processed
-        )
-
-        thread = threading.Thread(target=worker.run)
-        thread.daemon = True
-        thread.start()
-
-        # Анимация прогресс-бара
-        self.animate_progress()
-
     def quick_run_report(self):
         """Быстрый запуск с текущими параметрами"""
         self.log_message("Быстрый запуск создания отчета...")
         self.run_report_generation()
 
-    def animate_progress(self):
-        """Анимация прогресс-бара"""
-        current = self.progress_var.get()
-        if current < 100:
-            self.progress_var.set(current + 1)
-            self.after(100, self.animate_progress)
-
-    def on_data_processed(self, address_data, camera_models, object_codes, error):
-        """Обработка завершения получения данных"""
-        if error:
-            self.on_error(error)
+    def show_outcome(self, outcome):
+        """Итог задания; когда очередь опустела - сводка за серию заданий"""
+        if outcome.status:
+            self.status_label.config(text=outcome.status)
+        if outcome.error:
+            messagebox.showerror("Ошибка", outcome.error)
+        if outcome.summary is None:
             return
+        done, _ = outcome.summary
+        self.progress_var.set(100 if done else 0)
+        if done:
+            messagebox.showinfo("Успех", outcome.summary_text())
 
-        self.log_message(f"Обработано {len(address_data)} адресов")
-        self.log_message(f"Найдено {len(camera_models)} моделей камер")
-
-        # Запускаем генерацию отчета
-        report_worker = ExcelReportGenerator(
-            address_data,
-            camera_models,
-            object_codes,
-            self.on_report_generated
-        )
-
-        thread = threading.Thread(target=report_worker.run)
-        thread.daemon = True
-        thread.start()
-
-    def on_report_generated(self, filename, error):
-        """Обработка завершения генерации отчета"""
-        if error:
-            self.on_error(error)
-            return
-
-        self.run_button.config(state='normal')
-        self.quick_run_button.config(state='normal')
-        self.status_label.config(text=f"Отчет сохранен: {filename}")
-        self.log_message(f"Отчет успешно создан: {filename}")
+    def cancel_selected_jobs(self):
+        """Отмена выбранных в списке заданий"""
+        for iid in self.jobs_tree.selection():
+            self.jobs.cancel(int(iid))
 
-        messagebox.showinfo(
-            "Успех", f"Отчет успешно создан!\nФайл сохранен как: {filename}")
+    def clear_finished_jobs(self):
+        """Удаление завершенных заданий из списка"""
+        for job_id in self.jobs.clear_finished():
+            if self.jobs_tree.exists(str(job_id)):
+                self.jobs_tree.delete(str(job_id))
 
-    def on_error(self, error_message):
-        """Обработка ошибок"""
-        self.log_message(error_message)
-        self.run_button.config(state='normal')
-        self.quick_run_button.config(state='normal')
-        self.progress_var.set(0)
 
-        messagebox.showerror("Ошибка", error_message)
+def write_startup_probe(app, probe_file):
+    """Метка времени первой отрисовки окна для benchmarks/bench_startup.py"""
+    app.update()
+    with open(probe_file, "w", encoding="utf-8") as f:
+        f.write(repr(time.time()))
+    app.destroy()
 
 
 def main():
     """Точка входа в приложение"""
+    # Пул процессов пакетного режима в собранном exe
+    multiprocessing.freeze_support()
+
     # Создаем папку для отчетов, если ее нет
     output_dir = Path("output")
     output_dir.mkdir(exist_ok=True)
 
     app = MainWindow()
+    # Сначала окно, затем в фоне - gspread и openpyxl
+    app.after_idle(preload_libraries)
+    probe_file = os.getenv("STARTUP_PROBE_FILE")
+    if probe_file:
+        app.after_idle(write_startup_probe, app, probe_file)
     app.mainloop()
+    app.log_sink.close()
 
 
 if __name__ == "__main__":
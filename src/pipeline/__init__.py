@@ -0,0 +1,48 @@
+"""Движок формирования ведомостей без графического интерфейса
+
+Общий для окна Tk (src/main.py), окна Qt (app_qt_ui_1.py) и командной
+строки (src/cli.py). Этапы: load_report_data - загрузка и агрегация листа,
+render_report - построение и сохранение книги, run_report - оба этапа
+подряд, stream_report - потоковая ведомость по упорядоченному листу,
+BatchReportRunner - пакет листов. Интерфейсы получают прогресс,
+сообщения и отмену через ProgressReporter, log и CancelToken.
+Настройки из окружения (PipelineConfig), выбор режима запуска
+(ReportService) и очередь заданий окна (ReportJobs) тоже общие.
+
+Модули: sources - откуда читаются листы (Google Sheets, локальный файл,
+HTTP-подмена API для замеров без сети); sheets - загрузка листа, кэш
+снимков и агрегация; counts - компактный результат агрегации; stream -
+группировка строк для потоковой ведомости; report - шаблон и запись
+книги; jobs - очередь заданий, прогресс и журнал; metrics - замеры
+этапов; runner - запуск целиком, потоковый и пакетный режим; service -
+настройки, запуск по ним и очередь заданий окон.
+"""
+from .jobs import (JobCancelled, CancelToken, ReportJob, JobQueue, ProgressReporter,
+                   LogSink)
+from .metrics import (peak_rss_mb, current_rss_mb, measure_stage, HEAVY_MODULES, preload_libraries,
+                      PipelineMetrics)
+from .sources import (SOURCES, make_source, GspreadSource, FileSource, HttpSheetsSource,
+                      SheetsStandIn, SheetsClientPool)
+from .counts import AddressRow, ObjectCodes, CameraCounts
+from .sheets import SheetCache, IncrementalAggregator, GoogleSheetsWorker
+from .stream import AddressGroups, GroupCodes, StreamedCounts
+from .report import (ReportTemplate, ReportStyles, OpenpyxlReportWriter, XlsxReportWriter,
+                     ReportSummary, OutputNames, ExcelReportGenerator)
+from .runner import (load_report_data, render_report, run_report, stream_report,
+                     parse_batch_targets, build_report_file, BatchReportRunner)
+from .service import PipelineConfig, ReportService, JobOutcome, ReportJobs
+
+__all__ = [
+    "JobCancelled", "CancelToken", "ReportJob", "JobQueue", "ProgressReporter", "LogSink",
+    "peak_rss_mb", "current_rss_mb", "measure_stage", "HEAVY_MODULES", "preload_libraries", "PipelineMetrics",
+    "SOURCES", "make_source", "GspreadSource", "FileSource", "HttpSheetsSource",
+    "SheetsStandIn", "SheetsClientPool",
+    "AddressRow", "ObjectCodes", "CameraCounts",
+    "SheetCache", "IncrementalAggregator", "GoogleSheetsWorker",
+    "AddressGroups", "GroupCodes", "StreamedCounts",
+    "ReportTemplate", "ReportStyles", "OpenpyxlReportWriter", "XlsxReportWriter",
+    "ReportSummary", "OutputNames", "ExcelReportGenerator",
+    "load_report_data", "render_report", "run_report", "stream_report", "parse_batch_targets",
+    "build_report_file", "BatchReportRunner",
+    "PipelineConfig", "ReportService", "JobOutcome", "ReportJobs",
+]
@@ -0,0 +1,197 @@
+from array import array
+from collections import defaultdict
+from collections.abc import Mapping
+
+# Компактный результат агрегации листа. Адреса и модели хранятся по одному
+# разу в списках, в строках - их номера; количества лежат разреженной
+# матрицей в трех массивах (CSR): для адреса i пары (номер модели,
+# количество) занимают позиции indptr[i]..indptr[i + 1] массивов
+# indices и quantities. Коды объектов - список, параллельный адресам.
+# Снаружи это словарь {адрес: {модель: количество}}, как раньше
+# defaultdict, а в другой процесс передаются только списки и массивы.
+
+ARRAY_TYPES = ("B", "H", "I", "L", "Q")
+
+
+def pack(values):
+    """Массив целых чисел с самым узким типом элементов, в который они помещаются"""
+    if not isinstance(values, (list, array)):
+        values = list(values)
+    top = max(values, default=0)
+    for typecode in ARRAY_TYPES:
+        if top < 1 << 8 * array(typecode).itemsize:
+            return array(typecode, values)
+    raise OverflowError(f"Слишком большое количество: {top}")
+
+
+class AddressRow(Mapping):
+    """Количества камер одного адреса: словарь {модель: количество} только для чтения"""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def _bounds(self):
+        indptr = self._table.indptr
+        return indptr[self._row], indptr[self._row + 1]
+
+    def __len__(self):
+        start, end = self._bounds()
+        return end - start
+
+    def __iter__(self):
+        start, end = self._bounds()
+        return map(self._table.models.__getitem__, self._table.indices[start:end])
+
+    def __getitem__(self, model):
+        model_id = self._table.model_ids().get(model)
+        start, end = self._bounds()
+        if model_id is not None:
+            indices = self._table.indices
+            for position in range(start, end):
+                if indices[position] == model_id:
+                    return self._table.quantities[position]
+        raise KeyError(model)
+
+    def items(self):
+        """Пары (модель, количество) в порядке первого появления модели у адреса"""
+        start, end = self._bounds()
+        table = self._table
+        return list(zip(map(table.models.__getitem__, table.indices[start:end]),
+                        table.quantities[start:end]))
+
+    def __repr__(self):
+        return f"AddressRow({dict(self.items())!r})"
+
+
+class ObjectCodes(Mapping):
+    """Коды объектов {адрес: код} из той же таблицы, в порядке адресов"""
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table.addresses)
+
+    def __iter__(self):
+        return iter(self._table.addresses)
+
+    def __getitem__(self, address):
+        return self._table.codes[self._table.address_ids()[address]]
+
+    def values(self):
+        return list(self._table.codes)
+
+    def items(self):
+        return list(zip(self._table.addresses, self._table.codes))
+
+    def __reduce__(self):
+        return ObjectCodes, (self._table,)
+
+    def __repr__(self):
+        return f"ObjectCodes({dict(self.items())!r})"
+
+
+class CameraCounts(Mapping):
+    """Итоги агрегации: {адрес: AddressRow} в порядке первого появления адреса
+
+    Возвращается process_camera_data вместо defaultdict словарей: строки
+    адресов и моделей не повторяются, номера и количества лежат в массивах
+    по 1-2 байта на число (pack), а pickle сводится к трем спискам строк
+    и трем массивам, поэтому результат передается в пул процессов без
+    преобразования.
+    Словари для поиска по адресу и по модели строятся при первом обращении.
+    """
+
+    __slots__ = ("addresses", "models", "codes", "indptr", "indices", "quantities",
+                 "_address_ids", "_model_ids")
+
+    def __init__(self, addresses, models, codes, indptr, indices, quantities):
+        self.addresses = addresses
+        self.models = models
+        self.codes = codes
+        self.indptr = indptr
+        self.indices = indices
+        self.quantities = quantities
+        self._address_ids = None
+        self._model_ids = None
+
+    @classmethod
+    def from_mapping(cls, address_data, object_codes):
+        """Таблица из словарей {адрес: {модель: количество}} и {адрес: код}
+
+        Цикл Python - по адресам, а не по парам: номера моделей строки
+        и количества добавляются в массивы целиком.
+        """
+        # Номер новой модели - число уже занумерованных, как при factorize
+        model_ids = defaultdict()
+        model_ids.default_factory = model_ids.__len__
+        number = model_ids.__getitem__
+        indptr = array("I", [0])
+        indices = array("I")
+        quantities = array("I")
+        for counts in address_data.values():
+            indices.extend(map(number, counts))
+            quantities.extend(counts.values())
+            indptr.append(len(indices))
+
+        addresses = list(address_data)
+        codes = [object_codes.get(address, "") for address in addresses]
+        table = cls(addresses, list(model_ids), codes, pack(indptr), pack(indices),
+                    pack(quantities))
+        table._model_ids = dict(model_ids)
+        return table
+
+    def address_ids(self):
+        """Номера адресов {адрес: номер}"""
+        if self._address_ids is None:
+            self._address_ids = {address: i for i, address in enumerate(self.addresses)}
+        return self._address_ids
+
+    def model_ids(self):
+        """Номера моделей {модель: номер}"""
+        if self._model_ids is None:
+            self._model_ids = {model: i for i, model in enumerate(self.models)}
+        return self._model_ids
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __iter__(self):
+        return iter(self.addresses)
+
+    def __contains__(self, address):
+        return address in self.address_ids()
+
+    def __getitem__(self, address):
+        return AddressRow(self, self.address_ids()[address])
+
+    def values(self):
+        return [AddressRow(self, row) for row in range(len(self.addresses))]
+
+    def items(self):
+        return [(address, AddressRow(self, row)) for row, address in enumerate(self.addresses)]
+
+    def camera_models(self):
+        """Модели камер, встречающиеся в таблице, по алфавиту"""
+        return sorted(self.models)
+
+    @property
+    def object_codes(self):
+        return ObjectCodes(self)
+
+    def result(self):
+        """(address_data, camera_models, object_codes), как у process_camera_data"""
+        return self, self.camera_models(), self.object_codes
+
+    def __reduce__(self):
+        return CameraCounts, (self.addresses, self.models, self.codes,
+                              self.indptr, self.indices, self.quantities)
+
+    def __repr__(self):
+        return (f"CameraCounts({len(self.addresses)} адресов, {len(self.models)} моделей, "
+                f"{len(self.indices)} пар)")
@@ -0,0 +1,309 @@
+import time
+import logging
+import heapq
+import itertools
+from pathlib import Path
+from collections import deque
+from logging.handlers import RotatingFileHandler
+import threading
+
+
+class JobCancelled(Exception):
+    """Задание отменено пользователем или вытеснено новым запуском"""
+
+
+class CancelToken:
+    """Флаг отмены одного задания
+
+    Рабочий код вызывает check() между страницами загрузки, порциями
+    агрегации и строк ведомости; после cancel() check() бросает
+    JobCancelled, и задание останавливается в ближайшей такой точке.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled("Операция отменена")
+
+
+class ReportJob:
+    """Задание очереди отчетов
+
+    kind - "single" (один лист) или "batch" (цели пакетного запуска),
+    params - параметры запуска. Состояние меняется так: queued ->
+    running -> done / failed / cancelled; percent и text - ход выполнения
+    для списка заданий, result - результат функции задания.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    TITLES = {
+        QUEUED: "В очереди",
+        RUNNING: "Выполняется",
+        DONE: "Готово",
+        FAILED: "Ошибка",
+        CANCELLED: "Отменено",
+    }
+
+    def __init__(self, job_id, kind, title, params, priority=1, key=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.title = title
+        self.params = params
+        self.priority = priority
+        self.key = key
+        self.status = self.QUEUED
+        self.percent = 0
+        self.text = ""
+        self.result = None
+        self.error = None
+        self.cancel = CancelToken()
+
+    @property
+    def active(self):
+        return self.status in (self.QUEUED, self.RUNNING)
+
+    def describe(self):
+        """Состояние для списка заданий"""
+        title = self.TITLES[self.status]
+        if self.status == self.RUNNING and self.text:
+            return f"{title}: {self.text}"
+        if self.status == self.FAILED and self.error:
+            return f"{title}: {self.error}"
+        return title
+
+
+class JobQueue:
+    """Очередь заданий с приоритетами и ограничением одновременных запусков
+
+    Задание с меньшим priority запускается раньше, при равном - в порядке
+    постановки. Одновременно выполняется не больше max_workers заданий,
+    каждое в своем потоке, поэтому загрузка одних листов идет параллельно
+    с формированием книг других. Новое задание с тем же key (например,
+    тот же лист) вытесняет устаревшее: оно отменяется. on_change(job)
+    вызывается при каждом изменении задания, в том числе из рабочих потоков.
+
+    Рабочие потоки фоновые (daemon): зависший запрос к API не должен
+    держать процесс после закрытия окна. Поэтому перед выходом окно
+    вызывает shutdown() - задания отменяются и успевают убрать свои
+    временные файлы.
+    """
+
+    def __init__(self, run, on_change=None, max_workers=2):
+        self.run = run
+        self.on_change = on_change
+        self.max_workers = max(1, max_workers)
+        self.jobs = {}
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._running = 0
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, title, params, priority=1, key=None):
+        with self._lock:
+            stale = [job for job in self.jobs.values()
+                     if key is not None and job.key == key and job.active]
+            for job in stale:
+                self._cancel(job)
+            job = ReportJob(next(self._ids), kind, title, params, priority, key)
+            self.jobs[job.job_id] = job
+            heapq.heappush(self._heap, (priority, job.job_id, job))
+        for changed in stale + [job]:
+            self.notify(changed)
+        self.dispatch()
+        return job
+
+    def dispatch(self):
+        """Запуск заданий из очереди, пока есть свободные места"""
+        started = []
+        with self._lock:
+            while self._running < self.max_workers and self._heap:
+                _, _, job = heapq.heappop(self._heap)
+                if job.status != ReportJob.QUEUED:
+                    continue
+                job.status = ReportJob.RUNNING
+                self._running += 1
+                started.append(job)
+        for job in started:
+            self.notify(job)
+            thread = threading.Thread(target=self.execute, args=(job,), daemon=True)
+            with self._lock:
+                self._threads[job.job_id] = thread
+            thread.start()
+
+    def execute(self, job):
+        try:
+            job.cancel.check()
+            job.result = self.run(job)
+            job.status = ReportJob.DONE
+        except JobCancelled:
+            job.status = ReportJob.CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = ReportJob.FAILED
+        with self._lock:
+            self._running -= 1
+            self._threads.pop(job.job_id, None)
+        self.notify(job)
+        self.dispatch()
+
+    def progress(self, job, percent, text):
+        """Ход выполнения задания (callback для ProgressReporter)"""
+        job.percent = percent
+        job.text = text
+        self.notify(job)
+
+    def cancel(self, job_id):
+        """Отмена задания: ожидающее снимается сразу, выполняющееся -
+        в ближайшей точке проверки"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or not job.active:
+                return False
+            self._cancel(job)
+        self.notify(job)
+        return True
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def shutdown(self, timeout=10.0):
+        """Отмена всех заданий и ожидание рабочих потоков (не дольше timeout с)
+
+        Возвращает задания, которые не успели остановиться.
+        """
+        self.cancel_all()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            threads = list(self._threads.values())
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            return [self.jobs[job_id] for job_id, thread in self._threads.items()
+                    if thread.is_alive()]
+
+    def _cancel(self, job):
+        job.cancel.cancel()
+        if job.status == ReportJob.QUEUED:
+            job.status = ReportJob.CANCELLED
+
+    def clear_finished(self):
+        """Удаление завершенных заданий; возвращает их номера"""
+        with self._lock:
+            finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+            for job_id in finished:
+                del self.jobs[job_id]
+        return finished
+
+    def counts(self):
+        """Число выполняющихся и ожидающих заданий"""
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return statuses.count(ReportJob.RUNNING), statuses.count(ReportJob.QUEUED)
+
+    def notify(self, job):
+        if self.on_change is not None:
+            self.on_change(job)
+
+
+class ProgressReporter:
+    """Прогресс этапов по строкам с ограничением частоты обновлений
+
+    Каждому этапу отведена часть шкалы 0-100 (STAGES). update() переводит
+    обработанные строки этапа в проценты, считает скорость (строк/с)
+    и оставшееся время и вызывает callback(percent, text) не чаще раза
+    в interval секунд. Завершение этапа передается всегда.
+    """
+
+    # этап: (начало, конец шкалы, название, единица)
+    STAGES = {
+        "fetch": (0, 40, "Загрузка", "строк"),
+        "aggregate": (40, 55, "Обработка", "строк"),
+        "build": (55, 90, "Формирование", "строк"),
+        "save": (90, 100, "Сохранение", "строк"),
+        "batch": (0, 100, "Пакет", "листов"),
+    }
+
+    def __init__(self, callback, interval=0.25):
+        self.callback = callback
+        self.interval = interval
+        self.percent = 0
+        self._last = 0.0
+        self._started = {}
+
+    def update(self, stage, done, total=None):
+        now = time.monotonic()
+        started = self._started.setdefault(stage, now)
+        finished = total is not None and done >= total
+        if not finished and now - self._last < self.interval:
+            return
+        self._last = now
+
+        low, high, title, unit = self.STAGES[stage]
+        fraction = min(done / total, 1.0) if total else 0.0
+        self.percent = max(self.percent, int(low + (high - low) * fraction))
+
+        text = f"{title}: {done} {unit}" if not total else f"{title}: {done} из {total} {unit}"
+        elapsed = now - started
+        if done and elapsed > 0:
+            rate = done / elapsed
+            text += f", {rate:.0f} {unit}/с"
+            if total and not finished:
+                text += f", осталось ~{(total - done) / rate:.0f} с"
+        self.callback(self.percent, text)
+
+
+class LogSink:
+    """Буфер журнала для окна приложения
+
+    write() можно вызывать из любого потока: строка сразу дописывается
+    в файл журнала (с ротацией по размеру) и откладывается до drain().
+    Окно забирает накопленное пачкой по таймеру. Если между вызовами
+    drain() накопилось больше max_lines строк, старые отбрасываются -
+    в окне их все равно не оставить, полный журнал остается в файле.
+    """
+
+    def __init__(self, log_file=None, max_lines=5000, max_bytes=5 * 1024 * 1024,
+                 backup_count=3):
+        self.max_lines = max_lines
+        self._pending = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self._handler = None
+        if log_file:
+            Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+            self._handler = RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+
+    def write(self, message):
+        with self._lock:
+            self._pending.append(message)
+        if self._handler is not None:
+            self._handler.handle(logging.makeLogRecord(
+                {"msg": message, "levelno": logging.INFO, "levelname": "INFO"}))
+
+    def drain(self):
+        """Накопленные строки с прошлого вызова"""
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+        return lines
+
+    def close(self):
+        if self._handler is not None:
+            self._handler.close()
@@ -0,0 +1,253 @@
+import sys
+import json
+import time
+import cProfile
+import pstats
+import tracemalloc
+import importlib
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from datetime import datetime
+import threading
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса в МБ (None, если недоступно, например в Windows)"""
+    # В Linux ru_maxrss переживает fork и exec: дочерний процесс начинает
+    # с пика родителя. VmHWM при exec сбрасывается, поэтому он точнее.
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает КБ, macOS - байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb():
+    """Текущий RSS процесса в МБ (VmRSS; None, если недоступно, например в Windows)
+
+    В отличие от peak_rss_mb не зависит от того, что было раньше в процессе:
+    по значениям до и после этапа видно, сколько памяти добавил сам этап.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def measure_stage(metrics, name):
+    """Замер этапа, если метрики включены"""
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+
+# Тяжелые библиотеки импортируются в функциях, где они нужны, чтобы окно
+# появлялось без их загрузки (только gspread с зависимостями - около 0.4 с)
+HEAVY_MODULES = ("gspread", "oauth2client.service_account", "openpyxl",
+                 "openpyxl.cell", "openpyxl.styles", "openpyxl.utils")
+
+
+def preload_libraries(modules=HEAVY_MODULES):
+    """Фоновая загрузка тяжелых библиотек, пока пользователь заполняет форму
+
+    К первому запуску отчета модули уже в sys.modules. Если запуск начнется
+    раньше, import в рабочем потоке дождется загрузки под блокировкой модуля.
+    """
+    def load():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass  # ошибка появится при первом использовании
+
+    thread = threading.Thread(target=load, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+class PipelineMetrics:
+    """Замеры этапов формирования ведомости
+
+    Для каждого этапа (auth, open_by_url, fetch, aggregate, build, save)
+    записываются время, процессорное время потока, RSS процесса после
+    этапа и его прирост за этап. Пик RSS процесса (VmHWM) накапливается
+    за все время его работы и в окне, где заданий много, относился бы
+    не к этапу, поэтому в замеры не входит.
+    Итог выводится в журнал и дописывается строкой JSON в файл метрик.
+    При profile=True этапы дополнительно профилируются cProfile (профиль
+    сохраняется в profile_dir), а пик памяти Python по этапу считается
+    через tracemalloc.
+
+    cProfile и tracemalloc общие для процесса, поэтому профилируемые этапы
+    одновременных заданий выполняются по одному (_profile_lock), а
+    tracemalloc останавливается, только когда закончилось последнее
+    профилируемое задание, и только если его запустили сами замеры.
+    """
+
+    _write_lock = threading.Lock()
+    _profile_lock = threading.Lock()
+    _trace_lock = threading.Lock()
+    _trace_users = 0
+    _trace_started = False
+
+    def __init__(self, log=None, metrics_file=None, profile=False, profile_dir="profiles"):
+        self.log = log
+        self.metrics_file = metrics_file
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self.started = time.perf_counter()
+        self._profilers = []
+        self._tracing = False
+        if profile:
+            self._start_tracing()
+            self._tracing = True
+
+    @classmethod
+    def _start_tracing(cls):
+        with cls._trace_lock:
+            if not cls._trace_users and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                cls._trace_started = True
+            cls._trace_users += 1
+
+    @classmethod
+    def _stop_tracing(cls):
+        """Остановка tracemalloc после последнего профилируемого задания"""
+        with cls._trace_lock:
+            cls._trace_users -= 1
+            if not cls._trace_users and cls._trace_started:
+                tracemalloc.stop()
+                cls._trace_started = False
+
+    @contextmanager
+    def stage(self, name):
+        """Замер одного этапа: with metrics.stage("fetch"): ..."""
+        if not self.profile:
+            with self._measure(name):
+                yield
+            return
+        # Один активный профилировщик на процесс (Python 3.12+ не дает
+        # включить второй), и пик tracemalloc не сбрасывает соседний этап
+        with self._profile_lock:
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            with self._measure(name, profiler):
+                profiler.enable()
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+                    self._profilers.append(profiler)
+
+    @contextmanager
+    def _measure(self, name, profiler=None):
+        rss = current_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            peak = None
+            if profiler is not None and tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            after = current_rss_mb()
+            delta = after - rss if after is not None and rss is not None else None
+            self.add(name, wall, cpu, peak, after, delta)
+
+    def add(self, name, wall, cpu, peak_mb=None, rss_mb=None, rss_delta_mb=None):
+        """Добавление замера этапа, в том числе сделанного в другом процессе"""
+        entry = self.stages.setdefault(
+            name, {"wall": 0.0, "cpu": 0.0, "peak_mb": None, "rss_mb": None,
+                   "rss_delta_mb": None})
+        entry["wall"] += wall
+        entry["cpu"] += cpu
+        if peak_mb is not None:
+            entry["peak_mb"] = max(entry["peak_mb"] or 0.0, peak_mb)
+        if rss_mb is not None:
+            entry["rss_mb"] = rss_mb
+        if rss_delta_mb is not None:
+            entry["rss_delta_mb"] = (entry["rss_delta_mb"] or 0.0) + rss_delta_mb
+
+    def merge(self, stages):
+        for name, entry in stages.items():
+            self.add(name, entry["wall"], entry["cpu"], entry["peak_mb"], entry["rss_mb"],
+                     entry.get("rss_delta_mb"))
+
+    def summary(self):
+        """Строка журнала: время этапов и память"""
+        parts = []
+        for name, entry in self.stages.items():
+            part = f"{name} {entry['wall']:.2f} с (ЦП {entry['cpu']:.2f} с"
+            if entry["peak_mb"] is not None:
+                part += f", Python {entry['peak_mb']:.1f} МБ"
+            if entry.get("rss_delta_mb") is not None and abs(entry["rss_delta_mb"]) >= 1:
+                part += f", RSS {entry['rss_delta_mb']:+.0f} МБ"
+            parts.append(part + ")")
+        rss = max((entry["rss_mb"] or 0 for entry in self.stages.values()), default=0)
+        if rss:
+            parts.append(f"RSS после этапов до {rss:.0f} МБ")
+        return "Этапы: " + ", ".join(parts)
+
+    def finish(self, **context):
+        """Итог замеров: журнал, строка в файле метрик и профиль"""
+        record = {"time": datetime.now().isoformat(timespec="seconds")}
+        record.update(context)
+        record["total_seconds"] = round(time.perf_counter() - self.started, 4)
+        record["stages"] = {
+            name: {key: round(value, 4) if isinstance(value, float) else value
+                   for key, value in entry.items()}
+            for name, entry in self.stages.items()}
+
+        if self.profile:
+            record["profile"] = self.save_profile()
+
+        if self.log is not None:
+            self.log(self.summary())
+            if self.profile and record["profile"]:
+                self.log(f"Профиль сохранен: {record['profile']}")
+
+        if self.metrics_file:
+            path = Path(self.metrics_file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._write_lock, open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def save_profile(self):
+        """Сохранение профиля cProfile и самых крупных мест выделения памяти"""
+        if self._tracing:
+            self._tracing = False
+            if self.log is not None and tracemalloc.is_tracing():
+                # Память самих профилировщиков в отчет не попадает
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, module.__file__)
+                    for module in (cProfile, pstats, tracemalloc)])
+                for stat in snapshot.statistics("lineno")[:5]:
+                    self.log(f"Память: {stat}")
+            self._stop_tracing()
+
+        if not self._profilers:
+            return None
+        profile_dir = Path(self.profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        path = profile_dir / f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.prof"
+        stats = pstats.Stats(self._profilers[0])
+        for profiler in self._profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(path)
+        self._profilers = []
+        return str(path)
@@ -0,0 +1,980 @@
+import os
+import json
+import shutil
+import tempfile
+from copy import copy
+from pathlib import Path
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime
+import multiprocessing
+import threading
+
+from .metrics import measure_stage
+
+
+class ReportTemplate:
+    """Шаблон оформления ведомости
+
+    Первый лист файла .xlsx содержит шапку до строки заголовков столбцов
+    включительно (в столбце A этой строки - "Код объекта") и под ней строки
+    подписи. Из шаблона берутся значения и оформление ячеек, объединения,
+    ширина столбцов и высота строк; генератор дописывает между шапкой
+    и подписью только строки данных и итогов.
+
+    Заголовки столбцов задают каталог: первые два столбца - код и адрес,
+    последние TRAILING_COLUMNS - коммутаторы и удлинители, между ними -
+    модели камер. Модели вне каталога вставляются перед коммутаторами
+    с оформлением последнего столбца камер, объединения правее сдвигаются.
+
+    Ячейки данных и итогов оформляются именованными стилями шаблона
+    (STYLE_NAMES): "data" - значения, "address" - адрес, "empty" - пустые
+    ячейки камер. Разобранный файл кэшируется по пути и времени изменения.
+    """
+
+    TITLE = "Код объекта"
+    TRAILING_COLUMNS = 5
+    STYLE_NAMES = {
+        "data": "Ведомость: данные",
+        "address": "Ведомость: адрес",
+        "empty": "Ведомость: пусто",
+    }
+
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, header, footer, merges, widths, heights, styles):
+        self.header = header    # строки шапки: [(значение, формат) или None]
+        self.footer = footer    # строки подписи
+        self.merges = merges    # (min_row, min_col, max_row, max_col) в строках шаблона
+        self.widths = widths    # {столбец: ширина}
+        self.heights = heights  # {строка шаблона: высота}
+        self.styles = styles    # {"data": формат, ...} из именованных стилей
+
+    @property
+    def headers(self):
+        """Заголовки столбцов - каталог ведомости"""
+        return [value for value, _ in self.header[-1]]
+
+    @classmethod
+    def load(cls, path):
+        """Шаблон из файла .xlsx (разбирается один раз до изменения файла)"""
+        from openpyxl import load_workbook
+
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        with cls._cache_lock:
+            cached = cls._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        template = cls.from_workbook(load_workbook(path))
+        with cls._cache_lock:
+            cls._cache[path] = (mtime, template)
+        return template
+
+    @classmethod
+    def from_workbook(cls, wb):
+        from openpyxl.utils import column_index_from_string
+
+        ws = wb.worksheets[0]
+        title_row = next((cell.row for (cell,) in ws.iter_rows(max_col=1)
+                          if cell.value == cls.TITLE), None)
+        if title_row is None:
+            raise ValueError(
+                f'В шаблоне нет строки заголовков ("{cls.TITLE}" в столбце A)')
+
+        width = max((cell.column for cell in ws[title_row] if cell.value is not None))
+        if width < cls.TRAILING_COLUMNS + 3:
+            raise ValueError("В шаблоне слишком мало столбцов")
+        rows = [[cls.cell_entry(cell) for cell in row]
+                for row in ws.iter_rows(max_row=max(ws.max_row, title_row),
+                                        max_col=width)]
+        if any(entry is None for entry in rows[title_row - 1]):
+            raise ValueError("В строке заголовков шаблона есть пустые столбцы")
+
+        widths = {}
+        for dimension in ws.column_dimensions.values():
+            if dimension.customWidth:
+                # Загруженный из файла размер может охватывать диапазон столбцов
+                first = dimension.min or column_index_from_string(dimension.index)
+                for col in range(first, min(dimension.max or first, width) + 1):
+                    widths[col] = dimension.width
+        heights = {row: dimension.height
+                   for row, dimension in ws.row_dimensions.items()
+                   if dimension.height is not None}
+
+        named = {style.name: style for style in wb._named_styles}
+        styles = {role: cls.style_format(named[name])
+                  for role, name in cls.STYLE_NAMES.items() if name in named}
+
+        merges = [(r.min_row, r.min_col, r.max_row, r.max_col)
+                  for r in ws.merged_cells.ranges]
+        return cls(rows[:title_row], rows[title_row:], merges, widths, heights, styles)
+
+    @staticmethod
+    def style_format(style):
+        """Формат ячейки или стиля: набор объектов, общий для книг"""
+        return (copy(style.font), copy(style.border), copy(style.fill),
+                style.number_format, copy(style.protection), copy(style.alignment))
+
+    @classmethod
+    def cell_entry(cls, cell):
+        if cell.value is None and not cell.has_style:
+            return None
+        return cell.value, cls.style_format(cell)
+
+    def layout(self, headers):
+        """Размещение шаблона в столбцах ведомости с заголовками headers
+
+        Возвращает функцию "столбец шаблона -> столбец ведомости" и номер
+        последнего столбца камер в шаблоне, после которого вставлены модели
+        вне каталога.
+        """
+        extra = len(headers) - len(self.headers)
+        split = len(self.headers) - self.TRAILING_COLUMNS
+
+        def column(col):
+            return col + extra if col > split else col
+        return column, split
+
+    def rows(self, part, headers):
+        """Строки шапки или подписи в столбцах ведомости"""
+        _, split = self.layout(headers)
+        extra = len(headers) - len(self.headers)
+        rendered = []
+        for row in part:
+            # Вставленные столбцы - с оформлением последнего столбца камер
+            inserted = row[split - 1] and (None, row[split - 1][1])
+            rendered.append(row[:split] + [inserted] * extra + row[split:])
+        if part is self.header:
+            rendered[-1] = [(header, entry[1]) for header, entry
+                            in zip(headers, rendered[-1])]
+        return rendered
+
+    def merged_ranges(self, headers, footer_row):
+        """Объединения в адресах ведомости, подпись - со строки footer_row"""
+        from openpyxl.utils import get_column_letter
+
+        column, _ = self.layout(headers)
+        return [f"{get_column_letter(column(min_col))}{self.report_row(min_row, footer_row)}:"
+                f"{get_column_letter(column(max_col))}{self.report_row(max_row, footer_row)}"
+                for min_row, min_col, max_row, max_col in self.merges]
+
+    def column_widths(self, headers):
+        """Ширина столбцов ведомости {буква: ширина}"""
+        from openpyxl.utils import get_column_letter
+
+        column, split = self.layout(headers)
+        widths = {get_column_letter(column(col)): width
+                  for col, width in self.widths.items()}
+        if split in self.widths:
+            for col in range(split + 1, column(split + 1)):
+                widths[get_column_letter(col)] = self.widths[split]
+        return widths
+
+    def row_heights(self, footer_row):
+        """Высота строк ведомости {номер строки: высота}"""
+        return {self.report_row(row, footer_row): height
+                for row, height in self.heights.items()}
+
+    def report_row(self, number, footer_row):
+        """Номер строки ведомости для строки шаблона"""
+        if number <= len(self.header):
+            return number
+        return footer_row + number - len(self.header) - 1
+
+
+class ReportStyles:
+    """Реестр стилей одной книги ведомости
+
+    Стили ячеек данных и итогов регистрируются в книге как именованные
+    (NamedStyle) - один раз на книгу, до записи строк. Форматы шапки
+    и подписи шаблона переводятся в индексы таблиц стилей при первой
+    встрече, совпадающие со стилем данных - в этот стиль. Ячейка
+    получает готовый набор индексов в том же проходе, в котором
+    пишется значение: объекты Font, Border и Alignment на каждую
+    ячейку не создаются и не ищутся в таблицах стилей.
+    """
+
+    def __init__(self, ws, styles):
+        from openpyxl.styles import NamedStyle
+
+        self.ws = ws
+        self._formats = {}
+        self.roles = {}
+        for role, fmt in styles.items():
+            font, border, fill, number_format, protection, alignment = fmt
+            style = NamedStyle(ReportTemplate.STYLE_NAMES[role], font=font,
+                               border=border, fill=fill, number_format=number_format,
+                               protection=protection, alignment=alignment)
+            ws.parent.add_named_style(style)
+            self.roles[role] = style.as_tuple()
+            # Ячейки шапки с тем же оформлением получают именованный стиль
+            self._formats.setdefault(fmt, self.roles[role])
+
+    def format(self, fmt):
+        """Индексы формата без имени (ячейки шапки и подписи)"""
+        from openpyxl.cell import Cell
+
+        array = self._formats.get(fmt)
+        if array is None:
+            proto = Cell(self.ws)
+            (proto.font, proto.border, proto.fill, proto.number_format,
+             proto.protection, proto.alignment) = fmt
+            array = self._formats[fmt] = proto._style
+        return array
+
+    def resolve(self, row):
+        """Строка шаблона с индексами стилей вместо форматов"""
+        return [entry and (entry[0], self.format(entry[1])) for entry in row]
+
+
+class OpenpyxlReportWriter:
+    """Запись ведомости через openpyxl (по умолчанию)
+
+    streaming=False - книга целиком в памяти, True - write-only: строки
+    уходят во временный файл сразу, стили разделяются всеми ячейками.
+    """
+
+    def __init__(self, streaming=False):
+        self.streaming = streaming
+        self.wb = None
+        self.ws = None
+        self.row_idx = 0
+
+    def start(self, template, headers, footer_row, styles):
+        """Новая книга с размерами и объединениями, возвращает реестр стилей"""
+        from openpyxl import Workbook
+
+        if self.streaming:
+            self.wb = Workbook(write_only=True)
+            self.ws = self.wb.create_sheet("Лист1")
+        else:
+            self.wb = Workbook()
+            self.ws = self.wb.active
+            self.ws.title = "Лист1"
+
+        # Размеры строк и столбцов и объединения задаются до записи данных
+        ws = self.ws
+        for letter, width in template.column_widths(headers).items():
+            ws.column_dimensions[letter].width = width
+        for row, height in template.row_heights(footer_row).items():
+            ws.row_dimensions[row].height = height
+        for cell_range in template.merged_ranges(headers, footer_row):
+            if self.streaming:
+                ws.merged_cells.add(cell_range)
+            else:
+                ws.merge_cells(cell_range)
+        return ReportStyles(ws, styles)
+
+    def write_row(self, row):
+        """Следующая строка: [(значение, стиль) или None, ...]
+
+        openpyxl не сохраняет вычисленные значения формул, третий
+        элемент записи (значение формулы) пропускается.
+        """
+        from openpyxl.cell import Cell
+
+        self.row_idx += 1
+        if self.streaming:
+            self.ws.append([entry and Cell(self.ws, row=1, column=1, value=entry[0],
+                                           style_array=entry[1])
+                            for entry in row])
+            return
+        for col_idx, entry in enumerate(row, 1):
+            if entry is not None:
+                cell = self.ws.cell(row=self.row_idx, column=col_idx, value=entry[0])
+                cell._style = copy(entry[1])
+
+    def finish(self):
+        """Готовая книга (сохраняется методом save)"""
+        return self.wb
+
+
+class XlsxReportWriter:
+    """Запись ведомости через xlsxwriter - быстрее openpyxl на больших листах
+
+    Разметка та же: шапка и подпись из шаблона, объединения, повернутые
+    заголовки, границы и формулы итогов. При streaming=True строки пишутся
+    в режиме constant_memory - в памяти только текущая строка. Книга
+    собирается в памяти (BytesIO), при streaming=True - во временном
+    файле, и записывается в файл методом save.
+    Именованных стилей xlsxwriter не создает: ячейки данных получают
+    то же оформление напрямую.
+    """
+
+    BORDER_STYLES = {
+        "thin": 1, "medium": 2, "dashed": 3, "dotted": 4, "thick": 5,
+        "double": 6, "hair": 7, "mediumDashed": 8, "dashDot": 9,
+        "mediumDashDot": 10, "dashDotDot": 11, "mediumDashDotDot": 12,
+        "slantDashDot": 13,
+    }
+    HORIZONTAL = {"centerContinuous": "center_across"}
+    VERTICAL = {"center": "vcenter", "justify": "vjustify",
+                "distributed": "vdistributed"}
+    UNDERLINE = {"single": 1, "double": 2, "singleAccounting": 33,
+                 "doubleAccounting": 34}
+
+    def __init__(self, streaming=False):
+        self.streaming = streaming
+        self.buffer = None
+        self.wb = None
+        self.ws = None
+        self.row_idx = 0
+        self.heights = {}
+        self.roles = {}
+        self._formats = {}
+
+    def start(self, template, headers, footer_row, styles):
+        """Новая книга с размерами и объединениями, возвращает реестр стилей"""
+        import io
+        import xlsxwriter
+        from openpyxl.utils import column_index_from_string, range_boundaries
+
+        self.buffer = tempfile.TemporaryFile() if self.streaming else io.BytesIO()
+        self.wb = xlsxwriter.Workbook(self.buffer, {
+            "constant_memory": self.streaming,
+            "strings_to_urls": False,
+        })
+        self.ws = self.wb.add_worksheet("Лист1")
+
+        # Ширина в пикселях: столько же символов, сколько у openpyxl
+        # (ширина цифры шрифта Calibri 11 - 7 пикселей)
+        for letter, width in template.column_widths(headers).items():
+            col = column_index_from_string(letter) - 1
+            self.ws.set_column_pixels(col, col, round(width * 7))
+        self.heights = template.row_heights(footer_row)
+
+        # Ячейки внутри объединений пишутся как у openpyxl, со своим
+        # оформлением, поэтому merge_range заносит только сам диапазон:
+        # без значения и формата он не пишет ячеек и в режиме
+        # constant_memory не сбрасывает строки раньше времени
+        for cell_range in template.merged_ranges(headers, footer_row):
+            min_col, min_row, max_col, max_row = range_boundaries(cell_range)
+            self.ws.merge_range(min_row - 1, min_col - 1, max_row - 1, max_col - 1,
+                                None, None)
+
+        self.roles = {role: self.format(fmt) for role, fmt in styles.items()}
+        return self
+
+    def format(self, fmt):
+        fmt_format = self._formats.get(fmt)
+        if fmt_format is None:
+            fmt_format = self._formats[fmt] = self.wb.add_format(self.properties(fmt))
+        return fmt_format
+
+    def resolve(self, row):
+        """Строка шаблона с форматами xlsxwriter вместо форматов openpyxl"""
+        return [entry and (entry[0], self.format(entry[1])) for entry in row]
+
+    @classmethod
+    def properties(cls, fmt):
+        """Свойства формата xlsxwriter для формата ячейки openpyxl"""
+        font, border, fill, number_format, protection, alignment = fmt
+        props = {}
+
+        if font.b:
+            props["bold"] = True
+        if font.i:
+            props["italic"] = True
+        if font.strike:
+            props["font_strikeout"] = True
+        if font.u:
+            props["underline"] = cls.UNDERLINE.get(font.u, 1)
+        if font.vertAlign in ("superscript", "subscript"):
+            props["font_script"] = 1 if font.vertAlign == "superscript" else 2
+        if font.name and font.name != "Calibri":
+            props["font_name"] = font.name
+        if font.sz and float(font.sz) != 11:
+            props["font_size"] = float(font.sz)
+        if font.color is not None and font.color.type == "rgb":
+            props["font_color"] = cls.color(font.color)
+
+        for side in ("left", "right", "top", "bottom"):
+            edge = getattr(border, side)
+            if edge is not None and edge.style:
+                props[side] = cls.BORDER_STYLES.get(edge.style, 1)
+                if edge.color is not None and edge.color.type == "rgb":
+                    props[f"{side}_color"] = cls.color(edge.color)
+
+        if getattr(fill, "fill_type", None) == "solid" and fill.fgColor.type == "rgb":
+            props["pattern"] = 1
+            props["bg_color"] = cls.color(fill.fgColor)
+
+        if number_format and number_format != "General":
+            props["num_format"] = number_format
+        if protection.locked is False:
+            props["locked"] = False
+        if protection.hidden:
+            props["hidden"] = True
+
+        if alignment.horizontal and alignment.horizontal != "general":
+            props["align"] = cls.HORIZONTAL.get(alignment.horizontal, alignment.horizontal)
+        if alignment.vertical:
+            props["valign"] = cls.VERTICAL.get(alignment.vertical, alignment.vertical)
+        if alignment.wrap_text:
+            props["text_wrap"] = True
+        if alignment.shrink_to_fit:
+            props["shrink"] = True
+        if alignment.indent:
+            props["indent"] = int(alignment.indent)
+        rotation = int(alignment.textRotation or 0)
+        if rotation:
+            # openpyxl: 91-180 - поворот вниз, 255 - текст столбиком
+            props["rotation"] = 270 if rotation == 255 else (
+                rotation if rotation <= 90 else 90 - rotation)
+        return props
+
+    @staticmethod
+    def color(color):
+        return f"#{color.rgb[-6:]}"
+
+    def write_row(self, row):
+        """Следующая строка: [(значение, формат) или None, ...]
+
+        У формулы может быть третий элемент - вычисленное значение,
+        оно сохраняется в книге вместе с формулой.
+        """
+        row_idx = self.row_idx
+        self.row_idx += 1
+        height = self.heights.get(self.row_idx)
+        if height is not None:
+            self.ws.set_row(row_idx, height)
+        for col_idx, entry in enumerate(row):
+            if entry is not None:
+                self.ws.write(row_idx, col_idx, *entry)
+
+    def finish(self):
+        self.wb.close()
+        return self
+
+    def save(self, path):
+        self.buffer.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(self.buffer, f)
+
+
+class ReportSummary:
+    """Итоги ведомости: количество по моделям и по кодам объектов
+
+    Накапливается в том же проходе, в котором пишутся строки данных,
+    и сохраняется рядом с книгой файлом JSON (SUFFIX): пакетные
+    обработчики читают итоги без открытия книги и пересчета формул.
+    """
+
+    SUFFIX = ".summary.json"
+
+    def __init__(self):
+        self.addresses = 0
+        self.models = defaultdict(int)
+        self.objects = defaultdict(lambda: defaultdict(int))
+
+    def add(self, code, counts):
+        """Учет одной строки данных: код объекта и {модель: количество}"""
+        self.addresses += 1
+        object_models = self.objects[code]
+        for model, quantity in counts.items():
+            self.models[model] += quantity
+            object_models[model] += quantity
+
+    def as_dict(self, filename):
+        return {
+            "file": filename,
+            "addresses": self.addresses,
+            "total": sum(self.models.values()),
+            "models": dict(sorted(self.models.items())),
+            "objects": {
+                code: {"total": sum(models.values()),
+                       "models": dict(sorted(models.items()))}
+                for code, models in sorted(self.objects.items())},
+        }
+
+    def save(self, path, filename):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(filename), f, ensure_ascii=False, indent=2)
+
+
+class OutputNames:
+    """Файлы ведомостей, занятые заданиями этого процесса
+
+    Одиночные, потоковые и пакетные задания из очереди идут одновременно,
+    и у ведомостей по одному объекту одно имя. Задание занимает имя перед
+    записью, следующее задание с тем же именем получает Ведомость-1-2.xlsx,
+    а не перезаписывает чужой файл. Пока идет хотя бы одно задание (job),
+    записанные имена остаются занятыми: пакет, закончивший загрузку позже
+    одиночного задания, не заменит его ведомость. Когда все задания
+    закончились, имена освобождаются, и повторный запуск, как и раньше,
+    заменяет прежнюю ведомость.
+    """
+
+    _lock = threading.Lock()
+    _reserved = set()
+    _active = 0
+
+    @classmethod
+    @contextmanager
+    def job(cls):
+        """Время выполнения одного задания: with OutputNames.job(): ..."""
+        with cls._lock:
+            cls._active += 1
+        try:
+            yield
+        finally:
+            with cls._lock:
+                cls._active -= 1
+                if not cls._active:
+                    cls._reserved.clear()
+
+    @classmethod
+    def reserve(cls, output_dir, filename):
+        """Путь к свободному файлу ведомости в output_dir"""
+        stem, suffix = os.path.splitext(filename)
+        path = Path(output_dir) / filename
+        counter = 2
+        with cls._lock:
+            while os.path.abspath(path) in cls._reserved:
+                path = Path(output_dir) / f"{stem}-{counter}{suffix}"
+                counter += 1
+            cls._reserved.add(os.path.abspath(path))
+        return path
+
+    @classmethod
+    def release(cls, path):
+        """Освобождение имени; при идущих заданиях - после последнего из них"""
+        with cls._lock:
+            if not cls._active:
+                cls._reserved.discard(os.path.abspath(path))
+
+    @staticmethod
+    def partial(path):
+        """Временный файл, в который пишется path
+
+        Имя свое у каждого потока и процесса - одновременные задания
+        не пишут в один файл.
+        """
+        path = Path(path)
+        return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.part")
+
+    @staticmethod
+    def remove_partial(output_dir):
+        """Удаление недописанных файлов этого процесса и его процессов сборки
+
+        Вызывается при закрытии окна после остановки очереди: задание,
+        не успевшее завершиться, остановится вместе с процессом и свой
+        временный файл уже не удалит. Файлы других запущенных копий
+        программы не трогаются. Возвращает число удаленных файлов.
+        """
+        pids = {os.getpid()} | {child.pid for child in multiprocessing.active_children()}
+        removed = 0
+        for pid in pids:
+            for path in Path(output_dir).glob(f"*.{pid}-*.part"):
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass  # файл еще открыт (Windows) или уже удален
+        return removed
+
+
+class ExcelReportGenerator:
+    """Класс для генерации Excel отчета"""
+
+    # Заголовки столбцов (строка 4)
+    HEADERS = [
+        "Код объекта",
+        "АДРЕС",
+        "(2 Мп) TIANDY TC-C32GS-I5EYCSD (2.8mm/V4.2)",
+        "(2МР) IPC2122LB-ADF28KM-G",
+        "DS-2CD1043G0-IUVSD 4mm",
+        "DS-2CD2123G2-IUVSD 4mm",
+        "DS-2CD2T23G2-2IUVSD",
+        "DS-2CD2T23G2-2IUVSD 4mm",
+        "DS-2CD3021G0-IUVSC 4mm",
+        "DS-2CD3123G2-IUUVSC 6mm",
+        "DS-2CD3626G2T-IZSUVSC (7-35mm)",
+        "DS-2CD3626G2T-IZSUVSC 7-35mm",
+        "DS-2CD3726G2T-IZSUVSC (7-35mm)",
+        "DS-2DE5425IW-AEUVSC",
+        "HIKVISION DS-2DE5425IW-A E (T5)",
+        "Uniview IPC2122LE-ADF28KMC-WL",
+        "Коммутатор ZTO L2S1900-4TP2S",
+        "Коммутатор ZTO L2S 1900-8TP2S",
+        "Коммутатор ZTO L2S 1900-16TP2S",
+        "Инжектор питания (PoE) OPL-POE-Ex802 3at-100-IP67",
+        "Удлинитель PoE ZTO POEEXT 100"
+    ]
+
+    # Как часто запись строк сообщает о прогрессе
+    PROGRESS_ROWS = 1000
+
+    # Встроенные шаблоны (значение template вместо пути к файлу): qt - вид
+    # ведомости окна Qt до общего движка (только перенос текста в ячейках,
+    # узкие столбцы оборудования)
+    BUILTIN_TEMPLATES = ("default", "qt")
+    _builtin_templates = {}
+
+    # Итоговая строка: готовые числа или формулы SUM (параметр totals)
+    TOTALS_MODES = ("values", "formulas")
+
+    # Способы записи книги (параметр writer)
+    WRITERS = {
+        "openpyxl": OpenpyxlReportWriter,
+        "xlsxwriter": XlsxReportWriter,
+    }
+
+    def __init__(self, address_data, camera_models, object_codes, callback,
+                 streaming=False, output_dir="output", metrics=None, reporter=None,
+                 cancel=None, template=None, writer="openpyxl", totals="values"):
+        self.address_data = address_data
+        self.camera_models = camera_models
+        self.object_codes = object_codes
+        self.callback = callback
+        self.streaming = streaming
+        self.output_dir = output_dir
+        self.metrics = metrics
+        self.reporter = reporter
+        self.cancel = cancel
+        self.template = template
+        self.writer = writer
+        self.totals = totals
+        self.summary = None
+
+    def run(self):
+        try:
+            filename = self.generate()
+            self.callback(filename, None)
+        except Exception as e:
+            self.callback(None, str(e))
+
+    def generate(self):
+        """Построение и сохранение ведомости с замерами и прогрессом этапов"""
+        rows = len(self.address_data)
+        with measure_stage(self.metrics, "build"):
+            report = self.create_report()
+        self.report_progress("build", rows, rows)
+        self.report_progress("save", 0, rows)
+        with measure_stage(self.metrics, "save"):
+            filename = self.save_report(report)
+        self.report_progress("save", rows, rows)
+        return filename
+
+    def report_progress(self, stage, done, total=None):
+        self.check_cancelled()
+        if self.reporter is not None:
+            self.reporter.update(stage, done, total)
+
+    def check_cancelled(self):
+        if self.cancel is not None:
+            self.cancel.check()
+
+    @classmethod
+    def template_workbook(cls, name="default"):
+        """Книга встроенного шаблона name: шапка по каталогу HEADERS, подпись,
+        именованные стили ячеек данных и ширина столбцов"""
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Font, Border, Side, NamedStyle
+        from openpyxl.styles.fonts import DEFAULT_FONT
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Лист1"
+
+        # Стили оформления
+        header_style = Font(bold=True)
+        center_alignment = Alignment(
+            horizontal="center", vertical="center", wrap_text=True)
+        vertical_alignment = Alignment(
+            textRotation=90, horizontal="center", vertical="center", wrap_text=True)
+        border_style = Border(
+            left=Side(style='thin'),
+            right=Side(style='thin'),
+            top=Side(style='thin'),
+            bottom=Side(style='thin')
+        )
+
+        # 21 столбец каталога (A-U)
+        last_col = len(cls.HEADERS)
+        last_letter = get_column_letter(last_col)
+        switch_col = last_col - 4  # первый столбец коммутаторов (Q)
+
+        # Выравнивание по центру для строк 1-3
+        for row in range(1, 4):
+            for col in range(1, last_col + 1):
+                ws.cell(row=row, column=col).alignment = center_alignment
+
+        # Основной заголовок (A1:U1)
+        ws.merge_cells(f'A1:{last_letter}1')
+        ws['A1'] = "Ведомость установленного и замонтированного оборудования по объекту:"
+        ws['A1'].font = header_style
+
+        # Название проекта (A2:U2)
+        ws.merge_cells(f'A2:{last_letter}2')
+        ws['A2'] = "Реконструкция местных линий связи к объектам РСМОБ г. Бреста перекрестки, 8 этап"
+        ws['A2'].font = header_style
+
+        # Группы оборудования (строка 3)
+        ws.merge_cells('C3:M3')
+        c3 = ws['C3']
+        c3.value = "Видеокамеры"
+        c3.font = Font(bold=True)
+        c3.alignment = center_alignment
+
+        ws.merge_cells(start_row=3, start_column=switch_col,
+                       end_row=3, end_column=switch_col + 2)
+        q3 = ws.cell(row=3, column=switch_col)
+        q3.value = "Коммутаторы"
+        q3.font = Font(bold=True)
+        q3.alignment = center_alignment
+
+        ws.merge_cells(start_row=3, start_column=switch_col + 3,
+                       end_row=3, end_column=last_col)
+        t3 = ws.cell(row=3, column=switch_col + 3)
+        t3.value = "Удлинитель"
+        t3.font = Font(bold=True)
+        t3.alignment = center_alignment
+
+        # Заполняем строку 4 с разным выравниванием
+        for col, header in enumerate(cls.HEADERS, 1):
+            cell = ws.cell(row=4, column=col, value=header)
+            cell.font = header_style
+            cell.alignment = vertical_alignment if col >= 3 else center_alignment
+
+        ws.row_dimensions[4].height = 150
+
+        # Подпись (в ведомости - под итоговой строкой)
+        ws.merge_cells(f'A5:{last_letter}5')
+        ws['A5'] = "Подготовил: ведущий инженер ЛСС и АУ А.И. Козей"
+        ws['A5'].alignment = center_alignment
+
+        # Форматирование границ для всех ячеек
+        for row in ws.iter_rows():
+            for cell in row:
+                cell.border = border_style
+
+        # Ширина столбцов
+        ws.column_dimensions['A'].width = 8
+        ws.column_dimensions['B'].width = 50
+        for col in range(3, last_col + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 8
+
+        alignments = {"data": center_alignment, "address": Alignment(wrap_text=True),
+                      "empty": Alignment()}
+        if name == "qt":
+            # У всех ячеек только перенос текста, названия групп обычным
+            # шрифтом, столбцы оборудования уже
+            for row in ws.iter_rows():
+                for cell in row:
+                    cell.alignment = Alignment(wrap_text=True)
+            for cell in (c3, q3, t3):
+                cell.font = Font()
+            for col in range(3, last_col + 1):
+                ws.column_dimensions[get_column_letter(col)].width = 5
+            alignments = dict.fromkeys(alignments, Alignment(wrap_text=True))
+
+        # Ячейки данных и итогов: значения, адрес, пустые ячейки камер
+        for role, alignment in alignments.items():
+            wb.add_named_style(NamedStyle(
+                ReportTemplate.STYLE_NAMES[role], font=copy(DEFAULT_FONT),
+                border=border_style, alignment=alignment))
+        return wb
+
+    @classmethod
+    def default_template(cls, name="default"):
+        """Встроенный шаблон (разбирается при первом использовании)"""
+        if name not in cls._builtin_templates:
+            cls._builtin_templates[name] = ReportTemplate.from_workbook(
+                cls.template_workbook(name))
+        return cls._builtin_templates[name]
+
+    @classmethod
+    def write_template(cls, path, name="default"):
+        """Сохранение встроенного шаблона в файл - заготовка своего шаблона"""
+        cls.template_workbook(name).save(path)
+
+    def load_template(self):
+        """Шаблон из файла self.template (или встроенный) и стили ячеек данных
+
+        Стили, которых нет в файле шаблона, берутся из встроенного.
+        """
+        if self.template in self.BUILTIN_TEMPLATES:
+            builtin = self.default_template(self.template)
+            return builtin, builtin.styles
+        default = self.default_template()
+        if not self.template:
+            return default, default.styles
+        template = ReportTemplate.load(self.template)
+        return template, {**default.styles, **template.styles}
+
+    def column_layout(self, catalogue=None):
+        """Заголовки столбцов и индекс "модель -> номер столбца"
+
+        Столбцы каталога (по умолчанию HEADERS) сохраняют свой порядок.
+        Модели камер, которых нет в каталоге, добавляются после камер каталога
+        перед коммутаторами, поэтому блок коммутаторов и удлинителей
+        сдвигается вправо.
+        """
+        catalogue = catalogue or self.HEADERS
+        split = len(catalogue) - ReportTemplate.TRAILING_COLUMNS
+        known = set(catalogue)
+        extra_models = [model for model in self.camera_models
+                        if model not in known]
+        headers = catalogue[:split] + extra_models + catalogue[split:]
+
+        camera_headers = headers[:split + len(extra_models)]
+        model_columns = {model: col
+                         for col, model in enumerate(camera_headers, 1) if col >= 3}
+        return headers, model_columns
+
+    def report_layout(self):
+        """Шаблон, стили данных, заголовки столбцов и номер строки подписи"""
+        template, styles = self.load_template()
+        headers, model_columns = self.column_layout(template.headers)
+        footer_row = len(template.header) + len(self.address_data) + 2
+        return template, styles, headers, model_columns, footer_row
+
+    def report_rows(self, registry, template, headers, model_columns):
+        """Строки ведомости по порядку: [(значение, стиль) или None, ...]
+
+        Шапка и подпись берутся из шаблона, между ними - строки данных
+        и итогов. Стили - из реестра книги, который вернул способ записи
+        (для openpyxl - ReportStyles): все ячейки одного вида разделяют
+        один стиль.
+
+        Итоги по моделям накапливаются в self.summary при записи строк
+        данных. При totals="values" итоговая строка содержит готовые числа
+        (их видят openpyxl и pandas), при totals="formulas" - формулы SUM
+        с вычисленным значением третьим элементом записи.
+        """
+        from openpyxl.utils import get_column_letter
+
+        if self.totals not in self.TOTALS_MODES:
+            raise ValueError(f"Неизвестный вид итогов ведомости: {self.totals}")
+        summary = self.summary = ReportSummary()
+        data_style = registry.roles["data"]
+        address_style = registry.roles["address"]
+        empty_style = registry.roles["empty"]
+        last_col = len(headers)
+        switch_col = last_col - ReportTemplate.TRAILING_COLUMNS + 1
+        first_row = len(template.header) + 1
+
+        for row in template.rows(template.header, headers):
+            yield registry.resolve(row)
+
+        total = len(self.address_data)
+        for number, (address, counts) in enumerate(self.address_data.items(), 1):
+            code = self.object_codes.get(address, "")
+            summary.add(code, counts)
+            row = [(code, data_style), (address, address_style)]
+            row.extend([(None, empty_style)] * (switch_col - 3))
+            for model, quantity in counts.items():
+                col_idx = model_columns.get(model)
+                if col_idx is not None:
+                    row[col_idx - 1] = (quantity, data_style)
+            # Коммутаторы и удлинители оставляем пустыми
+            row.extend([("", data_style)] * (last_col - switch_col + 1))
+            yield row
+            if not number % self.PROGRESS_ROWS:
+                self.report_progress("build", number, total)
+
+        # Итоговая строка: суммы столбцов уже известны из summary
+        column_totals = [0] * (last_col + 1)
+        for model, col_idx in model_columns.items():
+            column_totals[col_idx] = summary.models.get(model, 0)
+        totals_row = [("ИТОГО:", data_style), ("", data_style)]
+        if self.totals == "formulas":
+            last_row = first_row + total - 1
+            totals_row.extend(
+                (f"=SUM({letter}{first_row}:{letter}{last_row})", data_style,
+                 column_totals[col])
+                for col, letter in enumerate(map(get_column_letter, range(3, last_col + 1)), 3))
+        else:
+            totals_row.extend((column_totals[col], data_style)
+                              for col in range(3, last_col + 1))
+        yield totals_row
+
+        for row in template.rows(template.footer, headers):
+            yield registry.resolve(row)
+
+    def make_writer(self):
+        """Способ записи книги по имени self.writer"""
+        writer_class = self.WRITERS.get(self.writer)
+        if writer_class is None:
+            raise ValueError(f"Неизвестный способ записи ведомости: {self.writer}")
+        return writer_class(streaming=self.streaming)
+
+    def create_report(self, writer=None):
+        """Сборка ведомости: строки report_rows передаются способу записи
+
+        Возвращает книгу с методом save. Разметка одинакова для всех
+        способов записи.
+        """
+        writer = writer or self.make_writer()
+        template, styles, headers, model_columns, footer_row = self.report_layout()
+        registry = writer.start(template, headers, footer_row, styles)
+        for row in self.report_rows(registry, template, headers, model_columns):
+            writer.write_row(row)
+        return writer.finish()
+
+    def create_excel_report(self):
+        """Создание Excel файла с отчетом по шаблону"""
+        return self.create_report(OpenpyxlReportWriter())
+
+    def create_streaming_report(self):
+        """Создание Excel файла в потоковом режиме (write-only)
+
+        Строки записываются по мере формирования, стили создаются один раз
+        и разделяются всеми ячейками. Разметка совпадает с create_excel_report.
+        """
+        return self.create_report(OpenpyxlReportWriter(streaming=True))
+
+    @staticmethod
+    def report_filename(object_codes):
+        """Имя файла ведомости по коду первого объекта"""
+        first_code = next(iter(object_codes.values()),
+                          "") if object_codes else ""
+        id_number = first_code[1] if len(
+            first_code) > 1 and first_code[1].isdigit() else ""
+
+        return f"Ведомость-{id_number}.xlsx" if id_number else f"Ведомость-{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+    def save_report(self, report, filename=None):
+        """Сохранение отчета в файл"""
+        output_dir = Path(self.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        filename = filename or self.report_filename(self.object_codes)
+        filepath = OutputNames.reserve(output_dir, filename)
+        try:
+            return self.write_report_file(report, filepath)
+        finally:
+            OutputNames.release(filepath)
+
+    def write_report_file(self, report, filepath):
+        """Запись книги и итогов в занятый файл filepath"""
+        # Книга пишется во временный файл: при отмене или ошибке в папке
+        # отчетов не остается недописанной ведомости
+        partial = OutputNames.partial(filepath)
+        try:
+            report.save(partial)
+            self.check_cancelled()
+            os.replace(partial, filepath)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        if self.summary is not None:
+            self.save_summary(filepath)
+        return str(filepath)
+
+    def save_summary(self, filepath):
+        """Итоги рядом с книгой: Ведомость-1.xlsx -> Ведомость-1.summary.json"""
+        path = filepath.with_suffix(ReportSummary.SUFFIX)
+        partial = OutputNames.partial(path)
+        try:
+            self.summary.save(partial, filepath.name)
+            os.replace(partial, path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return path
@@ -0,0 +1,322 @@
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from .jobs import JobCancelled
+from .metrics import PipelineMetrics, measure_stage
+from .sheets import GoogleSheetsWorker
+from .sources import SheetsClientPool, GspreadSource
+from .report import ExcelReportGenerator, ReportSummary, OutputNames
+from .stream import StreamedCounts
+
+
+def load_report_data(spreadsheet_url, credentials_file, sheet_name, metrics=None,
+                     reporter=None, cancel=None, log=None, **fetch_options):
+    """Загрузка и агрегация листа: данные ведомости и сведения о загрузке
+
+    fetch_options передаются GoogleSheetsWorker (source, cache, pool,
+    force_refresh, aggregation, fetch_mode, sync), сообщения загрузки
+    уходят в log.
+    Возвращает (address_data, camera_models, object_codes) и сведения
+    о запуске для журнала метрик.
+    """
+    worker = GoogleSheetsWorker(spreadsheet_url, credentials_file, sheet_name, None,
+                                metrics=metrics, reporter=reporter, cancel=cancel,
+                                log=log, **fetch_options)
+    raw_data = worker.get_google_sheets_data()
+    address_data, camera_models, object_codes = worker.aggregate(raw_data)
+
+    context = {"rows": worker.tail_offset + worker.count_rows(raw_data),
+               "addresses": len(address_data),
+               "models": len(camera_models)}
+    if worker.sync is not None:
+        context["changed_blocks"] = worker.sync.last_stats["changed_blocks"]
+        context["blocks"] = worker.sync.last_stats["blocks"]
+        context["fetched_rows"] = worker.count_rows(raw_data)
+    return (address_data, camera_models, object_codes), context
+
+
+def render_report(address_data, camera_models, object_codes, streaming=False,
+                  output_dir="output", metrics=None, reporter=None, cancel=None,
+                  template=None, writer="openpyxl", totals="values"):
+    """Построение и сохранение ведомости, возвращает путь к файлу"""
+    generator = ExcelReportGenerator(address_data, camera_models, object_codes, None,
+                                     streaming=streaming, output_dir=output_dir,
+                                     metrics=metrics, reporter=reporter, cancel=cancel,
+                                     template=template, writer=writer, totals=totals)
+    return generator.generate()
+
+
+def run_report(spreadsheet_url, credentials_file, sheet_name, streaming=False,
+               output_dir="output", metrics=None, reporter=None, cancel=None, log=None,
+               template=None, writer="openpyxl", totals="values", **fetch_options):
+    """Одна ведомость целиком в текущем потоке: загрузка, агрегация, запись
+
+    Параметры загрузки - как у load_report_data, построения - как
+    у render_report. Возвращает путь к файлу и сведения о запуске
+    для журнала метрик.
+    """
+    with OutputNames.job():
+        data, context = load_report_data(spreadsheet_url, credentials_file, sheet_name,
+                                         metrics=metrics, reporter=reporter, cancel=cancel,
+                                         log=log, **fetch_options)
+        filename = render_report(*data, streaming=streaming, output_dir=output_dir,
+                                 metrics=metrics, reporter=reporter, cancel=cancel,
+                                 template=template, writer=writer, totals=totals)
+    return filename, context
+
+
+def stream_report(spreadsheet_url, credentials_file, sheet_name, group_by="address",
+                  output_dir="output", metrics=None, reporter=None, cancel=None, log=None,
+                  template=None, writer="openpyxl", totals="values", source=None, pool=None):
+    """Потоковая ведомость по листу, упорядоченному по адресу или коду объекта
+
+    Лист читается постранично два раза (см. StreamedCounts): первый проход
+    (этап fetch) узнает модели и число адресов, во втором (этап build)
+    строки страницы сразу группируются, и законченные группы уходят
+    в запись книги (streaming=True способа записи). В памяти - страница
+    листа, текущая группа, итоги по объектам для .summary.json и набор
+    адресов для проверки порядка (см. AddressGroups), а не весь лист
+    и не итоги по всем адресам. Кэш снимков и инкрементальная агрегация
+    в этом режиме не используются.
+    Возвращает путь к файлу и сведения о запуске для журнала метрик.
+    """
+    with OutputNames.job():
+        worker = GoogleSheetsWorker(spreadsheet_url, credentials_file, sheet_name, None,
+                                    metrics=metrics, reporter=reporter, cancel=cancel,
+                                    log=log, source=source, pool=pool)
+        worksheet = worker.open_worksheet()
+
+        def rows():
+            return worker.stream_rows(worksheet)
+
+        with measure_stage(metrics, "fetch"):
+            address_data = StreamedCounts.scan(rows, group_by)
+        if log is not None:
+            log(f"Первый проход: {address_data.row_count} строк, {len(address_data)} адресов, "
+                f"{len(address_data.models)} моделей камер")
+
+        generator = ExcelReportGenerator(
+            address_data, address_data.camera_models(), address_data.object_codes, None,
+            streaming=True, output_dir=output_dir, metrics=metrics, reporter=reporter,
+            cancel=cancel, template=template, writer=writer, totals=totals)
+        total = len(address_data)
+        with measure_stage(metrics, "build"):
+            report = generator.create_report()
+        generator.report_progress("build", total, total)
+        generator.report_progress("save", 0, total)
+        with measure_stage(metrics, "save"):
+            filename = generator.save_report(
+                report, ExcelReportGenerator.report_filename(address_data.first_codes))
+        generator.report_progress("save", total, total)
+
+        context = {"rows": address_data.row_count,
+                   "addresses": total,
+                   "models": len(address_data.models),
+                   "stream_by": group_by}
+    return filename, context
+
+
+def parse_batch_targets(text, default_url, default_sheet):
+    """Разбор списка целей пакетного запуска
+
+    Каждая строка - "URL;Имя листа". Пустой URL заменяется текущим,
+    пустое имя листа - текущим листом, "*" означает все листы таблицы.
+    """
+    targets = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        url, _, sheet = line.partition(";")
+        targets.append((url.strip() or default_url,
+                        sheet.strip() or default_sheet))
+    return targets
+
+
+def build_report_file(address_data, camera_models, object_codes, streaming, filename,
+                      output_dir="output", template=None, writer="openpyxl",
+                      totals="values"):
+    """Построение и сохранение ведомости (выполняется в пуле процессов)
+
+    Возвращает путь к файлу и замеры этапов build/save для журнала метрик.
+    """
+    metrics = PipelineMetrics()
+    generator = ExcelReportGenerator(
+        address_data, camera_models, object_codes, None, streaming=streaming,
+        output_dir=output_dir, template=template, writer=writer, totals=totals)
+    with metrics.stage("build"):
+        report = generator.create_report()
+    with metrics.stage("save"):
+        filepath = generator.save_report(report, filename)
+    return filepath, metrics.stages
+
+
+class BatchReportRunner:
+    """Пакетное формирование ведомостей по нескольким листам
+
+    Данные листов загружаются параллельно в пуле потоков (не более
+    fetch_workers одновременных запросов), а книги Excel собираются в пуле
+    процессов, чтобы сериализация openpyxl использовала все ядра.
+    """
+
+    def __init__(self, targets, credentials_file, callback, log,
+                 cache=None, pool=None, streaming=False,
+                 fetch_workers=4, build_workers=None, output_dir="output",
+                 force_refresh=False, aggregation="python",
+                 fetch_mode="columns", sync=None, metrics_file=None, reporter=None,
+                 cancel=None, template=None, writer="openpyxl", totals="values",
+                 source=None):
+        self.targets = targets
+        self.credentials_file = credentials_file
+        self.callback = callback
+        self.log = log
+        self.cache = cache
+        self.pool = pool if pool is not None else SheetsClientPool()
+        self.source = source if source is not None else GspreadSource(credentials_file, self.pool)
+        self.streaming = streaming
+        self.fetch_workers = fetch_workers
+        self.build_workers = build_workers
+        self.output_dir = output_dir
+        self.force_refresh = force_refresh
+        self.aggregation = aggregation
+        self.fetch_mode = fetch_mode
+        self.sync = sync
+        self.metrics_file = metrics_file
+        self.reporter = reporter
+        self.cancel = cancel
+        self.template = template
+        self.writer = writer
+        self.totals = totals
+
+    def run(self):
+        try:
+            filenames, failed = self.execute()
+            self.callback(filenames, failed, None)
+        except Exception as e:
+            self.callback(None, None, str(e))
+
+    def execute(self):
+        """Весь пакет в текущем потоке: (созданные файлы, цели с ошибками)"""
+        with OutputNames.job():
+            targets = self.expand_targets()
+            self.log(f"Пакетный запуск: {len(targets)} листов")
+            return self.process_targets(targets)
+
+    def expand_targets(self):
+        """Подстановка всех листов таблицы вместо "*" """
+        targets = []
+        for url, sheet in self.targets:
+            self.check_cancelled()
+            if sheet == "*":
+                targets.extend((url, title) for title in self.source.sheet_names(url))
+            else:
+                targets.append((url, sheet))
+        return targets
+
+    def fetch_target(self, url, sheet, metrics):
+        data, _ = load_report_data(url, self.credentials_file, sheet,
+                                   metrics=metrics, cancel=self.cancel,
+                                   source=self.source, cache=self.cache,
+                                   force_refresh=self.force_refresh,
+                                   aggregation=self.aggregation,
+                                   fetch_mode=self.fetch_mode, sync=self.sync)
+        return data
+
+    def process_targets(self, targets):
+        filenames = []
+        failed = []
+        reserved = []
+        builds = {}
+
+        try:
+            # Процессы сборки запускаются заново (spawn, как в Windows), а не
+            # ответвляются (fork): копия процесса в момент, когда поток загрузки
+            # импортирует модуль, наследует занятую блокировку импорта и зависает
+            with ThreadPoolExecutor(max_workers=self.fetch_workers) as fetch_pool, \
+                    ProcessPoolExecutor(max_workers=self.build_workers,
+                                        mp_context=multiprocessing.get_context("spawn")) \
+                    as build_pool:
+                try:
+                    fetches = {}
+                    for url, sheet in targets:
+                        metrics = PipelineMetrics(metrics_file=self.metrics_file)
+                        future = fetch_pool.submit(self.fetch_target, url, sheet, metrics)
+                        fetches[future] = (url, sheet, metrics)
+
+                    for future in as_completed(fetches):
+                        self.check_cancelled()
+                        url, sheet, metrics = fetches[future]
+                        try:
+                            address_data, camera_models, object_codes = future.result()
+                        except Exception as e:
+                            self.log(f"[{sheet}] Ошибка загрузки: {e}")
+                            metrics.finish(mode="batch", url=url, sheet=sheet, error=str(e))
+                            failed.append((url, sheet))
+                            self.report_progress(len(filenames) + len(failed), len(targets))
+                            continue
+
+                        self.log(f"[{sheet}] Загружено {len(address_data)} адресов, "
+                                 f"{len(camera_models)} моделей камер")
+                        filepath = OutputNames.reserve(
+                            self.output_dir, ExcelReportGenerator.report_filename(object_codes))
+                        reserved.append(filepath)
+                        filename = filepath.name
+                        # CameraCounts передается в процесс сборки как есть:
+                        # списки строк и массивы количеств
+                        build = build_pool.submit(
+                            build_report_file, address_data, camera_models,
+                            object_codes, self.streaming, filename, self.output_dir,
+                            self.template, self.writer, self.totals)
+                        builds[build] = (url, sheet, metrics)
+
+                    for future in as_completed(builds):
+                        self.check_cancelled()
+                        url, sheet, metrics = builds.pop(future)
+                        try:
+                            filename, stages = future.result()
+                        except Exception as e:
+                            self.log(f"[{sheet}] Ошибка создания отчета: {e}")
+                            metrics.finish(mode="batch", url=url, sheet=sheet, error=str(e))
+                            failed.append((url, sheet))
+                            self.report_progress(len(filenames) + len(failed), len(targets))
+                            continue
+                        filenames.append(filename)
+                        metrics.merge(stages)
+                        metrics.finish(mode="batch", url=url, sheet=sheet, file=filename)
+                        self.log(f"[{sheet}] Отчет создан: {filename}")
+                        self.log(f"[{sheet}] {metrics.summary()}")
+                        self.report_progress(len(filenames) + len(failed), len(targets))
+                except JobCancelled:
+                    # Ожидающие загрузки и сборки не запускаются. Идущие сборки
+                    # в других процессах не прервать: их дожидаемся, чтобы
+                    # удалить результат, а не оставить файл после отмены
+                    fetch_pool.shutdown(wait=False, cancel_futures=True)
+                    build_pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+        except JobCancelled:
+            self.discard_builds(builds)
+            self.log(f"Пакет отменен, готовых отчетов: {len(filenames)}")
+            raise
+        finally:
+            for filepath in reserved:
+                OutputNames.release(filepath)
+
+        return filenames, failed
+
+    def report_progress(self, done, total):
+        if self.reporter is not None:
+            self.reporter.update("batch", done, total)
+
+    def check_cancelled(self):
+        if self.cancel is not None:
+            self.cancel.check()
+
+    @staticmethod
+    def discard_builds(builds):
+        """Удаление ведомостей, собранных уже после отмены пакета"""
+        for future in builds:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                filepath, _ = future.result()
+                Path(filepath).unlink(missing_ok=True)
+                Path(filepath).with_suffix(ReportSummary.SUFFIX).unlink(missing_ok=True)
@@ -0,0 +1,295 @@
+import os
+
+from .jobs import JobQueue, ProgressReporter
+from .metrics import PipelineMetrics
+from .sheets import SheetCache, IncrementalAggregator
+from .sources import SheetsClientPool, make_source
+from .report import OutputNames
+from .runner import run_report, stream_report, parse_batch_targets, BatchReportRunner
+
+
+class PipelineConfig:
+    """Настройки формирования ведомостей из окружения (файл .env)
+
+    Одни и те же переменные читают оба окна и командная строка.
+    Именованные параметры заменяют прочитанные значения (так командная
+    строка передает свои аргументы), template - шаблон по умолчанию,
+    если REPORT_TEMPLATE не задан.
+    """
+
+    def __init__(self, environ=None, template=None, **overrides):
+        env = os.environ if environ is None else environ
+        self.spreadsheet_url = env.get("GOOGLE_SHEETS_URL", "")
+        self.credentials_file = env.get("CREDENTIALS_JSON", "credentials.json")
+        self.sheet_name = env.get("SHEET_NAME", "Камеры")
+        self.output_dir = "output"
+        # Кэш снимков листов и состояние инкрементальной агрегации
+        self.cache_dir = env.get("SHEETS_CACHE_DIR", "cache")
+        self.cache_ttl = float(env.get("SHEETS_CACHE_TTL", 24 * 60 * 60))
+        self.cache_max_bytes = int(float(env.get("SHEETS_CACHE_MAX_MB", 100)) * 1024 * 1024)
+        # Источник листов: gspread (по умолчанию), file - локальный файл
+        # CSV/XLSX/JSON вместо URL, http - локальная подмена API для замеров
+        self.source = env.get("SHEETS_SOURCE", "gspread")
+        self.fetch_workers = int(env.get("BATCH_FETCH_WORKERS", 4))
+        # Агрегация: python (по умолчанию), pandas или auto (по размеру таблицы)
+        self.aggregation = env.get("AGGREGATION_BACKEND", "python")
+        # Загрузка: columns (только нужные столбцы) или records (весь лист)
+        self.fetch_mode = env.get("SHEETS_FETCH_MODE", "columns")
+        # Инкрементальный пересчет только измененных блоков строк листа
+        self.incremental = env.get("SHEETS_INCREMENTAL", "0") == "1"
+        # Замеры этапов: файл JSON Lines (пустое значение отключает запись)
+        self.metrics_file = env.get(
+            "PIPELINE_METRICS_FILE", os.path.join("metrics", "pipeline.jsonl")) or None
+        self.profile = env.get("PIPELINE_PROFILE", "0") == "1"
+        # Шаблон оформления ведомости (.xlsx или имя встроенного шаблона)
+        self.template = env.get("REPORT_TEMPLATE") or template
+        # Способ записи книги: openpyxl или xlsxwriter (быстрее на больших листах)
+        self.writer = env.get("REPORT_WRITER", "openpyxl")
+        # Итоговая строка: готовые числа (values) или формулы SUM (formulas)
+        self.totals = env.get("REPORT_TOTALS", "values")
+        # Потоковая ведомость по листу, упорядоченному по адресу (address)
+        # или коду объекта (code); пустое значение - обычный режим
+        self.stream_by = env.get("REPORT_STREAM_BY") or None
+        # Окна: одновременные задания очереди и журнал
+        self.job_concurrency = int(env.get("JOB_CONCURRENCY", 2))
+        self.log_file = env.get("LOG_FILE", os.path.join("logs", "app.log")) or None
+        self.log_max_lines = int(env.get("LOG_MAX_LINES", 5000))
+
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise TypeError(f"Неизвестный параметр настроек: {name}")
+            setattr(self, name, value)
+
+    def missing_credentials(self, credentials_file):
+        """Ключи сервисного аккаунта нужны только для Google Sheets"""
+        return self.source == "gspread" and not credentials_file
+
+    @classmethod
+    def load(cls, **kwargs):
+        """Настройки из .env и переменных окружения"""
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        return cls(**kwargs)
+
+
+class ReportService:
+    """Запуск ведомостей с общими на сеанс кэшем, клиентами и синхронизацией
+
+    Одиночная (или потоковая при config.stream_by) ведомость и пакет
+    запускаются одинаково из окон и командной строки; итог каждой
+    ведомости, в том числе ошибка, записывается в журнал метрик.
+    """
+
+    def __init__(self, config, log=None):
+        self.config = config
+        self.log = log
+        self.cache = SheetCache(config.cache_dir, ttl=config.cache_ttl,
+                                max_bytes=config.cache_max_bytes)
+        self.pool = SheetsClientPool()
+        self.sync = None
+        if config.incremental:
+            self.sync = IncrementalAggregator(os.path.join(config.cache_dir, "sync"))
+
+    def make_source(self, credentials_file):
+        return make_source(self.config.source, credentials_file, self.pool)
+
+    def run_single(self, url, sheet, credentials_file, streaming=False, force_refresh=False,
+                   profile=None, reporter=None, cancel=None):
+        """Одна ведомость: путь к файлу и запись журнала метрик"""
+        config = self.config
+        metrics = PipelineMetrics(self.log, config.metrics_file,
+                                  profile=config.profile if profile is None else profile)
+        mode = "stream" if config.stream_by else "single"
+        source = self.make_source(credentials_file)
+        try:
+            if config.stream_by:
+                filename, context = stream_report(
+                    url, credentials_file, sheet, group_by=config.stream_by,
+                    output_dir=config.output_dir, metrics=metrics, reporter=reporter,
+                    cancel=cancel, log=self.log, template=config.template,
+                    writer=config.writer, totals=config.totals, source=source)
+            else:
+                filename, context = run_report(
+                    url, credentials_file, sheet, streaming=streaming,
+                    output_dir=config.output_dir, metrics=metrics, reporter=reporter,
+                    cancel=cancel, log=self.log, template=config.template,
+                    writer=config.writer, totals=config.totals, source=source,
+                    cache=self.cache, pool=self.pool, force_refresh=force_refresh,
+                    aggregation=config.aggregation, fetch_mode=config.fetch_mode,
+                    sync=self.sync)
+        except Exception as e:
+            metrics.finish(mode=mode, url=url, sheet=sheet, error=str(e))
+            raise
+        return filename, metrics.finish(mode=mode, url=url, sheet=sheet, file=filename,
+                                        **context)
+
+    def run_batch(self, targets, credentials_file, streaming=False, force_refresh=False,
+                  reporter=None, cancel=None):
+        """Пакет листов: (созданные файлы, цели с ошибками)"""
+        config = self.config
+        runner = BatchReportRunner(
+            targets, credentials_file, None, self.log, cache=self.cache, pool=self.pool,
+            source=self.make_source(credentials_file), streaming=streaming,
+            fetch_workers=config.fetch_workers, output_dir=config.output_dir,
+            force_refresh=force_refresh, aggregation=config.aggregation,
+            fetch_mode=config.fetch_mode, sync=self.sync, metrics_file=config.metrics_file,
+            reporter=reporter, cancel=cancel, template=config.template,
+            writer=config.writer, totals=config.totals)
+        return runner.execute()
+
+
+class JobOutcome:
+    """Что окно показывает по завершении задания
+
+    status - текст строки состояния, error - текст окна ошибки, summary -
+    (создано, с ошибками) за серию заданий, когда очередь опустела.
+    """
+
+    def __init__(self, status=None, error=None, summary=None):
+        self.status = status
+        self.error = error
+        self.summary = summary
+
+    def summary_text(self):
+        done, failed = self.summary
+        return f"Создано отчетов: {done}" + (f"\nС ошибками: {failed}" if failed else "")
+
+
+class ReportJobs:
+    """Очередь ведомостей окна: постановка, выполнение и итоги заданий
+
+    Общая часть окон Tk и Qt. on_change(job) вызывается из рабочих
+    потоков: окно переносит изменение в свой поток, обновляет строку
+    задания (row) и общий прогресс (progress), а итог завершенного
+    задания берет из finish().
+    """
+
+    # Приоритеты заданий очереди: меньше - раньше
+    PRIORITIES = {"Высокий": 0, "Обычный": 1, "Низкий": 2}
+    PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+    def __init__(self, service, log, on_change=None):
+        self.service = service
+        self.log = log
+        self.queue = JobQueue(self.run, on_change,
+                              max_workers=service.config.job_concurrency)
+        self.finished_jobs = set()
+        self.session_results = {"done": 0, "failed": 0}
+
+    def submit_single(self, url, sheet, credentials_file, priority="Обычный",
+                      streaming=False, force_refresh=False, profile=False):
+        """Постановка ведомости по листу в очередь (None - не хватает параметров)"""
+        if not url or self.service.config.missing_credentials(credentials_file):
+            self.log("Ошибка: Не заданы все необходимые параметры!")
+            return None
+
+        params = {
+            "url": url,
+            "sheet": sheet,
+            "credentials_file": credentials_file,
+            "streaming": streaming,
+            "force_refresh": force_refresh,
+            "profile": profile,
+        }
+        # Новый запуск по тому же листу вытесняет устаревший
+        job = self.queue.submit("single", sheet, params, priority=self.PRIORITIES[priority],
+                                key=(url, sheet))
+        self.log(f"Задание {job.job_id} ({job.title}) поставлено в очередь")
+        return job
+
+    def submit_batch(self, text, url, sheet, credentials_file, priority="Обычный",
+                     streaming=False, force_refresh=False):
+        """Постановка пакета по списку целей text (см. parse_batch_targets)"""
+        targets = parse_batch_targets(text, url, sheet)
+        if (not targets or self.service.config.missing_credentials(credentials_file)
+                or not all(url for url, _ in targets)):
+            self.log("Ошибка: Не заданы цели пакетного запуска!")
+            return None
+
+        params = {
+            "targets": targets,
+            "credentials_file": credentials_file,
+            "streaming": streaming,
+            "force_refresh": force_refresh,
+        }
+        job = self.queue.submit("batch", f"Пакет: {len(targets)} целей", params,
+                                priority=self.PRIORITIES[priority])
+        self.log(f"Задание {job.job_id} ({job.title}) поставлено в очередь")
+        return job
+
+    def run(self, job):
+        """Выполнение задания очереди (в рабочем потоке очереди)"""
+        params = job.params
+        reporter = ProgressReporter(
+            lambda percent, text: self.queue.progress(job, percent, text))
+        if job.kind == "batch":
+            return self.service.run_batch(
+                params["targets"], params["credentials_file"], streaming=params["streaming"],
+                force_refresh=params["force_refresh"], reporter=reporter, cancel=job.cancel)
+
+        self.log(f"[{job.title}] Начало обработки данных...")
+        filename, _ = self.service.run_single(
+            params["url"], params["sheet"], params["credentials_file"],
+            streaming=params["streaming"], force_refresh=params["force_refresh"],
+            profile=params["profile"], reporter=reporter, cancel=job.cancel)
+        return filename
+
+    def row(self, job):
+        """Строка задания в списке окна"""
+        return (str(job.job_id), job.title, self.PRIORITY_NAMES[job.priority],
+                job.describe(), f"{job.percent}%")
+
+    def progress(self):
+        """Общий прогресс: (процент, состояние) по выполняющимся и ожидающим
+        заданиям или None, если активных заданий нет"""
+        active = [job for job in self.queue.jobs.values() if job.active]
+        if not active:
+            return None
+        running, queued = self.queue.counts()
+        return (sum(job.percent for job in active) / len(active),
+                f"Выполняется: {running}, в очереди: {queued}")
+
+    def finish(self, job):
+        """Итог задания (один раз на задание, иначе None); когда очередь
+        опустела - сводка за серию заданий"""
+        if job.active or job.job_id in self.finished_jobs:
+            return None
+        self.finished_jobs.add(job.job_id)
+
+        outcome = JobOutcome()
+        if job.status == job.DONE and job.kind == "batch":
+            filenames, failed = job.result
+            self.session_results["done"] += len(filenames)
+            self.session_results["failed"] += len(failed)
+            self.log(f"Пакет завершен: создано {len(filenames)} отчетов, "
+                     f"ошибок: {len(failed)}")
+        elif job.status == job.DONE:
+            self.session_results["done"] += 1
+            outcome.status = f"Отчет сохранен: {job.result}"
+            self.log(f"Отчет успешно создан: {job.result}")
+        elif job.status == job.CANCELLED:
+            self.log(f"Задание {job.job_id} ({job.title}) отменено")
+        else:
+            self.session_results["failed"] += 1
+            outcome.error = f"{job.title}: {job.error}"
+            self.log(f"[{job.title}] Ошибка: {job.error}")
+
+        running, queued = self.queue.counts()
+        if not running and not queued:
+            outcome.summary = (self.session_results["done"], self.session_results["failed"])
+            self.session_results = {"done": 0, "failed": 0}
+        return outcome
+
+    def cancel(self, job_id):
+        if self.queue.cancel(job_id):
+            self.log(f"Отмена задания {job_id}...")
+
+    def clear_finished(self):
+        """Удаление завершенных заданий; возвращает их номера"""
+        return self.queue.clear_finished()
+
+    def shutdown(self, timeout):
+        """Остановка заданий при закрытии окна и удаление временных файлов"""
+        self.queue.shutdown(timeout)
+        OutputNames.remove_partial(self.service.config.output_dir)
@@ -0,0 +1,785 @@
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from collections import defaultdict
+from itertools import repeat, zip_longest
+import threading
+
+from .metrics import measure_stage
+from .counts import CameraCounts, pack
+from .sources import GspreadSource
+
+
+class SheetCache:
+    """Локальный кэш снимков листов Google Sheets
+
+    Снимок хранится в JSON-файле на каждую пару (URL таблицы, имя листа)
+    вместе с временем изменения таблицы из метаданных Drive. Устаревшие
+    по TTL снимки не используются, при превышении лимита размера удаляются
+    давно не использованные файлы (LRU по времени последнего обращения).
+    Если время изменения таблицы узнать не удалось, снимок годится только
+    unknown_ttl секунд: правку таблицы проверить нечем.
+    """
+
+    def __init__(self, cache_dir="cache", ttl=24 * 60 * 60, max_bytes=100 * 1024 * 1024,
+                 unknown_ttl=10 * 60):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.unknown_ttl = unknown_ttl
+
+    def _path(self, spreadsheet_url, sheet_name):
+        key = hashlib.sha1(
+            f"{spreadsheet_url}\n{sheet_name}".encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, spreadsheet_url, sheet_name, revision):
+        """Снимок листа, если он свежий и ревизия таблицы не изменилась
+
+        revision=None означает, что метаданные недоступны - тогда снимок
+        используется только в пределах короткого unknown_ttl.
+        """
+        path = self._path(spreadsheet_url, sheet_name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        ttl = self.ttl if revision is not None else min(self.ttl, self.unknown_ttl)
+        if time.time() - snapshot.get("fetched_at", 0) > ttl:
+            return None
+        if revision is not None and snapshot.get("revision") != revision:
+            return None
+
+        # Отметка об использовании для LRU
+        os.utime(path)
+        return snapshot["records"]
+
+    def put(self, spreadsheet_url, sheet_name, revision, records):
+        """Сохранение снимка листа"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(spreadsheet_url, sheet_name)
+        # Один лист может загружаться в пакете дважды - у каждого потока
+        # свой временный файл
+        tmp_path = path.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "spreadsheet_url": spreadsheet_url,
+                "sheet_name": sheet_name,
+                "revision": revision,
+                "fetched_at": time.time(),
+                "records": records,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Удаление давно не использованных снимков сверх лимита размера"""
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+
+class IncrementalAggregator:
+    """Инкрементальная агрегация листа по блокам строк
+
+    Строки листа делятся на блоки по BLOCK_ROWS. Для каждого блока
+    хранятся хэш содержимого, количество камер по адресам и код объекта
+    последней строки адреса в блоке. При обновлении заново разбираются
+    только блоки с другим хэшем: их старый вклад вычитается из итогов,
+    новый прибавляется, коды объектов и порядок адресов пересчитываются
+    только для затронутых адресов. Результат совпадает с process_camera_data.
+
+    Блоки сохраняются в JSON-файл на каждую пару (URL таблицы, имя листа),
+    итоги по листу восстанавливаются из них при первой загрузке.
+
+    Если лист только вырос, его не нужно загружать целиком: tail_start
+    называет строку, с которой догружается последний сохраненный блок
+    и все ниже него, accepts_tail сверяет этот блок с сохраненным хэшем.
+    Правку выше последнего блока по хвосту не увидеть, поэтому каждое
+    full_every-е обновление загружает и сверяет лист целиком.
+    """
+
+    BLOCK_ROWS = 1000
+
+    # Через сколько догрузок хвоста лист загружается и сверяется целиком
+    FULL_SYNC_EVERY = 10
+
+    def __init__(self, state_dir="cache/sync", block_rows=None, full_every=None):
+        self.state_dir = Path(state_dir)
+        self.block_rows = block_rows or self.BLOCK_ROWS
+        self.full_every = full_every or self.FULL_SYNC_EVERY
+        self.last_stats = {}
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def _path(self, spreadsheet_url, sheet_name):
+        key = hashlib.sha1(
+            f"{spreadsheet_url}\n{sheet_name}".encode("utf-8")).hexdigest()
+        return self.state_dir / f"{key}.json"
+
+    def reset(self, spreadsheet_url, sheet_name):
+        """Сброс состояния листа - следующее обновление пересчитает все"""
+        path = self._path(spreadsheet_url, sheet_name)
+        with self._lock:
+            self._states.pop(path, None)
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def state(self, path):
+        state = self._states.get(path) or self.load(path)
+        self._states[path] = state
+        return state
+
+    def tail_start(self, spreadsheet_url, sheet_name):
+        """Номер строки данных, с которой достаточно догрузить лист
+
+        None - лист нужно загрузить целиком: состояния еще нет или пора
+        сверить лист полностью.
+        """
+        path = self._path(spreadsheet_url, sheet_name)
+        with self._lock:
+            state = self.state(path)
+            if not state["rows"] or state["tail_syncs"] + 1 >= self.full_every:
+                return None
+            return self.last_block_start(state["rows"])
+
+    def accepts_tail(self, spreadsheet_url, sheet_name, columns, offset, revision=None):
+        """Подходит ли хвост листа со строки offset для догрузки
+
+        Последний сохраненный блок должен совпасть с хвостом по хэшу,
+        а лист - вырасти (или не измениться вовсе, если ревизия та же).
+        """
+        length = offset + max((len(values) for values in columns), default=0)
+        path = self._path(spreadsheet_url, sheet_name)
+        with self._lock:
+            return self.tail_matches(self.state(path), columns, offset, length, revision)
+
+    def tail_matches(self, state, columns, offset, length, revision):
+        rows = state["rows"]
+        if not rows or offset != self.last_block_start(rows) or length < rows:
+            return False
+        if length == rows and (revision is None or state["revision"] != revision):
+            return False
+        columns = [list(values) + [""] * (length - offset - len(values)) for values in columns]
+        block = state["blocks"][offset // self.block_rows]
+        return self.block_hash(columns, 0, rows - offset) == block["hash"]
+
+    def last_block_start(self, rows):
+        """Первая строка последнего блока листа из rows строк"""
+        return (rows - 1) // self.block_rows * self.block_rows
+
+    def update(self, spreadsheet_url, sheet_name, columns, revision=None, offset=0):
+        """Обновление итогов по столбцам листа (код, адрес, камера)
+
+        offset - номер строки данных, с которой начинаются columns: при
+        догрузке (tail_start, accepts_tail) в них только хвост листа.
+        Возвращает (address_data, camera_models, object_codes), как
+        process_camera_data. В last_stats - сколько блоков пересчитано.
+        """
+        length = offset + max((len(values) for values in columns), default=0)
+        if not length:
+            raise ValueError("В таблице нет данных!")
+        columns = [list(values) + [""] * (length - offset - len(values)) for values in columns]
+
+        path = self._path(spreadsheet_url, sheet_name)
+        with self._lock:
+            state = self.state(path)
+            if offset:
+                if not self.tail_matches(state, columns, offset, length, revision):
+                    raise ValueError("Лист изменился во время обновления, "
+                                     "сформируйте ведомость еще раз")
+                changed = self.apply(state, columns, length, offset // self.block_rows)
+                state.update(revision=revision, rows=length,
+                             tail_syncs=state["tail_syncs"] + 1)
+                self.save(path, state)
+            elif (revision is not None and state["revision"] == revision
+                    and state["rows"] == length):
+                changed = []
+            else:
+                changed = self.apply(state, columns, length)
+                if changed or state["revision"] != revision or state["tail_syncs"]:
+                    state.update(revision=revision, rows=length, tail_syncs=0)
+                    self.save(path, state)
+
+            self.last_stats = {"blocks": len(state["blocks"]),
+                               "changed_blocks": len(changed)}
+            if not state["counts"]:
+                raise ValueError("Нет данных для формирования отчета!")
+            return CameraCounts.from_mapping(state["counts"], state["codes"]).result()
+
+    def load(self, path):
+        state = {"block_rows": self.block_rows, "revision": None, "rows": 0, "tail_syncs": 0,
+                 "blocks": [], "counts": {}, "models": {}, "codes": {}, "first": {}}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return state
+        if saved.get("block_rows") != self.block_rows:
+            return state
+
+        state.update(revision=saved["revision"], rows=saved["rows"],
+                     tail_syncs=saved.get("tail_syncs", 0), blocks=saved["blocks"])
+        self.merge(state, [(None, block) for block in state["blocks"]])
+        return state
+
+    def save(self, path, state):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        saved = {name: state[name]
+                 for name in ("block_rows", "revision", "rows", "tail_syncs", "blocks")}
+        tmp_path = path.with_suffix(".tmp")
+        # json.dumps целиком заметно быстрее потокового json.dump
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(saved, ensure_ascii=False, separators=(",", ":")))
+        os.replace(tmp_path, path)
+
+    def apply(self, state, columns, length, first=0):
+        """Замена измененных, добавленных и удаленных блоков
+
+        columns начинаются с блока first, блоки выше него не меняются.
+        """
+        blocks = state["blocks"]
+        block_count = -(-length // self.block_rows)
+        offset = first * self.block_rows
+        changed = []
+        replaced = []
+
+        for index in range(first, max(block_count, len(blocks))):
+            old = blocks[index] if index < len(blocks) else None
+            new = None
+            if index < block_count:
+                start = index * self.block_rows - offset
+                end = min(start + self.block_rows, length - offset)
+                digest = self.block_hash(columns, start, end)
+                if old is not None and old["hash"] == digest:
+                    continue
+                new = self.aggregate_block(columns, start, end, digest)
+                if old is not None:
+                    blocks[index] = new
+                else:
+                    blocks.append(new)
+            changed.append(index)
+            replaced.append((old, new))
+        del blocks[block_count:]
+
+        self.merge(state, replaced)
+        return changed
+
+    def merge(self, state, replaced):
+        """Вычитание старых и прибавление новых вкладов блоков в итоги"""
+        delta = defaultdict(lambda: defaultdict(int))
+        for old, new in replaced:
+            for block, sign in ((old, -1), (new, 1)):
+                if block is None:
+                    continue
+                for address, counts in block["counts"].items():
+                    address_delta = delta[address]
+                    for model, quantity in counts.items():
+                        address_delta[model] += sign * quantity
+
+        # Итоги меняются на месте: адреса без изменений остаются на своих местах
+        totals = state["counts"]
+        models = state["models"]
+        for address, counts in delta.items():
+            address_counts = totals.setdefault(address, {})
+            for model, quantity in counts.items():
+                if not quantity:
+                    continue
+                total = address_counts.get(model, 0) + quantity
+                if total:
+                    address_counts[model] = total
+                else:
+                    del address_counts[model]
+                model_total = models.get(model, 0) + quantity
+                if model_total:
+                    models[model] = model_total
+                else:
+                    del models[model]
+            if not address_counts:
+                del totals[address]
+
+        # Порядок адреса - по первому блоку с ним, код объекта - по последнему
+        first = state["first"]
+        codes = state["codes"]
+        for address in delta:
+            if address not in totals:
+                first.pop(address, None)
+                codes.pop(address, None)
+        blocks = state["blocks"]
+        pending = {address for address in delta if address in totals}
+        for index, block in enumerate(blocks):
+            if not pending:
+                break
+            for address in self.present(pending, block["counts"]):
+                first[address] = [index, list(block["counts"]).index(address)]
+                pending.discard(address)
+        pending = {address for address in delta if address in totals}
+        for block in reversed(blocks):
+            if not pending:
+                break
+            for address in self.present(pending, block["codes"]):
+                codes[address] = block["codes"][address]
+                pending.discard(address)
+
+        positions = [first[address] for address in totals]
+        if any(a > b for a, b in zip(positions, positions[1:])):
+            state["counts"] = {address: totals[address]
+                               for address in sorted(totals, key=first.__getitem__)}
+
+    @staticmethod
+    def present(addresses, block_values):
+        """Адреса из набора, встречающиеся в блоке"""
+        if len(addresses) < len(block_values):
+            return [address for address in addresses if address in block_values]
+        return [address for address in block_values if address in addresses]
+
+    @staticmethod
+    def block_hash(columns, start, end):
+        digest = hashlib.sha1()
+        for values in columns:
+            digest.update("\x1f".join(map(str, values[start:end])).encode("utf-8"))
+            digest.update(b"\x1e")
+        return digest.hexdigest()
+
+    @staticmethod
+    def aggregate_block(columns, start, end, digest):
+        """Вклад одного блока строк, как в цикле process_camera_data"""
+        counts = {}
+        codes = {}
+        for code, address, model in zip(*(values[start:end] for values in columns)):
+            address = str(address).strip()
+            model = str(model).strip()
+            if address and model:
+                address_counts = counts.setdefault(address, {})
+                address_counts[model] = address_counts.get(model, 0) + 1
+                codes[address] = str(code).strip()
+        return {"hash": digest, "counts": counts, "codes": codes}
+
+
+class GoogleSheetsWorker:
+    """Класс для обработки данных из Google Sheets"""
+
+    # Начиная с этого числа строк режим "auto" агрегирует через pandas
+    VECTORIZE_MIN_ROWS = 300000
+
+    # Столбцы листа, которые участвуют в формировании ведомости
+    COLUMNS = ["Код объекта", "Адрес установки", "Камера"]
+
+    # Строк листа на один запрос batch_get при постраничной загрузке
+    FETCH_PAGE_ROWS = 20000
+
+    # Как часто цикл обработки сообщает о прогрессе (в строках)
+    PROGRESS_ROWS = 10000
+
+    def __init__(self, spreadsheet_url, credentials_file, sheet_name, callback,
+                 cache=None, force_refresh=False, pool=None,
+                 aggregation="python", fetch_mode="columns", sync=None,
+                 metrics=None, reporter=None, cancel=None, log=None, source=None):
+        self.spreadsheet_url = spreadsheet_url
+        self.credentials_file = credentials_file
+        self.sheet_name = sheet_name
+        self.callback = callback
+        self.cache = cache
+        self.force_refresh = force_refresh
+        # Откуда читается лист: gspread (по умолчанию), файл или HTTP-подмена API
+        self.source = source if source is not None else GspreadSource(credentials_file, pool)
+        self.aggregation = aggregation
+        self.fetch_mode = fetch_mode
+        self.sync = sync
+        self.metrics = metrics
+        self.reporter = reporter
+        self.cancel = cancel
+        self.log = log
+        self.revision = None
+        # Номер первой строки загруженных данных: не 0, если догружен хвост листа
+        self.tail_offset = 0
+
+    def run(self):
+        try:
+            raw_data = self.get_google_sheets_data()
+            address_data, camera_models, object_codes = self.aggregate(raw_data)
+            self.callback(address_data, camera_models, object_codes, None)
+        except Exception as e:
+            self.callback(None, None, None, str(e))
+
+    def get_google_sheets_data(self):
+        """Получение данных листа из источника (по умолчанию - Google Sheets)"""
+        with measure_stage(self.metrics, "auth"):
+            self.source.connect()
+
+        revision = None
+        if self.cache is not None:
+            with measure_stage(self.metrics, "fetch"):
+                revision = self.fetch_revision()
+                records = None
+                if not self.force_refresh:
+                    records = self.cache.get(
+                        self.spreadsheet_url, self.sheet_name, revision)
+            if records is not None:
+                self.log_message("Таблица не изменялась, используется локальный снимок"
+                                 if revision is not None else
+                                 "Используется свежий локальный снимок листа")
+                rows = self.count_rows(records)
+                self.report_progress("fetch", rows, rows)
+                return records
+
+        with measure_stage(self.metrics, "open_by_url"):
+            worksheet = self.source.worksheet(self.spreadsheet_url, self.sheet_name)
+
+        try:
+            with measure_stage(self.metrics, "fetch"):
+                if self.fetch_mode == "records":
+                    records = worksheet.get_all_records(
+                        expected_headers=self.COLUMNS)
+                    self.report_progress("fetch", len(records), len(records))
+                else:
+                    records = self.fetch_tail(worksheet)
+                    if records is None:
+                        records = self.fetch_columns(worksheet)
+        except Exception as e:
+            self.source.fetch_failed(self.spreadsheet_url, e)
+            raise
+
+        # В кэше - только снимки листа целиком
+        if self.cache is not None and not self.tail_offset:
+            with measure_stage(self.metrics, "fetch"):
+                self.cache.put(self.spreadsheet_url, self.sheet_name,
+                               revision, records)
+        return records
+
+    def fetch_revision(self):
+        """Ревизия таблицы для кэша снимков; None с записью в журнал, если ее не узнать"""
+        try:
+            self.revision = self.source.revision(self.spreadsheet_url)
+        except Exception as e:
+            self.revision = None
+            minutes = max(1, round(self.cache.unknown_ttl / 60))
+            self.log_message(f"Не удалось узнать время изменения таблицы ({e}): "
+                             f"локальный снимок используется не дольше {minutes} мин")
+        return self.revision
+
+    def fetch_tail(self, worksheet):
+        """Догрузка только конца листа для инкрементальной агрегации
+
+        Возвращает столбцы с последнего сохраненного блока до конца листа
+        (номер первой строки - в self.tail_offset) или None, если лист
+        нужно загрузить целиком: состояния нет, пора полной сверки или
+        лист изменился не только в конце.
+        """
+        self.tail_offset = 0
+        if self.sync is None or self.force_refresh:
+            return None
+        offset = self.sync.tail_start(self.spreadsheet_url, self.sheet_name)
+        if not offset:
+            return None
+        columns = self.fetch_columns(worksheet, offset)
+        if not self.sync.accepts_tail(self.spreadsheet_url, self.sheet_name,
+                                      self.as_columns(columns), offset, self.revision):
+            self.log_message("Лист изменился не только в конце, загружается целиком")
+            return None
+        self.tail_offset = offset
+        self.log_message(f"Догружен конец листа: {self.count_rows(columns)} строк "
+                         f"начиная с {offset + 2}-й")
+        return columns
+
+    def fetch_columns(self, worksheet, first_row=0):
+        """Загрузка только нужных столбцов листа
+
+        Страницы fetch_pages собираются в столбцы. first_row - номер строки
+        данных, с которой начинается загрузка (0 - весь лист).
+        Возвращает {"Камера": [...], ...} - по списку значений на столбец
+        вместо словаря на каждую строку.
+        """
+        columns = {name: [] for name in self.COLUMNS}
+        length = 0
+        for offset, page in self.fetch_pages(worksheet, first_row):
+            offset -= first_row
+            # Пустые ячейки в конце столбца API не возвращает
+            for name, values in zip(self.COLUMNS, page):
+                if values:
+                    column = columns[name]
+                    column.extend([""] * (offset - len(column)))
+                    column.extend(values)
+                    length = max(length, len(column))
+
+        for values in columns.values():
+            values.extend([""] * (length - len(values)))
+        self.report_progress("fetch", length, length)
+        return columns
+
+    def fetch_pages(self, worksheet, first_row=0):
+        """Постраничная загрузка нужных столбцов листа
+
+        Строка заголовков читается отдельно, затем три столбца забираются
+        запросами batch_get по FETCH_PAGE_ROWS строк, после каждой страницы
+        сообщается прогресс. Последняя страница открыта снизу, поэтому
+        устаревший размер листа (row_count) не теряет новые строки.
+        Отдает (номер строки данных, с которой начинается страница,
+        [значения столбца, ...] в порядке COLUMNS); пустых ячеек в конце
+        столбца страницы в значениях нет. Загрузка идет со строки данных
+        first_row.
+        """
+        from openpyxl.utils import get_column_letter
+
+        header = worksheet.row_values(1)
+        missing = [name for name in self.COLUMNS if name not in header]
+        if missing:
+            raise ValueError(
+                f"На листе {self.sheet_name} нет столбцов: {', '.join(missing)}")
+        letters = [get_column_letter(header.index(name) + 1) for name in self.COLUMNS]
+
+        total = max(worksheet.row_count - 1, 0)
+        starts = list(range(first_row + 2, total + 2, self.FETCH_PAGE_ROWS)) or [first_row + 2]
+        for page, start in enumerate(starts, 1):
+            self.check_cancelled()
+            end = start + self.FETCH_PAGE_ROWS - 1 if page < len(starts) else ""
+            value_ranges = worksheet.batch_get(
+                [f"{letter}{start}:{letter}{end}" for letter in letters],
+                major_dimension="COLUMNS")
+            yield start - 2, [values[0] if values and values[0] else []
+                              for values in value_ranges]
+            if end:
+                self.report_progress("fetch", end - 1, total)
+
+    def open_worksheet(self):
+        """Авторизация в источнике и лист self.sheet_name"""
+        with measure_stage(self.metrics, "auth"):
+            self.source.connect()
+        with measure_stage(self.metrics, "open_by_url"):
+            return self.source.worksheet(self.spreadsheet_url, self.sheet_name)
+
+    def stream_rows(self, worksheet):
+        """Строки листа (код, адрес, камера) по мере постраничной загрузки
+
+        Для потоковой ведомости: страница отдается дальше и забывается,
+        снимок листа не собирается и в кэш не попадает. Строки идут
+        подряд, без пропусков, - n-я строка данных есть строка n + 1 листа.
+        """
+        empty = ("",) * len(self.COLUMNS)
+        position = 0
+        try:
+            for offset, page in self.fetch_pages(worksheet):
+                if offset > position:
+                    yield from repeat(empty, offset - position)
+                    position = offset
+                for row in zip_longest(*page, fillvalue=""):
+                    position += 1
+                    yield row
+        except Exception as e:
+            self.source.fetch_failed(self.spreadsheet_url, e)
+            raise
+
+    def report_progress(self, stage, done, total=None):
+        self.check_cancelled()
+        if self.reporter is not None:
+            self.reporter.update(stage, done, total)
+
+    def check_cancelled(self):
+        if self.cancel is not None:
+            self.cancel.check()
+
+    def log_message(self, message):
+        if self.log is not None:
+            self.log(message)
+
+    def aggregate(self, data):
+        """Агрегация данных: инкрементальная при заданном sync, иначе полная"""
+        with measure_stage(self.metrics, "aggregate"):
+            if self.sync is None:
+                result = self.process_camera_data(data)
+            else:
+                if self.force_refresh:
+                    self.sync.reset(self.spreadsheet_url, self.sheet_name)
+                result = self.sync.update(self.spreadsheet_url, self.sheet_name,
+                                          self.as_columns(data), self.revision,
+                                          self.tail_offset)
+        rows = self.count_rows(data)
+        self.report_progress("aggregate", rows, rows)
+        return result
+
+    def as_columns(self, data):
+        """Нужные столбцы листа списками значений - из записей или столбцов"""
+        if isinstance(data, dict):
+            return [data.get(name, []) for name in self.COLUMNS]
+        return [[row.get(name, "") for row in data] for name in self.COLUMNS]
+
+    def process_camera_data(self, data):
+        """Обработка и группировка данных по адресам
+
+        Возвращает (address_data, camera_models, object_codes): address_data -
+        CameraCounts, object_codes - коды объектов из той же таблицы.
+        """
+        if self.use_vectorized(data):
+            # Векторная агрегация не делится на порции - проверка перед ней
+            self.check_cancelled()
+            return self.process_camera_data_vectorized(data)
+
+        if not self.count_rows(data):
+            raise ValueError("В таблице нет данных!")
+
+        address_data = {}
+        object_codes = {}
+
+        if isinstance(data, dict):
+            rows = zip_longest(*(data.get(name, ()) for name in self.COLUMNS),
+                               fillvalue="")
+        else:
+            rows = ((row.get("Код объекта", ""), row.get("Адрес установки", ""),
+                     row.get("Камера", "")) for row in data)
+
+        total = self.count_rows(data)
+        for row_number, (code, address, model) in enumerate(rows, 1):
+            if not row_number % self.PROGRESS_ROWS:
+                self.report_progress("aggregate", row_number, total)
+            code = code.strip()
+            address = address.strip()
+            model = model.strip()
+            if address and model:
+                counts = address_data.get(address)
+                if counts is None:
+                    counts = address_data[address] = {}
+                counts[model] = counts.get(model, 0) + 1
+                object_codes[address] = code
+
+        if not address_data:
+            raise ValueError("Нет данных для формирования отчета!")
+
+        # Словари по адресам живут только до упаковки в CameraCounts
+        return CameraCounts.from_mapping(address_data, object_codes).result()
+
+    def use_vectorized(self, data):
+        """Выбор способа агрегации по настройке и размеру таблицы"""
+        if self.aggregation == "pandas":
+            return True
+        if self.aggregation == "auto":
+            return self.count_rows(data) >= self.VECTORIZE_MIN_ROWS
+        return False
+
+    @staticmethod
+    def count_rows(data):
+        """Число строк в записях или в столбцах"""
+        if isinstance(data, dict):
+            return max((len(values) for values in data.values()), default=0)
+        return len(data)
+
+    def process_camera_data_vectorized(self, data):
+        """Обработка и группировка данных по адресам средствами numpy/pandas
+
+        Принимает записи get_all_records, сетку значений (первая строка -
+        заголовки) или уже разобранные столбцы {"Камера": [...], ...}.
+        Адреса и модели кодируются целыми числами (pd.factorize), strip
+        выполняется только для уникальных значений, а группировка по паре
+        (адрес, модель) - над массивами кодов. Результат совпадает с
+        process_camera_data, включая порядок адресов и моделей.
+        """
+        # numpy и pandas загружаются только при выборе этого способа агрегации
+        import numpy as np
+        import pandas as pd
+
+        columns = self.COLUMNS
+        if isinstance(data, dict):
+            length = self.count_rows(data)
+            if not length:
+                raise ValueError("В таблице нет данных!")
+            raw = []
+            for column in columns:
+                values = list(data.get(column, ()))
+                raw.append(values + [""] * (length - len(values)))
+        elif not data or (not isinstance(data[0], dict) and len(data) < 2):
+            raise ValueError("В таблице нет данных!")
+        elif isinstance(data[0], dict):
+            raw = [[row.get(column, "") for row in data] for column in columns]
+        else:
+            header = list(data[0])
+            raw = []
+            for column in columns:
+                idx = header.index(column) if column in header else None
+                raw.append([row[idx] if idx is not None and idx < len(row) else ""
+                            for row in data[1:]])
+
+        def encode(values):
+            """Коды нормализованных значений и сами значения"""
+            codes, uniques = pd.factorize(
+                pd.Series(values, dtype=object), use_na_sentinel=False)
+            cleaned = pd.Series(uniques, dtype=object).fillna("").astype(str).str.strip()
+            clean_codes, clean_uniques = pd.factorize(cleaned)
+            return clean_codes[codes], np.asarray(clean_uniques, dtype=object)
+
+        address_ids, addresses = encode(raw[1])
+        model_ids, models = encode(raw[2])
+
+        mask = (addresses != "")[address_ids] & (models != "")[model_ids]
+        if not mask.any():
+            raise ValueError("Нет данных для формирования отчета!")
+        row_numbers = np.flatnonzero(mask)
+        address_ids = address_ids[mask]
+        model_ids = model_ids[mask]
+
+        # Количество каждой пары (адрес, модель) в порядке первого появления
+        keys = address_ids.astype(np.int64) * len(models) + model_ids
+        pair_count = len(addresses) * len(models)
+        if pair_count <= max(4 * len(keys), 1 << 16):
+            # Плотная таблица пар: bincount вместо сортировки
+            counts = np.bincount(keys, minlength=pair_count)
+            first_seen = np.full(pair_count, len(keys), dtype=np.int64)
+            np.minimum.at(first_seen, keys, np.arange(len(keys)))
+            unique_keys = np.flatnonzero(counts)
+            counts = counts[unique_keys]
+            first_index = first_seen[unique_keys]
+        else:
+            unique_keys, first_index, counts = np.unique(
+                keys, return_index=True, return_counts=True)
+        order = np.argsort(first_index, kind="stable")
+
+        unique_keys = unique_keys[order]
+        counts = counts[order]
+        pair_addresses = unique_keys // len(models)
+        pair_models = unique_keys % len(models)
+
+        # Номера CameraCounts - по порядку первого появления адреса и модели
+        # среди учтенных строк (пары уже идут в этом порядке)
+        def renumber(ids, size):
+            _, first = np.unique(ids, return_index=True)
+            used = ids[np.sort(first)]
+            numbers = np.zeros(size, dtype=np.int64)
+            numbers[used] = np.arange(len(used))
+            return used, numbers[ids]
+
+        used_addresses, pair_addresses = renumber(pair_addresses, len(addresses))
+        used_models, pair_models = renumber(pair_models, len(models))
+
+        # Строки разреженной матрицы: пары сгруппированы по адресу,
+        # внутри адреса - в порядке первого появления
+        by_address = np.argsort(pair_addresses, kind="stable")
+        indptr = np.zeros(len(used_addresses) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_addresses, minlength=len(used_addresses)), out=indptr[1:])
+
+        # Код объекта - из последней строки адреса, как в цикле Python
+        last_rows = np.full(len(addresses), -1, dtype=np.int64)
+        np.maximum.at(last_rows, address_ids, row_numbers)
+        code_column = raw[0]
+        codes = [str(code_column[row]).strip() for row in last_rows[used_addresses].tolist()]
+
+        return CameraCounts(addresses[used_addresses].tolist(), models[used_models].tolist(),
+                            codes, pack(indptr.tolist()), pack(pair_models[by_address].tolist()),
+                            pack(counts[by_address].tolist())).result()
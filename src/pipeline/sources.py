@@ -0,0 +1,699 @@
+import os
+import re
+import csv
+import json
+import time
+from pathlib import Path
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlencode, quote, unquote, parse_qs
+import threading
+
+# Источники листов для GoogleSheetsWorker. У каждого источника одни и те же
+# методы: connect() - авторизация, revision(url) - ревизия таблицы для кэша
+# снимков (None - неизвестна), worksheet(url, лист) - лист с методами
+# gspread.Worksheet, которые использует загрузка (row_count, row_values,
+# batch_get, get_all_records), sheet_names(url) - листы таблицы для пакета,
+# fetch_failed(url, ошибка) - реакция на ошибку загрузки.
+
+SOURCES = ("gspread", "file", "http")
+
+A1_CELLS = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+def make_source(name, credentials_file=None, pool=None):
+    """Источник листов по имени (настройка SHEETS_SOURCE, --source)"""
+    if name == "gspread":
+        return GspreadSource(credentials_file, pool)
+    if name == "file":
+        return FileSource()
+    if name == "http":
+        return HttpSheetsSource()
+    raise ValueError(f"Неизвестный источник данных: {name}")
+
+
+def column_index(letters):
+    """Номер столбца по буквам: A -> 1, AA -> 27"""
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index
+
+
+def column_letters(index):
+    """Буквы столбца по номеру: 1 -> A, 27 -> AA"""
+    letters = ""
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+
+def quote_sheet(title):
+    """Имя листа для диапазона A1: 'Лист 1'"""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def split_range(a1):
+    """Имя листа и ячейки диапазона: "'Лист 1'!A2:C" -> ("Лист 1", "A2:C")"""
+    sheet, sep, cells = a1.rpartition("!")
+    if not sep:
+        return None, a1
+    if sheet.startswith("'") and sheet.endswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    return sheet, cells
+
+
+def parse_cells(cells):
+    """Границы диапазона A1 с нумерацией от 1: (столбец, строка, столбец, строка)
+
+    Открытая граница (A2:A - до конца листа, 1:1 - вся строка) - None,
+    пустой диапазон - весь лист.
+    """
+    match = A1_CELLS.match(cells.upper())
+    if match is None:
+        raise ValueError(f"Неверный диапазон: {cells}")
+    first_col, first_row, last_col, last_row = match.groups()
+    if last_col is None and last_row is None:
+        # Одна ячейка (A1) или пустой диапазон - весь лист
+        last_col, last_row = first_col, first_row
+    return (column_index(first_col) if first_col else 1,
+            int(first_row) if first_row else 1,
+            column_index(last_col) if last_col else None,
+            int(last_row) if last_row else None)
+
+
+def format_cells(first_col, first_row, last_col, last_row):
+    """Диапазон A1 по границам (открытая нижняя граница - до конца листа)"""
+    return (f"{column_letters(first_col)}{first_row}:"
+            f"{column_letters(last_col)}{'' if last_row is None else last_row}")
+
+
+def trim(vectors):
+    """Без пустых ячеек в конце строк (столбцов) и пустых строк в конце, как в ответе API"""
+    vectors = [list(vector) for vector in vectors]
+    for vector in vectors:
+        while vector and vector[-1] == "":
+            vector.pop()
+    while vectors and not vectors[-1]:
+        vectors.pop()
+    return vectors
+
+
+def grid_values(grid, cells, major_dimension="ROWS"):
+    """Значения диапазона сетки строк в форме ответа API значений Sheets"""
+    first_col, first_row, last_col, last_row = parse_cells(cells)
+    rows = [row[first_col - 1:last_col] for row in grid[first_row - 1:last_row]]
+    if major_dimension == "COLUMNS":
+        width = max((len(row) for row in rows), default=0)
+        rows = [[row[i] if i < len(row) else "" for row in rows] for i in range(width)]
+    return trim(rows)
+
+
+def grid_records(grid, expected_headers=None):
+    """Записи как у get_all_records: первая строка сетки - заголовки"""
+    header = grid[0] if grid else []
+    missing = [name for name in expected_headers or () if name not in header]
+    if missing:
+        raise ValueError(f"На листе нет столбцов: {', '.join(missing)}")
+    width = len(header)
+    return [dict(zip(header, list(row[:width]) + [""] * (width - len(row))))
+            for row in grid[1:]]
+
+
+def cell_text(value):
+    """Значение ячейки строкой, как его отдает Sheets (целые числа без .0)"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class GridWorksheet:
+    """Лист в памяти (сетка строк) с методами gspread.Worksheet для загрузки"""
+
+    def __init__(self, title, grid):
+        self.title = title
+        self.grid = grid
+
+    @property
+    def row_count(self):
+        return len(self.grid)
+
+    def row_values(self, row):
+        values = grid_values(self.grid, f"{row}:{row}")
+        return values[0] if values else []
+
+    def batch_get(self, ranges, major_dimension="ROWS"):
+        return [grid_values(self.grid, split_range(a1)[1], major_dimension)
+                for a1 in ranges]
+
+    def get_all_records(self, expected_headers=None):
+        return grid_records(self.grid, expected_headers)
+
+
+class FileWorksheet(GridWorksheet):
+    """Лист файла данных, который разбирается при первом чтении
+
+    Как у gspread, открытие листа (этап open_by_url) только находит его,
+    а строки читаются на этапе fetch: там же и замеряется разбор файла.
+    """
+
+    def __init__(self, source, spreadsheet_url, sheet_name):
+        self.source = source
+        self.spreadsheet_url = spreadsheet_url
+        self.sheet_name = sheet_name
+        self._sheet = None
+
+    def _load(self):
+        if self._sheet is None:
+            sheets = self.source.load(self.spreadsheet_url)
+            name = self.sheet_name
+            if name not in sheets:
+                if len(sheets) != 1:
+                    raise ValueError(f"В файле {self.spreadsheet_url} нет листа {name}")
+                name = next(iter(sheets))
+            self._sheet = (name, sheets[name])
+        return self._sheet
+
+    @property
+    def title(self):
+        return self._load()[0]
+
+    @property
+    def grid(self):
+        return self._load()[1]
+
+
+class SheetsClientPool:
+    """Пул авторизованных клиентов gspread, живущий вместе с окном
+
+    Клиент создается один раз на файл учетных данных и переиспользует
+    HTTP-сессию с пулом соединений. Токен обновляется google-auth только
+    при приближении срока его действия. Открытые таблицы и листы
+    кэшируются по URL, чтобы не повторять open_by_url при каждом запуске.
+    """
+
+    SCOPE = ["https://spreadsheets.google.com/feeds",
+             "https://www.googleapis.com/auth/drive"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._spreadsheets = {}
+        self._worksheets = {}
+
+    def client(self, credentials_file):
+        """Авторизованный клиент для файла учетных данных"""
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        path = os.path.abspath(credentials_file)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._clients.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        # Авторизация - запрос к сети, поэтому идет без блокировки:
+        # медленный ответ не должен задерживать потоки с другими таблицами
+        credentials = ServiceAccountCredentials.from_json_keyfile_name(path, self.SCOPE)
+        client = gspread.authorize(credentials)
+        with self._lock:
+            cached = self._clients.get(path)
+            if cached is not None and cached[0] == mtime:
+                # Другой поток успел авторизоваться раньше
+                return cached[1]
+            # Файл ключей заменен - старые клиент и листы больше не годятся
+            self._drop(path)
+            self._clients[path] = (mtime, client)
+            return client
+
+    def worksheet(self, credentials_file, spreadsheet_url, sheet_name):
+        """Лист таблицы, открытый ранее или открываемый сейчас"""
+        spreadsheet = self.spreadsheet(credentials_file, spreadsheet_url)
+        key = (os.path.abspath(credentials_file), spreadsheet_url, sheet_name)
+        return self._cached(self._worksheets, key,
+                            lambda: spreadsheet.worksheet(sheet_name))
+
+    def spreadsheet(self, credentials_file, spreadsheet_url):
+        """Таблица, открытая ранее или открываемая сейчас"""
+        client = self.client(credentials_file)
+        key = (os.path.abspath(credentials_file), spreadsheet_url)
+        return self._cached(self._spreadsheets, key,
+                            lambda: client.open_by_url(spreadsheet_url))
+
+    def _cached(self, cache, key, open_):
+        """Значение из кэша пула или результат open_(), вызванного без блокировки
+
+        Если два потока открыли одно и то же одновременно, в кэше остается
+        и возвращается обоим первое сохраненное значение.
+        """
+        with self._lock:
+            value = cache.get(key)
+        if value is not None:
+            return value
+        value = open_()
+        with self._lock:
+            return cache.setdefault(key, value)
+
+    def invalidate(self, spreadsheet_url):
+        """Сброс открытых таблиц и листов по URL (например, после ошибки API)"""
+        with self._lock:
+            for key in [k for k in self._spreadsheets if k[1] == spreadsheet_url]:
+                del self._spreadsheets[key]
+            for key in [k for k in self._worksheets if k[1] == spreadsheet_url]:
+                del self._worksheets[key]
+
+    def _drop(self, path):
+        self._clients.pop(path, None)
+        for key in [k for k in self._spreadsheets if k[0] == path]:
+            del self._spreadsheets[key]
+        for key in [k for k in self._worksheets if k[0] == path]:
+            del self._worksheets[key]
+
+
+class GspreadSource:
+    """Листы Google Sheets через gspread (источник по умолчанию)
+
+    Клиенты, таблицы и листы берутся из пула SheetsClientPool; без общего
+    пула источник заводит свой, и клиент авторизуется заново.
+    """
+
+    def __init__(self, credentials_file, pool=None):
+        self.credentials_file = credentials_file
+        self.pool = pool if pool is not None else SheetsClientPool()
+        self.client = None
+
+    def connect(self):
+        if not os.path.exists(self.credentials_file):
+            raise FileNotFoundError(
+                f"Файл ключей {self.credentials_file} не найден!")
+        self.client = self.pool.client(self.credentials_file)
+
+    def revision(self, spreadsheet_url):
+        """Время последнего изменения таблицы по метаданным Drive
+
+        Ошибка запроса не скрывается: ее причину выводит в журнал
+        GoogleSheetsWorker, а снимок листа живет только короткий TTL.
+        """
+        import gspread
+
+        key = gspread.utils.extract_id_from_url(spreadsheet_url)
+        return self.client.get_file_drive_metadata(key)["modifiedTime"]
+
+    def worksheet(self, spreadsheet_url, sheet_name):
+        return self.pool.worksheet(self.credentials_file, spreadsheet_url, sheet_name)
+
+    def sheet_names(self, spreadsheet_url):
+        spreadsheet = self.pool.spreadsheet(self.credentials_file, spreadsheet_url)
+        return [ws.title for ws in spreadsheet.worksheets()]
+
+    def fetch_failed(self, spreadsheet_url, error):
+        import gspread
+
+        # Лист мог быть удален или переименован - при следующем
+        # запуске таблица будет открыта заново
+        if isinstance(error, gspread.exceptions.APIError):
+            self.pool.invalidate(spreadsheet_url)
+
+
+class FileSource:
+    """Листы из локального файла CSV, XLSX или JSON вместо Google Sheets
+
+    URL таблицы - путь к файлу. Листы XLSX выбираются по названию,
+    JSON-объекта {"лист": [...]} - по ключу; если лист в файле один
+    (CSV, JSON-список), он отдается под любым именем. Строки JSON - записи
+    get_all_records или списки значений (первая - заголовки). Ревизия -
+    время изменения файла: кэш снимков обновляется после правки файла.
+    Разобранный файл хранится до его изменения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._books = {}
+
+    def connect(self):
+        pass
+
+    @staticmethod
+    def data_path(spreadsheet_url):
+        """Полный путь к файлу данных; ошибка с понятным текстом, если его нет"""
+        path = os.path.abspath(spreadsheet_url)
+        if not os.path.isfile(path):
+            raise ValueError(f"Файл данных {path} не найден!")
+        return path
+
+    def revision(self, spreadsheet_url):
+        mtime = os.path.getmtime(self.data_path(spreadsheet_url))
+        return datetime.fromtimestamp(mtime, timezone.utc).isoformat()
+
+    def worksheet(self, spreadsheet_url, sheet_name):
+        # Отсутствие файла видно сразу, разбор - при чтении строк
+        self.data_path(spreadsheet_url)
+        return FileWorksheet(self, spreadsheet_url, sheet_name)
+
+    def sheet_names(self, spreadsheet_url):
+        return list(self.load(spreadsheet_url))
+
+    def fetch_failed(self, spreadsheet_url, error):
+        pass
+
+    def load(self, path):
+        """Листы файла: {название: строки значений}"""
+        path = self.data_path(path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._books.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        suffix = Path(path).suffix.lower()
+        if suffix == ".csv":
+            sheets = {Path(path).stem: self.read_csv(path)}
+        elif suffix in (".xlsx", ".xlsm"):
+            sheets = self.read_xlsx(path)
+        elif suffix == ".json":
+            sheets = self.read_json(path)
+        else:
+            raise ValueError(f"Неподдерживаемый формат файла данных: {suffix}")
+
+        with self._lock:
+            self._books[path] = (mtime, sheets)
+        return sheets
+
+    @staticmethod
+    def read_csv(path):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            sample = f.read(64 * 1024)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            return trim(csv.reader(f, dialect))
+
+    @staticmethod
+    def read_xlsx(path):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            return {ws.title: trim([cell_text(value) for value in row]
+                                   for row in ws.iter_rows(values_only=True))
+                    for ws in workbook.worksheets}
+        finally:
+            workbook.close()
+
+    @classmethod
+    def read_json(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return {name: cls.json_grid(rows) for name, rows in data.items()}
+        return {Path(path).stem: cls.json_grid(data)}
+
+    @staticmethod
+    def json_grid(rows):
+        """Строки значений из записей или списков значений"""
+        if rows and isinstance(rows[0], dict):
+            header = list(dict.fromkeys(key for row in rows for key in row))
+            rows = [header] + [[row.get(key) for key in header] for row in rows]
+        return trim([cell_text(value) for value in row] for row in rows)
+
+
+class HttpSheetsSource:
+    """Листы через HTTP API значений Google Sheets v4 без gspread
+
+    Служит для работы с локальной подменой SheetsStandIn. URL таблицы -
+    как у Google (.../spreadsheets/d/<id>/...), запросы уходят на тот же
+    хост, если не задан api_url. Ответ на диапазон может прийти не
+    целиком: в поле range ответа - фактически отданные строки, остаток
+    дозапрашивается, пока не будет достигнут конец диапазона или листа.
+    """
+
+    SPREADSHEET_ID = re.compile(r"/spreadsheets/d/([^/]+)")
+
+    def __init__(self, api_url=None, timeout=60):
+        self.api_url = api_url
+        self.timeout = timeout
+
+    def connect(self):
+        pass
+
+    def endpoint(self, spreadsheet_url):
+        """Адрес API и идентификатор таблицы по ее URL"""
+        match = self.SPREADSHEET_ID.search(spreadsheet_url)
+        if match is None:
+            raise ValueError(f"Не удалось определить таблицу по URL: {spreadsheet_url}")
+        parts = urlsplit(spreadsheet_url)
+        api_url = self.api_url or f"{parts.scheme}://{parts.netloc}"
+        return api_url.rstrip("/"), match.group(1)
+
+    def request(self, spreadsheet_url, path, params=()):
+        from urllib.request import urlopen
+        from urllib.error import HTTPError
+
+        api_url, key = self.endpoint(spreadsheet_url)
+        url = path.format(api=api_url, key=quote(key))
+        if params:
+            url += "?" + urlencode(params)
+        try:
+            with urlopen(url, timeout=self.timeout) as response:
+                return json.load(response)
+        except HTTPError as e:
+            try:
+                message = json.load(e)["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = e.reason
+            raise RuntimeError(f"Ошибка API таблицы ({e.code}): {message}") from None
+
+    def revision(self, spreadsheet_url):
+        return self.request(spreadsheet_url, "{api}/drive/v3/files/{key}",
+                            [("fields", "modifiedTime")])["modifiedTime"]
+
+    def properties(self, spreadsheet_url):
+        """Свойства листов таблицы: названия и размеры"""
+        metadata = self.request(spreadsheet_url, "{api}/v4/spreadsheets/{key}")
+        return [sheet["properties"] for sheet in metadata.get("sheets", [])]
+
+    def worksheet(self, spreadsheet_url, sheet_name):
+        for properties in self.properties(spreadsheet_url):
+            if properties["title"] == sheet_name:
+                return HttpWorksheet(self, spreadsheet_url, sheet_name,
+                                     properties["gridProperties"]["rowCount"])
+        raise ValueError(f"В таблице нет листа {sheet_name}")
+
+    def sheet_names(self, spreadsheet_url):
+        return [properties["title"] for properties in self.properties(spreadsheet_url)]
+
+    def fetch_failed(self, spreadsheet_url, error):
+        pass
+
+
+class HttpWorksheet:
+    """Лист таблицы HttpSheetsSource с методами gspread.Worksheet для загрузки"""
+
+    def __init__(self, source, spreadsheet_url, title, row_count):
+        self.source = source
+        self.spreadsheet_url = spreadsheet_url
+        self.title = title
+        self.row_count = row_count
+
+    def row_values(self, row):
+        values = self.batch_get([f"{row}:{row}"])[0]
+        return values[0] if values else []
+
+    def get_all_records(self, expected_headers=None):
+        return grid_records(self.batch_get([""])[0], expected_headers)
+
+    def batch_get(self, ranges, major_dimension="ROWS"):
+        """Значения диапазонов с дозапросом частично отданных"""
+        results = [[] for _ in ranges]
+        pending = [(i, cells, parse_cells(cells)[1]) for i, cells in enumerate(ranges)]
+        while pending:
+            response = self.source.request(
+                self.spreadsheet_url, "{api}/v4/spreadsheets/{key}/values:batchGet",
+                [("ranges", self.a1(cells)) for _, cells, _ in pending]
+                + [("majorDimension", major_dimension)])
+
+            following = []
+            for (i, cells, first_row), value_range in zip(pending, response["valueRanges"]):
+                first_col, start, last_col, end = parse_cells(
+                    split_range(value_range["range"])[1])
+                self.append(results[i], value_range.get("values", []),
+                            start - first_row, major_dimension)
+                requested_end = parse_cells(cells)[3]
+                limit = min(requested_end or self.row_count, self.row_count)
+                if end is not None and end < limit:
+                    following.append((i, format_cells(first_col, end + 1, last_col,
+                                                      requested_end), first_row))
+            pending = following
+        return results
+
+    def a1(self, cells):
+        return f"{quote_sheet(self.title)}!{cells}" if cells else quote_sheet(self.title)
+
+    @staticmethod
+    def append(result, values, offset, major_dimension):
+        """Часть ответа в результат: offset - строк от начала диапазона"""
+        if major_dimension == "COLUMNS":
+            for i, values_column in enumerate(values):
+                if i == len(result):
+                    result.append([])
+                column = result[i]
+                column.extend([""] * (offset - len(column)))
+                column.extend(values_column)
+        elif values:
+            result.extend([] for _ in range(offset - len(result)))
+            result.extend(values)
+
+
+class SheetsStandIn:
+    """Локальная подмена Google Sheets API для замеров без сети
+
+    Отдает листы sheets ({название: строки значений}, например
+    FileSource().load(path)) по путям API значений v4: метаданные таблицы,
+    values/{range} и values:batchGet, а также modifiedTime по пути Drive v3.
+    latency - задержка каждого ответа в секундах, page_rows - не больше
+    стольких строк диапазона в одном ответе (остаток клиент дозапрашивает).
+    Запросы обслуживаются параллельно; requests - число обслуженных.
+    """
+
+    def __init__(self, sheets, spreadsheet_id="fixture", latency=0.0, page_rows=None,
+                 host="127.0.0.1", port=0):
+        self.sheets = dict(sheets)
+        self.spreadsheet_id = spreadsheet_id
+        self.latency = latency
+        self.page_rows = page_rows
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.modified = datetime.now(timezone.utc).isoformat()
+        self.server = None
+        self._lock = threading.Lock()
+        self._widths = {title: max((len(row) for row in grid), default=0)
+                        for title, grid in self.sheets.items()}
+
+    @property
+    def url(self):
+        """URL таблицы для HttpSheetsSource"""
+        return f"http://{self.host}:{self.port}/spreadsheets/d/{self.spreadsheet_id}/edit"
+
+    def start(self):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                standin.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def update(self, title, grid):
+        """Замена листа - как правка таблицы, меняет ревизию"""
+        with self._lock:
+            self.sheets[title] = grid
+            self._widths[title] = max((len(row) for row in grid), default=0)
+            self.modified = datetime.now(timezone.utc).isoformat()
+
+    def handle(self, request):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        parts = urlsplit(request.path)
+        path = unquote(parts.path)
+        query = parse_qs(parts.query)
+        major_dimension = query.get("majorDimension", ["ROWS"])[0]
+        prefix = f"/v4/spreadsheets/{self.spreadsheet_id}"
+        try:
+            if path == f"/drive/v3/files/{self.spreadsheet_id}":
+                body = {"id": self.spreadsheet_id, "modifiedTime": self.modified}
+            elif path == prefix:
+                body = self.metadata()
+            elif path == f"{prefix}/values:batchGet":
+                body = {"spreadsheetId": self.spreadsheet_id,
+                        "valueRanges": [self.value_range(a1, major_dimension)
+                                        for a1 in query.get("ranges", [])]}
+            elif path.startswith(f"{prefix}/values/"):
+                body = self.value_range(path[len(prefix) + len("/values/"):],
+                                        major_dimension)
+            else:
+                return self.send(request, 404, self.error(404, "NOT_FOUND",
+                                                          "Requested entity was not found."))
+        except ValueError as e:
+            return self.send(request, 400, self.error(400, "INVALID_ARGUMENT", str(e)))
+        self.send(request, 200, body)
+
+    def metadata(self):
+        return {"spreadsheetId": self.spreadsheet_id,
+                "properties": {"title": self.spreadsheet_id},
+                "sheets": [{"properties": {
+                    "sheetId": i, "title": title, "index": i,
+                    "gridProperties": {"rowCount": len(grid),
+                                       "columnCount": self._widths[title]}}}
+                    for i, (title, grid) in enumerate(self.sheets.items())]}
+
+    def value_range(self, a1, major_dimension):
+        """Значения диапазона, не больше page_rows строк"""
+        sheet, cells = split_range(a1)
+        if sheet is None:
+            # Без "!" диапазон - имя листа целиком или ячейки первого листа
+            title = a1[1:-1].replace("''", "'") if a1.startswith("'") else a1
+            sheet, cells = (title, "") if title in self.sheets else (next(iter(self.sheets)), a1)
+        if sheet not in self.sheets:
+            raise ValueError(f"Unable to parse range: {a1}")
+
+        grid = self.sheets[sheet]
+        first_col, first_row, last_col, last_row = parse_cells(cells)
+        last_col = last_col or max(self._widths[sheet], first_col)
+        last_row = min(last_row or len(grid), len(grid))
+        if self.page_rows:
+            last_row = min(last_row, first_row + self.page_rows - 1)
+        if last_row < first_row:
+            return {"range": a1, "majorDimension": major_dimension}
+
+        cells = format_cells(first_col, first_row, last_col, last_row)
+        value_range = {"range": f"{quote_sheet(sheet)}!{cells}",
+                       "majorDimension": major_dimension}
+        values = grid_values(grid, cells, major_dimension)
+        if values:
+            value_range["values"] = values
+        return value_range
+
+    @staticmethod
+    def error(code, status, message):
+        return {"error": {"code": code, "message": message, "status": status}}
+
+    @staticmethod
+    def send(request, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        request.send_response(code)
+        request.send_header("Content-Type", "application/json; charset=UTF-8")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
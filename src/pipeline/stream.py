@@ -0,0 +1,158 @@
+from collections.abc import Mapping
+
+# Потоковая ведомость: строки листа идут от постраничной загрузки через
+# группировку прямо в запись книги, и ни лист, ни итоги по адресам целиком
+# в памяти не собираются. Лист должен быть упорядочен по адресу или по коду
+# объекта: группа строк с одним ключом закончена, когда ключ сменился, и ее
+# адреса сразу становятся строками ведомости.
+
+
+class AddressGroups:
+    """Законченные группы строк листа, упорядоченного по адресу или коду объекта
+
+    Перебор отдает ({адрес: {модель: количество}}, {адрес: код объекта})
+    для каждой группы. Строки обрабатываются, как в process_camera_data:
+    пробелы по краям отбрасываются, строки без адреса или модели
+    пропускаются, адреса и модели внутри группы - в порядке первого
+    появления, код объекта - из последней строки адреса. Поэтому для
+    упорядоченного листа ведомость совпадает с обычной.
+
+    Адрес, встретившийся снова после того, как его группа закончилась,
+    означает, что лист не упорядочен, - это ошибка. Для проверки хранятся
+    сами адреса законченных групп (хэш мог бы совпасть у разных адресов
+    и дать ложную ошибку). Это ссылки на уже созданные строки, но набор
+    растет с числом адресов листа (не строк), поэтому память потоковой
+    ведомости не постоянна, а пропорциональна числу адресов.
+    """
+
+    GROUP_BY = ("address", "code")
+
+    def __init__(self, rows, group_by="address"):
+        if group_by not in self.GROUP_BY:
+            raise ValueError(f"Неизвестный порядок листа для потоковой ведомости: {group_by}")
+        self.rows = rows
+        self.group_by = group_by
+        self.row_count = 0
+
+    def __iter__(self):
+        by_address = self.group_by == "address"
+        finished = set()
+        group = {}
+        codes = {}
+        current = None
+        row_number = 1
+        for row_number, (code, address, model) in enumerate(self.rows, 2):
+            code = code.strip()
+            address = address.strip()
+            model = model.strip()
+            if not (address and model):
+                continue
+            key = address if by_address else code
+            if key != current:
+                if group:
+                    finished.update(group)
+                    yield group, codes
+                    group = {}
+                    codes = {}
+                current = key
+            counts = group.get(address)
+            if counts is None:
+                if address in finished:
+                    order = "адресу" if by_address else "коду объекта"
+                    raise ValueError(
+                        f"Адрес {address} в строке {row_number} встречается повторно "
+                        f"после других адресов: для потоковой ведомости лист нужно "
+                        f"упорядочить по {order}")
+                counts = group[address] = {}
+            counts[model] = counts.get(model, 0) + 1
+            codes[address] = code
+        self.row_count = row_number - 1
+        if group:
+            yield group, codes
+
+
+class GroupCodes(Mapping):
+    """Коды объектов текущей группы {адрес: код} - object_codes потоковой ведомости"""
+
+    __slots__ = ("current",)
+
+    def __init__(self):
+        self.current = {}
+
+    def __len__(self):
+        return len(self.current)
+
+    def __iter__(self):
+        return iter(self.current)
+
+    def __getitem__(self, address):
+        return self.current[address]
+
+
+class StreamedCounts:
+    """address_data потоковой ведомости для ExcelReportGenerator
+
+    Разметке книги заранее нужны все модели (столбцы вне каталога)
+    и число адресов (место итоговой строки и подписи), поэтому лист
+    читается дважды. scan() - первый проход: от него остаются только
+    эти сведения и коды первой группы (имя файла). items() - второй
+    проход: адреса законченных групп отдаются записи книги по мере
+    загрузки, object_codes - коды текущей группы. Если лист изменился
+    между проходами и адреса или модели не совпадают с первым проходом,
+    items() прерывается ошибкой, не дописав книгу.
+    """
+
+    def __init__(self, rows, group_by, addresses, models, first_codes, row_count):
+        self.rows = rows
+        self.group_by = group_by
+        self.addresses = addresses
+        self.models = models
+        self.first_codes = first_codes
+        self.row_count = row_count
+        self.object_codes = GroupCodes()
+
+    @classmethod
+    def scan(cls, rows, group_by="address"):
+        """Первый проход по строкам rows(): адреса, модели и коды первой группы
+
+        rows - функция, которая при каждом вызове заново отдает строки
+        листа (код, адрес, камера).
+        """
+        groups = AddressGroups(rows(), group_by)
+        addresses = 0
+        models = set()
+        first_codes = None
+        for group, codes in groups:
+            addresses += len(group)
+            for counts in group.values():
+                models.update(counts)
+            if first_codes is None:
+                first_codes = codes
+        if not groups.row_count:
+            raise ValueError("В таблице нет данных!")
+        if not addresses:
+            raise ValueError("Нет данных для формирования отчета!")
+        return cls(rows, group_by, addresses, models, first_codes, groups.row_count)
+
+    def camera_models(self):
+        return sorted(self.models)
+
+    def __len__(self):
+        return self.addresses
+
+    def items(self):
+        emitted = 0
+        for group, codes in AddressGroups(self.rows(), self.group_by):
+            emitted += len(group)
+            if emitted > self.addresses:
+                raise ValueError("Лист изменился во время формирования ведомости: "
+                                 "адресов больше, чем при первом проходе")
+            self.object_codes.current = codes
+            for address, counts in group.items():
+                if not self.models.issuperset(counts):
+                    raise ValueError("Лист изменился во время формирования ведомости: "
+                                     f"у адреса {address} новая модель камеры")
+                yield address, counts
+        if emitted != self.addresses:
+            raise ValueError("Лист изменился во время формирования ведомости: "
+                             "адресов меньше, чем при первом проходе")
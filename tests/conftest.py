@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Пакет pipeline лежит в src, как и для запуска приложения
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
@@ -0,0 +1,82 @@
+"""Компактный результат агрегации CameraCounts"""
+import pickle
+from array import array
+
+import pytest
+
+from pipeline import CameraCounts, GoogleSheetsWorker
+from pipeline.counts import pack
+
+ADDRESS_DATA = {
+    "ул. Ленина 2": {"Y": 1, "X": 3},
+    "ул. Ленина 1": {"X": 2},
+    "ул. Гоголя 7": {"Z": 300, "Y": 1},
+}
+OBJECT_CODES = {"ул. Ленина 2": "O1-2", "ул. Ленина 1": "O1-1", "ул. Гоголя 7": "O2-7"}
+
+
+@pytest.fixture
+def counts():
+    return CameraCounts.from_mapping(ADDRESS_DATA, OBJECT_CODES)
+
+
+def as_dicts(counts):
+    return {address: dict(row) for address, row in counts.items()}
+
+
+def test_iteration_keeps_order_of_first_appearance(counts):
+    assert list(counts) == list(ADDRESS_DATA)
+    assert [list(row) for row in counts.values()] == [list(v) for v in ADDRESS_DATA.values()]
+    assert counts["ул. Ленина 2"].items() == [("Y", 1), ("X", 3)]
+    assert as_dicts(counts) == ADDRESS_DATA
+    assert list(counts.object_codes.items()) == list(OBJECT_CODES.items())
+    assert counts.camera_models() == ["X", "Y", "Z"]
+
+
+def test_lookups(counts):
+    row = counts["ул. Гоголя 7"]
+    assert len(row) == 2 and row["Z"] == 300
+    assert row.get("X", 0) == 0           # модель есть в таблице, но не у адреса
+    with pytest.raises(KeyError):
+        row["Нет такой"]
+    assert "ул. Ленина 1" in counts and "ул. Нет" not in counts
+    with pytest.raises(KeyError):
+        counts["ул. Нет"]
+    assert counts.object_codes["ул. Гоголя 7"] == "O2-7"
+
+
+def test_pickle_round_trip(counts):
+    counts["ул. Ленина 1"]                # словари поиска уже построены
+    restored = pickle.loads(pickle.dumps(counts))
+    # Словари поиска не передаются, а строятся заново
+    assert restored._address_ids is None and restored._model_ids is None
+
+    assert as_dicts(restored) == ADDRESS_DATA
+    assert list(restored) == list(counts)
+    assert dict(restored.object_codes) == OBJECT_CODES
+    assert restored.quantities.typecode == "H"     # 300 не помещается в байт
+
+    codes = pickle.loads(pickle.dumps(counts.object_codes))
+    assert dict(codes) == OBJECT_CODES
+
+
+def test_pack_picks_narrowest_type():
+    assert pack([1, 255]).typecode == "B"
+    assert pack(array("I", [256])).typecode == "H"
+    assert pack([]).typecode == "B"
+    with pytest.raises(OverflowError):
+        pack([1 << 64])
+
+
+def test_process_camera_data_returns_camera_counts():
+    worker = GoogleSheetsWorker("", "", "", None)
+    data = {"Код объекта": ["O1-1", "O1-1", "O1-2", "O1-1"],
+            "Адрес установки": [" ул. Ленина 1", "ул. Ленина 1", "ул. Ленина 2", "ул. Ленина 1"],
+            "Камера": ["X", "Y", "X", ""]}
+    address_data, camera_models, object_codes = worker.process_camera_data(data)
+
+    assert isinstance(address_data, CameraCounts)
+    restored = pickle.loads(pickle.dumps(address_data))
+    assert as_dicts(restored) == {"ул. Ленина 1": {"X": 1, "Y": 1}, "ул. Ленина 2": {"X": 1}}
+    assert camera_models == ["X", "Y"]
+    assert dict(object_codes) == {"ул. Ленина 1": "O1-1", "ул. Ленина 2": "O1-2"}
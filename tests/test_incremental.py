@@ -0,0 +1,133 @@
+"""Инкрементальная агрегация и догрузка конца листа"""
+import csv
+import random
+
+import pytest
+
+from pipeline import FileSource, GoogleSheetsWorker, IncrementalAggregator, load_report_data
+
+COLUMNS = GoogleSheetsWorker.COLUMNS
+BLOCK_ROWS = 50
+
+
+def make_rows(count, seed=1):
+    rnd = random.Random(seed)
+    return [(f"O{rnd.randint(1, 9)}-{i % 40}", f"ул. Тестовая, {rnd.randint(1, 60)}",
+             rnd.choice(["X", "Y", "Z", "DS-2CD1043G0-IUVSD 4mm"]))
+            for i in range(count)]
+
+
+def write_sheet(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    return str(path)
+
+
+def normalized(result):
+    address_data, camera_models, object_codes = result
+    return ([(address, sorted(counts.items())) for address, counts in address_data.items()],
+            list(camera_models), sorted(object_codes.items()))
+
+
+def expected(rows):
+    """Итоги полной агрегации тех же строк"""
+    worker = GoogleSheetsWorker("", "", "", None)
+    data = {name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)}
+    return normalized(worker.process_camera_data(data))
+
+
+def as_columns(rows):
+    return [[row[i] for row in rows] for i in range(len(COLUMNS))]
+
+
+@pytest.fixture
+def sync(tmp_path):
+    return IncrementalAggregator(tmp_path / "sync", block_rows=BLOCK_ROWS)
+
+
+def test_edits_appends_and_deletes_match_full_aggregation(sync):
+    rows = make_rows(400)
+    assert normalized(sync.update("url", "Лист", as_columns(rows))) == expected(rows)
+
+    rows[7] = ("O1-7", "ул. Новая, 1", "X")         # правка
+    rows[260] = ("O2-1", rows[260][1], "Y")
+    assert normalized(sync.update("url", "Лист", as_columns(rows))) == expected(rows)
+    assert sync.last_stats["changed_blocks"] == 2
+
+    rows += make_rows(120, seed=2)                   # добавление
+    assert normalized(sync.update("url", "Лист", as_columns(rows))) == expected(rows)
+
+    del rows[30:90]                                  # удаление сдвигает все ниже
+    assert normalized(sync.update("url", "Лист", as_columns(rows))) == expected(rows)
+
+    del rows[200:]                                   # лист укоротился
+    assert normalized(sync.update("url", "Лист", as_columns(rows))) == expected(rows)
+    assert sync.last_stats["blocks"] == 4
+
+
+def test_state_survives_restart(tmp_path):
+    rows = make_rows(300)
+    IncrementalAggregator(tmp_path, block_rows=BLOCK_ROWS).update("url", "Лист", as_columns(rows))
+
+    rows[150] = ("O3-1", "ул. Другая, 5", "Z")
+    restarted = IncrementalAggregator(tmp_path, block_rows=BLOCK_ROWS)
+    assert normalized(restarted.update("url", "Лист", as_columns(rows))) == expected(rows)
+    assert restarted.last_stats["changed_blocks"] == 1
+
+
+def load(sheet, sync):
+    data, context = load_report_data(sheet, "", "Камеры", source=FileSource(), sync=sync)
+    return normalized(data), context
+
+
+def test_appended_rows_are_fetched_from_last_block(tmp_path, sync):
+    rows = make_rows(420)
+    sheet = write_sheet(tmp_path / "Камеры.csv", rows)
+    result, context = load(sheet, sync)
+    assert result == expected(rows)
+    assert context["fetched_rows"] == 420
+
+    rows += make_rows(75, seed=3)
+    write_sheet(tmp_path / "Камеры.csv", rows)
+    result, context = load(sheet, sync)
+    assert result == expected(rows)
+    # Последний сохраненный блок (строки 400-419) и новые строки
+    assert context["fetched_rows"] == 495 - 400
+    assert context["rows"] == 495
+
+
+@pytest.mark.parametrize("change", ["edit", "edit-last-block-and-append", "delete"])
+def test_other_changes_load_whole_sheet(tmp_path, sync, change):
+    rows = make_rows(420)
+    sheet = write_sheet(tmp_path / "Камеры.csv", rows)
+    load(sheet, sync)
+
+    if change == "delete":
+        del rows[10:20]
+    elif change == "edit":
+        # Лист не вырос - хвостом не обойтись
+        rows[100] = ("O5-5", "ул. Правленая, 1", "Y")
+    else:
+        rows[405] = ("O5-5", "ул. Правленая, 1", "Y")
+        rows += make_rows(30, seed=4)
+    write_sheet(tmp_path / "Камеры.csv", rows)
+    result, context = load(sheet, sync)
+    assert result == expected(rows)
+    assert context["fetched_rows"] == len(rows)
+
+
+def test_whole_sheet_is_verified_every_full_every_syncs(tmp_path):
+    sync = IncrementalAggregator(tmp_path / "sync", block_rows=BLOCK_ROWS, full_every=3)
+    rows = make_rows(120)
+    sheet = write_sheet(tmp_path / "Камеры.csv", rows)
+    fetched = [load(sheet, sync)[1]["fetched_rows"]]
+    for seed in range(4):
+        rows += make_rows(10, seed=10 + seed)
+        write_sheet(tmp_path / "Камеры.csv", rows)
+        result, context = load(sheet, sync)
+        assert result == expected(rows)
+        fetched.append(context["fetched_rows"])
+    # Полная загрузка, две догрузки с последнего блока, снова полная сверка
+    assert fetched == [120, 30, 40, 150, 60]
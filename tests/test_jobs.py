@@ -0,0 +1,157 @@
+"""Очередь заданий и журнал окна"""
+import threading
+import time
+
+from pipeline import JobQueue, LogSink, ReportJob
+
+
+class Blocked:
+    """Функция заданий, которая держит задание "Первый", пока не вызван release()"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.order = []
+
+    def __call__(self, job):
+        self.order.append(job.title)
+        if job.title == "Первый":
+            self.started.set()
+            while not self.released.wait(0.01):
+                job.cancel.check()
+        return job.title
+
+    def release(self):
+        self.released.set()
+
+
+def wait_idle(queue, timeout=5):
+    deadline = time.monotonic() + timeout
+    while queue.counts() != (0, 0):
+        assert time.monotonic() < deadline, "задания не закончились"
+        time.sleep(0.01)
+
+
+def test_shutdown_cancels_and_waits_for_jobs():
+    started = threading.Event()
+
+    def run(job):
+        started.set()
+        while True:
+            job.cancel.check()
+            time.sleep(0.01)
+
+    queue = JobQueue(run, max_workers=1)
+    running = queue.submit("single", "Первый", {})
+    waiting = queue.submit("single", "Второй", {})
+    assert started.wait(5)
+
+    assert queue.shutdown(timeout=5) == []
+    assert running.status == ReportJob.CANCELLED
+    assert waiting.status == ReportJob.CANCELLED
+
+
+def test_shutdown_returns_jobs_that_did_not_stop():
+    release = threading.Event()
+    queue = JobQueue(lambda job: release.wait(5), max_workers=1)
+    job = queue.submit("single", "Зависший запрос", {})
+
+    assert queue.shutdown(timeout=0.1) == [job]
+    release.set()
+
+
+def test_higher_priority_runs_first_then_submission_order():
+    run = Blocked()
+    queue = JobQueue(run, max_workers=1)
+    queue.submit("single", "Первый", {})
+    assert run.started.wait(5)
+    queue.submit("batch", "Пакет", {}, priority=2)
+    queue.submit("single", "Второй", {}, priority=1)
+    queue.submit("single", "Срочный", {}, priority=0)
+    queue.submit("single", "Третий", {}, priority=1)
+    assert queue.counts() == (1, 4)
+
+    run.release()
+    wait_idle(queue)
+    assert run.order == ["Первый", "Срочный", "Второй", "Третий", "Пакет"]
+    assert all(job.status == ReportJob.DONE for job in queue.jobs.values())
+
+
+def test_new_job_with_same_key_preempts_stale_one():
+    run = Blocked()
+    changes = []
+    queue = JobQueue(run, on_change=lambda job: changes.append((job.title, job.status)),
+                     max_workers=1)
+    stale = queue.submit("single", "Первый", {}, key=("url", "Камеры"))
+    assert run.started.wait(5)
+    other = queue.submit("single", "Склад", {}, key=("url", "Склад"))
+    fresh = queue.submit("single", "Новый", {}, key=("url", "Камеры"))
+
+    wait_idle(queue)
+    assert stale.status == ReportJob.CANCELLED
+    assert other.status == fresh.status == ReportJob.DONE
+    assert run.order == ["Первый", "Склад", "Новый"]
+    assert ("Первый", ReportJob.CANCELLED) in changes
+
+
+def test_cancel_queued_and_running_jobs():
+    run = Blocked()
+    queue = JobQueue(run, max_workers=1)
+    running = queue.submit("single", "Первый", {})
+    assert run.started.wait(5)
+    queued = queue.submit("single", "Второй", {})
+
+    assert queue.cancel(queued.job_id)
+    # Ожидающее снимается сразу, выполняющееся - в точке проверки
+    assert queued.status == ReportJob.CANCELLED
+    assert queue.cancel(running.job_id)
+    wait_idle(queue)
+    assert running.status == ReportJob.CANCELLED
+    assert run.order == ["Первый"]
+
+    assert not queue.cancel(running.job_id)      # уже закончено
+    assert not queue.cancel(999)
+    assert sorted(queue.clear_finished()) == [running.job_id, queued.job_id]
+    assert queue.jobs == {}
+
+
+def test_failed_job_keeps_error_and_queue_goes_on():
+    def run(job):
+        if job.title == "Сбой":
+            raise ValueError("В таблице нет листа Камеры")
+        return job.title
+
+    queue = JobQueue(run, max_workers=1)
+    failed = queue.submit("single", "Сбой", {})
+    done = queue.submit("single", "Следующий", {})
+    wait_idle(queue)
+    assert failed.status == ReportJob.FAILED
+    assert failed.describe() == "Ошибка: В таблице нет листа Камеры"
+    assert done.result == "Следующий"
+
+
+def test_log_sink_drains_lines_once():
+    sink = LogSink()
+    sink.write("первая")
+    sink.write("вторая")
+    assert sink.drain() == ["первая", "вторая"]
+    assert sink.drain() == []
+
+
+def test_log_sink_keeps_newest_lines_and_full_file(tmp_path):
+    log_file = tmp_path / "logs" / "app.log"
+    sink = LogSink(log_file, max_lines=3)
+    threads = [threading.Thread(target=lambda n=n: [sink.write(f"{n}-{i}") for i in range(50)])
+               for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sink.write("последняя")
+
+    lines = sink.drain()
+    assert len(lines) == 3 and lines[-1] == "последняя"
+    sink.close()
+    written = log_file.read_text(encoding="utf-8").splitlines()
+    assert len(written) == 201
+    assert written[-1].endswith(" последняя")
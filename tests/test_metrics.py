@@ -0,0 +1,33 @@
+"""Замеры этапов: память относится к этапу, а не ко всему процессу"""
+
+import pytest
+
+from pipeline import PipelineMetrics, current_rss_mb
+
+pytestmark = pytest.mark.skipif(current_rss_mb() is None, reason="нет /proc/self/status")
+
+
+def test_stage_records_its_own_rss_growth():
+    metrics = PipelineMetrics()
+    kept = []
+    with metrics.stage("build"):
+        kept.append(b"x" * (64 * 1024 * 1024))
+    with metrics.stage("save"):
+        pass
+
+    assert metrics.stages["build"]["rss_delta_mb"] >= 48
+    # Следующий этап не наследует память предыдущего, в отличие от пика процесса
+    assert abs(metrics.stages["save"]["rss_delta_mb"]) < 16
+    assert "build" in metrics.summary() and "RSS +" in metrics.summary()
+    del kept
+
+
+def test_merged_stages_keep_rss_growth():
+    metrics = PipelineMetrics()
+    metrics.merge({"fetch": {"wall": 1.0, "cpu": 0.5, "peak_mb": None,
+                             "rss_mb": 120.0, "rss_delta_mb": 30.0}})
+    # Замеры из процесса старой версии без прироста
+    metrics.merge({"fetch": {"wall": 1.0, "cpu": 0.5, "peak_mb": None, "rss_mb": 150.0}})
+    assert metrics.stages["fetch"]["rss_delta_mb"] == 30.0
+    assert metrics.stages["fetch"]["rss_mb"] == 150.0
+    assert metrics.stages["fetch"]["wall"] == 2.0
@@ -0,0 +1,109 @@
+"""Имена файлов ведомостей у одновременных заданий"""
+import os
+import threading
+
+from pipeline import BatchReportRunner, FileSource, OutputNames, run_report
+
+HEADER = "Код объекта,Адрес установки,Камера\n"
+
+
+def write_sheet(path, code="O1-1"):
+    path.write_text(HEADER + f"{code},ул. Ленина 1,X\n{code},ул. Ленина 2,Y\n",
+                    encoding="utf-8")
+    return str(path)
+
+
+def test_reserve_skips_names_of_active_jobs(tmp_path):
+    first = OutputNames.reserve(tmp_path, "Ведомость-1.xlsx")
+    second = OutputNames.reserve(tmp_path, "Ведомость-1.xlsx")
+    third = OutputNames.reserve(tmp_path, "Ведомость-1.xlsx")
+    try:
+        assert [first.name, second.name, third.name] == [
+            "Ведомость-1.xlsx", "Ведомость-1-2.xlsx", "Ведомость-1-3.xlsx"]
+    finally:
+        for path in (first, second, third):
+            OutputNames.release(path)
+    # Освобожденное имя снова свободно
+    path = OutputNames.reserve(tmp_path, "Ведомость-1.xlsx")
+    OutputNames.release(path)
+    assert path == first
+
+
+def test_reserve_is_thread_safe(tmp_path):
+    names = []
+    lock = threading.Lock()
+
+    def reserve():
+        path = OutputNames.reserve(tmp_path, "Ведомость-1.xlsx")
+        with lock:
+            names.append(path)
+
+    threads = [threading.Thread(target=reserve) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert len(set(names)) == 20
+    finally:
+        for path in names:
+            OutputNames.release(path)
+
+
+def test_single_report_does_not_overwrite_running_job(tmp_path):
+    sheet = write_sheet(tmp_path / "Камеры.csv")
+    output_dir = tmp_path / "output"
+    # Идущее задание (например, пакет) уже заняло имя
+    with OutputNames.job():
+        OutputNames.reserve(output_dir, "Ведомость-1.xlsx")
+        filename, _ = run_report(sheet, "", "Камеры", output_dir=str(output_dir),
+                                 source=FileSource())
+    assert os.path.basename(filename) == "Ведомость-1-2.xlsx"
+
+    # После окончания заданий повторный запуск заменяет свою ведомость
+    filename, _ = run_report(sheet, "", "Камеры", output_dir=str(output_dir),
+                             source=FileSource())
+    assert os.path.basename(filename) == "Ведомость-1.xlsx"
+
+
+def test_finished_report_is_kept_while_other_jobs_run(tmp_path):
+    sheet = write_sheet(tmp_path / "Камеры.csv")
+    output_dir = tmp_path / "output"
+    with OutputNames.job():
+        # Одиночное задание закончилось раньше пакета...
+        first, _ = run_report(sheet, "", "Камеры", output_dir=str(output_dir),
+                              source=FileSource())
+        # ...и пакет, дошедший до записи позже, не заменяет его файл
+        later = OutputNames.reserve(output_dir, "Ведомость-1.xlsx")
+    assert os.path.basename(first) == "Ведомость-1.xlsx"
+    assert later.name == "Ведомость-1-2.xlsx"
+
+
+def test_batch_names_stay_unique_and_are_released(tmp_path):
+    first = write_sheet(tmp_path / "Первый.csv")
+    second = write_sheet(tmp_path / "Второй.csv")
+    output_dir = tmp_path / "output"
+    runner = BatchReportRunner([(first, "Камеры"), (second, "Камеры")], "", None,
+                               lambda message: None, source=FileSource(),
+                               fetch_workers=2, build_workers=1,
+                               output_dir=str(output_dir))
+    filenames, failed = runner.execute()
+
+    assert not failed
+    assert sorted(map(os.path.basename, filenames)) == [
+        "Ведомость-1-2.xlsx", "Ведомость-1.xlsx"]
+    path = OutputNames.reserve(output_dir, "Ведомость-1.xlsx")
+    OutputNames.release(path)
+    assert path.name == "Ведомость-1.xlsx"
+
+
+def test_remove_partial_keeps_other_processes_files(tmp_path):
+    own = OutputNames.partial(tmp_path / "Ведомость-1.xlsx")
+    other = tmp_path / "Ведомость-2.xlsx.999999999-1.part"
+    report = tmp_path / "Ведомость-3.xlsx"
+    for path in (own, other, report):
+        path.write_bytes(b"")
+
+    assert OutputNames.remove_partial(tmp_path) == 1
+    assert not own.exists()
+    assert other.exists() and report.exists()
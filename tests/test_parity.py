@@ -0,0 +1,112 @@
+"""Совпадение результатов движка ведомостей на тестовом листе
+
+Окна Tk и Qt и командная строка вызывают один движок - пакет pipeline.
+Лист - записи get_all_records с пробелами, пустыми ячейками и моделями
+вне каталога. Все способы агрегации должны дать те же адреса в том же
+порядке, те же количества, модели и коды объектов, что цикл Python
+по записям; ведомости всеми способами записи и с шаблоном из файла -
+ту же книгу и те же итоги, что эталонная книга openpyxl.
+"""
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from pipeline import (GoogleSheetsWorker, IncrementalAggregator, ExcelReportGenerator,
+                      ReportSummary, render_report)
+from workbooks import workbook_diffs
+
+URL, SHEET = "fixture", "Лист1"
+ROWS = 2000
+
+
+def make_sheet(rows=ROWS, seed=1):
+    """Тестовый лист: каждая 50-я строка - модель вне каталога"""
+    rnd = random.Random(seed)
+    addresses = rows // 20
+    models = ExcelReportGenerator.HEADERS[2:16]
+    records = []
+    for _ in range(rows):
+        i = rnd.randrange(addresses)
+        records.append({
+            "Код объекта": f" O{i % 9 + 1}-{i} ",
+            "Адрес установки": f"г. Брест, ул. Тестовая, д. {i}  ",
+            "Камера": rnd.choice(models) if rnd.random() > 0.02 else "",
+        })
+    for i, record in enumerate(records[::50]):
+        record["Камера"] = f" Камера вне каталога {i % 3} "
+    return records
+
+
+def normalized(result):
+    """Результат агрегации для сравнения: порядок адресов важен, моделей в адресе - нет"""
+    address_data, camera_models, object_codes = result
+    return ([(address, dict(counts)) for address, counts in address_data.items()],
+            list(camera_models), list(object_codes.items()))
+
+
+@pytest.fixture(scope="module")
+def records():
+    return make_sheet()
+
+
+def columns(records):
+    return {name: [record[name] for record in records] for name in GoogleSheetsWorker.COLUMNS}
+
+
+@pytest.mark.parametrize("aggregation, layout", [
+    ("python", "columns"),
+    ("pandas", "records"),
+    ("pandas", "columns"),
+])
+def test_aggregation_matches_records_loop(records, aggregation, layout):
+    if aggregation == "pandas":
+        pytest.importorskip("pandas")
+    expected = GoogleSheetsWorker(URL, "", SHEET, None).process_camera_data(records)
+    worker = GoogleSheetsWorker(URL, "", SHEET, None, aggregation=aggregation)
+    data = records if layout == "records" else columns(records)
+    assert normalized(worker.process_camera_data(data)) == normalized(expected)
+
+
+def test_incremental_matches_records_loop(records, tmp_path):
+    worker = GoogleSheetsWorker(URL, "", SHEET, None)
+    sync = IncrementalAggregator(tmp_path, block_rows=256)
+    result = sync.update(URL, SHEET, worker.as_columns(records))
+    assert normalized(result) == normalized(worker.process_camera_data(records))
+
+    changed = [dict(record) for record in records]
+    changed[len(changed) // 2]["Камера"] = "Камера вне каталога 9"
+    result = sync.update(URL, SHEET, worker.as_columns(changed))
+    assert normalized(result) == normalized(worker.process_camera_data(changed))
+
+
+@pytest.fixture(scope="module")
+def report_data(records):
+    return GoogleSheetsWorker(URL, "", SHEET, None).process_camera_data(records)
+
+
+# (параметры render_report, параметры эталона)
+RENDERS = {
+    "openpyxl-stream": ({"streaming": True}, {}),
+    "xlsxwriter": ({"writer": "xlsxwriter"}, {}),
+    "xlsxwriter-stream": ({"writer": "xlsxwriter", "streaming": True}, {}),
+    "template-file": ({"template": "template.xlsx"}, {}),
+    "formulas-xlsxwriter": ({"totals": "formulas", "writer": "xlsxwriter"},
+                            {"totals": "formulas"}),
+}
+
+
+@pytest.mark.parametrize("name", RENDERS)
+def test_report_matches_golden_book(report_data, tmp_path, name):
+    options, golden_options = RENDERS[name]
+    if "template" in options:
+        ExcelReportGenerator.write_template(tmp_path / options["template"])
+        options = {**options, "template": str(tmp_path / options["template"])}
+    golden = render_report(*report_data, output_dir=str(tmp_path / "golden"), **golden_options)
+    path = render_report(*report_data, output_dir=str(tmp_path / name), **options)
+
+    assert workbook_diffs(golden, path) == []
+    summaries = [json.loads(Path(p).with_suffix(ReportSummary.SUFFIX).read_text(encoding="utf-8"))
+                 for p in (golden, path)]
+    assert summaries[0] == summaries[1]
@@ -0,0 +1,146 @@
+"""Столбцы ведомости при широком каталоге: сотни моделей вне HEADERS"""
+import pytest
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+from pipeline import ExcelReportGenerator, ReportTemplate
+
+HEADERS = ExcelReportGenerator.HEADERS
+SPLIT = len(HEADERS) - ReportTemplate.TRAILING_COLUMNS
+CATALOGUE_MODEL = HEADERS[4]
+EXTRA = 300
+
+
+def wide_data(extra=EXTRA, addresses=EXTRA):
+    """Адреса с моделями вне каталога и одной моделью каталога
+
+    Каждая модель вне каталога встречается хотя бы у одного адреса.
+    """
+    extra_models = [f"Камера вне каталога {i:03d}" for i in range(extra)]
+    address_data = {}
+    object_codes = {}
+    for row in range(addresses):
+        address = f"ул. Широкая, {row + 1}"
+        address_data[address] = {
+            extra_models[row % extra]: row % 3 + 1,
+            extra_models[(row + 1) % extra]: 2,
+            CATALOGUE_MODEL: 1,
+        }
+        object_codes[address] = f"O1-{row}"
+    camera_models = sorted({model for counts in address_data.values() for model in counts})
+    return address_data, camera_models, object_codes
+
+
+def generator(tmp_path, writer="openpyxl", totals="values", extra=EXTRA):
+    address_data, camera_models, object_codes = wide_data(extra)
+    return ExcelReportGenerator(address_data, camera_models, object_codes, None,
+                                output_dir=str(tmp_path), writer=writer, totals=totals)
+
+
+def build(tmp_path, **kwargs):
+    report = generator(tmp_path, **kwargs)
+    path = report.save_report(report.create_report())
+    return report, load_workbook(path).active
+
+
+def test_column_layout_shifts_trailing_block(tmp_path):
+    report = generator(tmp_path)
+    headers, model_columns = report.column_layout()
+    extra_models = [model for model in report.camera_models if model not in HEADERS]
+
+    assert len(extra_models) == EXTRA
+    assert headers[:SPLIT] == HEADERS[:SPLIT]
+    assert headers[SPLIT:SPLIT + EXTRA] == extra_models
+    assert headers[SPLIT + EXTRA:] == HEADERS[SPLIT:]
+    assert model_columns[CATALOGUE_MODEL] == HEADERS.index(CATALOGUE_MODEL) + 1
+    for offset, model in enumerate(extra_models, SPLIT + 1):
+        assert model_columns[model] == offset
+    # Коммутаторы и удлинители - не модели камер
+    assert not set(HEADERS[SPLIT:]) & set(model_columns)
+
+
+def test_catalogue_models_only_keep_template_columns():
+    address_data, _, object_codes = wide_data(extra=1)
+    report = ExcelReportGenerator(address_data, [CATALOGUE_MODEL], object_codes, None)
+    headers, _ = report.column_layout()
+    assert headers == HEADERS
+
+
+@pytest.mark.parametrize("writer", ["openpyxl", "xlsxwriter"])
+def test_header_and_merges_follow_extra_columns(tmp_path, writer):
+    report, ws = build(tmp_path, writer=writer)
+    last_col = len(HEADERS) + EXTRA
+    last = get_column_letter(last_col)
+    switch = get_column_letter(SPLIT + EXTRA + 1)
+    extension = get_column_letter(SPLIT + EXTRA + 4)
+    footer_row = 4 + len(report.address_data) + 2
+
+    header = [cell.value for cell in ws[4]]
+    assert header == report.column_layout()[0]
+    assert ws.max_column == last_col
+
+    merges = {str(merged) for merged in ws.merged_cells.ranges}
+    assert {f"A1:{last}1", f"A2:{last}2", "C3:M3",
+            f"{switch}3:{get_column_letter(SPLIT + EXTRA + 3)}3",
+            f"{extension}3:{last}3",
+            f"A{footer_row}:{last}{footer_row}"} == merges
+    assert ws[f"{switch}3"].value == "Коммутаторы"
+    assert ws[f"A{footer_row}"].value.startswith("Подготовил")
+
+
+@pytest.mark.parametrize("writer", ["openpyxl", "xlsxwriter"])
+def test_models_outside_catalogue_get_own_columns(tmp_path, writer):
+    report, ws = build(tmp_path, writer=writer)
+    _, model_columns = report.column_layout()
+    for row, (address, counts) in enumerate(report.address_data.items(), 5):
+        assert ws.cell(row=row, column=2).value == address
+        for model, quantity in counts.items():
+            assert ws.cell(row=row, column=model_columns[model]).value == quantity
+        filled = {col for col in range(3, SPLIT + EXTRA + 1)
+                  if ws.cell(row=row, column=col).value is not None}
+        assert filled == {model_columns[model] for model in counts}
+
+
+@pytest.mark.parametrize("writer", ["openpyxl", "xlsxwriter"])
+def test_totals_per_column(tmp_path, writer):
+    report, ws = build(tmp_path, writer=writer)
+    _, model_columns = report.column_layout()
+    totals_row = 5 + len(report.address_data)
+    expected = {}
+    for counts in report.address_data.values():
+        for model, quantity in counts.items():
+            col = model_columns[model]
+            expected[col] = expected.get(col, 0) + quantity
+
+    assert ws.cell(row=totals_row, column=1).value == "ИТОГО:"
+    for col in range(3, len(HEADERS) + EXTRA + 1):
+        assert ws.cell(row=totals_row, column=col).value == expected.get(col, 0)
+
+
+@pytest.mark.parametrize("writer", ["openpyxl", "xlsxwriter"])
+def test_formula_totals_sum_each_column(tmp_path, writer):
+    report, ws = build(tmp_path, writer=writer, totals="formulas")
+    first_row = 5
+    totals_row = first_row + len(report.address_data)
+    for col in range(3, len(HEADERS) + EXTRA + 1):
+        letter = get_column_letter(col)
+        assert ws.cell(row=totals_row, column=col).value == \
+            f"=SUM({letter}{first_row}:{letter}{totals_row - 1})"
+    assert sum(report.summary.models.values()) == sum(
+        sum(counts.values()) for counts in report.address_data.values())
+
+
+def test_qt_template_keeps_old_qt_look(tmp_path):
+    address_data, camera_models, object_codes = wide_data(extra=2, addresses=4)
+    report = ExcelReportGenerator(address_data, camera_models, object_codes, None,
+                                  output_dir=str(tmp_path), template="qt")
+    ws = load_workbook(report.save_report(report.create_report())).active
+
+    assert ws.column_dimensions["B"].width == 50
+    assert ws.column_dimensions["C"].width == 5
+    assert not ws["C3"].font.b
+    # Как в прежнем окне Qt: у всех ячеек только перенос текста
+    for cell in (ws["A1"], ws["C4"], ws["A5"], ws["B5"], ws["C5"]):
+        assert cell.alignment.wrap_text
+        assert cell.alignment.horizontal is None
+        assert not cell.alignment.textRotation
@@ -0,0 +1,87 @@
+"""Настройки и запуск ведомостей, общие для окон и командной строки"""
+import json
+import time
+
+import pytest
+
+from pipeline import PipelineConfig, ReportJobs, ReportService
+
+HEADER = "Код объекта,Адрес установки,Камера\n"
+
+
+def test_config_reads_environment_and_overrides():
+    config = PipelineConfig({"SHEET_NAME": "Лист2", "SHEETS_CACHE_MAX_MB": "1.5",
+                             "SHEETS_INCREMENTAL": "1", "PIPELINE_METRICS_FILE": "",
+                             "REPORT_STREAM_BY": ""}, template="qt", writer="xlsxwriter")
+    assert config.sheet_name == "Лист2"
+    assert config.cache_max_bytes == int(1.5 * 1024 * 1024)
+    assert config.incremental
+    assert config.metrics_file is None
+    assert config.stream_by is None
+    assert config.template == "qt"
+    assert config.writer == "xlsxwriter"
+    # Шаблон из окружения важнее шаблона окна по умолчанию
+    assert PipelineConfig({"REPORT_TEMPLATE": "my.xlsx"}, template="qt").template == "my.xlsx"
+    with pytest.raises(TypeError):
+        PipelineConfig({}, no_such_setting=1)
+
+
+def test_credentials_are_required_only_for_google_sheets():
+    assert PipelineConfig({}).missing_credentials("")
+    assert not PipelineConfig({"SHEETS_SOURCE": "file"}).missing_credentials("")
+
+
+def make_jobs(tmp_path, messages):
+    config = PipelineConfig({"SHEETS_SOURCE": "file"}, cache_dir=str(tmp_path / "cache"),
+                            output_dir=str(tmp_path / "output"),
+                            metrics_file=str(tmp_path / "metrics.jsonl"))
+    return ReportJobs(ReportService(config, messages.append), messages.append)
+
+
+def wait(job, timeout=30):
+    deadline = time.monotonic() + timeout
+    while job.active and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not job.active
+
+
+def test_report_jobs_run_single_and_batch(tmp_path):
+    first = tmp_path / "Первый.csv"
+    second = tmp_path / "Второй.csv"
+    first.write_text(HEADER + "O1-1,ул. Ленина 1,X\n", encoding="utf-8")
+    second.write_text(HEADER + "O2-1,ул. Мира 1,Y\n", encoding="utf-8")
+    messages = []
+    jobs = make_jobs(tmp_path, messages)
+
+    single = jobs.submit_single(str(first), "Камеры", "", priority="Высокий")
+    wait(single)
+    outcome = jobs.finish(single)
+    assert outcome.status.endswith("Ведомость-1.xlsx") and outcome.error is None
+    assert outcome.summary == (1, 0)
+    assert jobs.finish(single) is None  # итог показывается один раз
+    assert jobs.row(single)[2:] == ("Высокий", "Готово", "100%")
+
+    batch = jobs.submit_batch(f"{first};Камеры\n{second};Камеры", "", "", "")
+    wait(batch)
+    assert jobs.finish(batch).summary_text() == "Создано отчетов: 2"
+    assert sorted(p.name for p in (tmp_path / "output").glob("*.xlsx")) == [
+        "Ведомость-1.xlsx", "Ведомость-2.xlsx"]
+
+    records = [json.loads(line) for line in
+               (tmp_path / "metrics.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [record["mode"] for record in records] == ["single", "batch", "batch"]
+
+
+def test_report_jobs_report_errors(tmp_path):
+    messages = []
+    jobs = make_jobs(tmp_path, messages)
+    assert jobs.submit_single("", "Камеры", "") is None
+    assert "Ошибка: Не заданы все необходимые параметры!" in messages
+
+    job = jobs.submit_single(str(tmp_path / "нет.csv"), "Камеры", "")
+    wait(job)
+    outcome = jobs.finish(job)
+    assert outcome.error.startswith("Камеры: ")
+    assert outcome.summary == (0, 1)
+    record = json.loads((tmp_path / "metrics.jsonl").read_text(encoding="utf-8"))
+    assert record["mode"] == "single" and "error" in record
@@ -0,0 +1,51 @@
+"""Кэш снимков листа: ревизия таблицы, TTL и ревизия, которую не удалось узнать"""
+import time
+
+from pipeline import FileSource, GoogleSheetsWorker, SheetCache
+
+URL = "https://docs.google.com/spreadsheets/d/abc/edit"
+RECORDS = [{"Код объекта": "O1", "Адрес установки": "ул. Ленина, 1", "Камера": "X"}]
+
+
+class NoRevisionSource(FileSource):
+    """Файловый источник, у которого запрос времени изменения падает"""
+
+    def revision(self, spreadsheet_url):
+        raise RuntimeError("Ошибка API таблицы (403): нет доступа к Drive")
+
+
+def test_snapshot_follows_revision(tmp_path):
+    cache = SheetCache(tmp_path)
+    cache.put(URL, "Камеры", "rev-1", RECORDS)
+
+    assert cache.get(URL, "Камеры", "rev-1") == RECORDS
+    assert cache.get(URL, "Камеры", "rev-2") is None
+    assert cache.get(URL, "Другой", "rev-1") is None
+
+
+def test_unknown_revision_uses_short_ttl(tmp_path, monkeypatch):
+    cache = SheetCache(tmp_path, ttl=24 * 60 * 60, unknown_ttl=60)
+    cache.put(URL, "Камеры", "rev-1", RECORDS)
+    now = time.time()
+
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    assert cache.get(URL, "Камеры", None) == RECORDS
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert cache.get(URL, "Камеры", None) is None
+    # С известной ревизией снимок живет обычный TTL
+    assert cache.get(URL, "Камеры", "rev-1") == RECORDS
+
+
+def test_failed_revision_is_logged(tmp_path):
+    sheet = tmp_path / "Камеры.csv"
+    sheet.write_text("Код объекта,Адрес установки,Камера\nO1,ул. Ленина 1,X\n",
+                     encoding="utf-8")
+    messages = []
+    worker = GoogleSheetsWorker(str(sheet), "", "Камеры", None,
+                                cache=SheetCache(tmp_path / "cache", unknown_ttl=600),
+                                source=NoRevisionSource(), log=messages.append)
+
+    worker.get_google_sheets_data()
+    assert worker.revision is None
+    assert any("нет доступа к Drive" in message and "10 мин" in message
+               for message in messages)
@@ -0,0 +1,146 @@
+"""Источники листов: файл данных и HTTP"""
+import csv
+import os
+
+import pytest
+
+from pipeline import (FileSource, GoogleSheetsWorker, HttpSheetsSource, PipelineMetrics,
+                      SheetsStandIn, load_report_data)
+
+COLUMNS = GoogleSheetsWorker.COLUMNS
+
+HEADER = "Код объекта,Адрес установки,Камера\n"
+
+
+def write_sheet(path, rows=3):
+    path.write_text(HEADER + "".join(f"O1-{i},ул. Ленина {i},X\n" for i in range(rows)),
+                    encoding="utf-8")
+    return str(path)
+
+
+def test_file_is_parsed_when_rows_are_read(tmp_path):
+    source = FileSource()
+    worksheet = source.worksheet(write_sheet(tmp_path / "Камеры.csv"), "Лист1")
+    assert not source._books
+
+    # Единственный лист CSV отдается под любым именем
+    assert worksheet.title == "Камеры"
+    assert worksheet.row_count == 4
+    assert len(source._books) == 1
+
+
+def test_missing_file_fails_on_open_and_missing_sheet_on_read(tmp_path):
+    source = FileSource()
+    with pytest.raises(ValueError, match="не найден"):
+        source.worksheet(str(tmp_path / "Нет.csv"), "Камеры")
+
+    path = tmp_path / "Книга.json"
+    path.write_text('{"Камеры": [], "Склад": []}', encoding="utf-8")
+    worksheet = source.worksheet(str(path), "Лист1")
+    with pytest.raises(ValueError, match="нет листа Лист1"):
+        worksheet.get_all_records()
+
+
+def test_parse_is_measured_in_fetch_stage(tmp_path, monkeypatch):
+    sheet = write_sheet(tmp_path / "Камеры.csv")
+    parsed_in = []
+    metrics = PipelineMetrics()
+    load = FileSource.load
+
+    def tracking_load(self, path):
+        parsed_in.append(list(metrics.stages))
+        return load(self, path)
+
+    monkeypatch.setattr(FileSource, "load", tracking_load)
+    load_report_data(sheet, "", "Камеры", metrics=metrics, source=FileSource())
+    # Разбор начался, когда open_by_url уже закончился
+    assert parsed_in and all("open_by_url" in stages for stages in parsed_in)
+
+
+def test_xlsx_json_and_semicolon_csv(tmp_path):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    workbook.active.title = "Камеры"
+    workbook.active.append(["Код объекта", "Адрес установки", "Камера"])
+    workbook.active.append(["O1-1", "ул. Ленина 1", 4])
+    workbook.create_sheet("Склад").append(["Модель"])
+    workbook.save(tmp_path / "Книга.xlsx")
+
+    (tmp_path / "Записи.json").write_text(
+        '[{"Код объекта": "O1-1", "Камера": "X"}, {"Адрес установки": "ул. Ленина 2"}]',
+        encoding="utf-8")
+    (tmp_path / "Реестр.csv").write_text("Код объекта;Камера\nO1-1;X\n", encoding="utf-8")
+
+    source = FileSource()
+    assert source.sheet_names(str(tmp_path / "Книга.xlsx")) == ["Камеры", "Склад"]
+    assert source.worksheet(str(tmp_path / "Книга.xlsx"), "Камеры").get_all_records() == [
+        {"Код объекта": "O1-1", "Адрес установки": "ул. Ленина 1", "Камера": "4"}]
+    assert source.load(str(tmp_path / "Записи.json")) == {"Записи": [
+        ["Код объекта", "Камера", "Адрес установки"], ["O1-1", "X"], ["", "", "ул. Ленина 2"]]}
+    assert source.load(str(tmp_path / "Реестр.csv")) == {
+        "Реестр": [["Код объекта", "Камера"], ["O1-1", "X"]]}
+
+
+def test_changed_file_is_parsed_again(tmp_path):
+    source = FileSource()
+    sheet = write_sheet(tmp_path / "Камеры.csv", rows=2)
+    revision = source.revision(sheet)
+    assert source.worksheet(sheet, "Камеры").row_count == 3
+
+    write_sheet(tmp_path / "Камеры.csv", rows=5)
+    os.utime(sheet, (0, 1))
+    assert source.revision(sheet) != revision
+    assert source.worksheet(sheet, "Камеры").row_count == 6
+
+
+@pytest.fixture
+def grid():
+    return [list(COLUMNS)] + [[f"O{i % 3}-{i}", f"ул. Ленина {i}", "X" if i % 4 else ""]
+                              for i in range(23)]
+
+
+def test_http_source_requests_remaining_pages(grid):
+    with SheetsStandIn({"Камеры": grid, "Склад": [["Модель"]]}, page_rows=5) as standin:
+        source = HttpSheetsSource()
+        assert source.sheet_names(standin.url) == ["Камеры", "Склад"]
+        worksheet = source.worksheet(standin.url, "Камеры")
+        assert worksheet.row_count == 24
+
+        before = standin.requests
+        rows = worksheet.batch_get(["A2:B", "C2:C"])
+        # 23 строки страницами по 5: пять ответов на оба диапазона
+        assert standin.requests - before == 5
+        assert rows[0] == [row[:2] for row in grid[1:]]
+        columns = worksheet.batch_get(["A2:C"], major_dimension="COLUMNS")[0]
+        assert columns == [[row[i] for row in grid[1:]] for i in range(3)]
+        assert worksheet.row_values(24) == grid[23]
+        assert worksheet.get_all_records()[0] == dict(zip(COLUMNS, grid[1]))
+
+
+def test_http_report_matches_file_report(tmp_path, grid, monkeypatch):
+    monkeypatch.setattr(GoogleSheetsWorker, "FETCH_PAGE_ROWS", 7)
+    path = tmp_path / "Камеры.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(grid)
+
+    expected, _ = load_report_data(str(path), "", "Камеры", source=FileSource())
+    with SheetsStandIn({"Камеры": grid}, page_rows=4) as standin:
+        data, context = load_report_data(standin.url, "", "Камеры",
+                                         source=HttpSheetsSource())
+    assert [(address, dict(counts)) for address, counts in data[0].items()] == \
+        [(address, dict(counts)) for address, counts in expected[0].items()]
+    assert data[1:] == expected[1:]
+    assert context["rows"] == 23
+
+
+def test_http_errors_are_reported(grid):
+    with SheetsStandIn({"Камеры": grid}) as standin:
+        source = HttpSheetsSource()
+        with pytest.raises(ValueError, match="нет листа Лист1"):
+            source.worksheet(standin.url, "Лист1")
+        with pytest.raises(RuntimeError, match="Ошибка API таблицы \\(400\\)"):
+            source.request(standin.url, "{api}/v4/spreadsheets/{key}/values:batchGet",
+                           [("ranges", "Нет!A1")])
+    with pytest.raises(ValueError, match="Не удалось определить таблицу"):
+        HttpSheetsSource().endpoint("http://127.0.0.1/не-таблица")
@@ -0,0 +1,53 @@
+"""Группы строк потоковой ведомости"""
+import pytest
+
+from pipeline import AddressGroups, stream
+
+ROWS = [
+    (" O1-1 ", "ул. Ленина 1 ", "X"),
+    ("O1-1", "ул. Ленина 1", "Y"),
+    ("O1-1", "ул. Ленина 1", "X"),
+    ("O1-2", "ул. Ленина 2", ""),            # без модели - пропускается
+    ("O1-2", "ул. Ленина 2", "Z"),
+    ("O2-1", "ул. Гоголя 7", "X"),
+]
+
+
+def test_groups_follow_sheet_order():
+    groups = AddressGroups(ROWS)
+    assert list(groups) == [
+        ({"ул. Ленина 1": {"X": 2, "Y": 1}}, {"ул. Ленина 1": "O1-1"}),
+        ({"ул. Ленина 2": {"Z": 1}}, {"ул. Ленина 2": "O1-2"}),
+        ({"ул. Гоголя 7": {"X": 1}}, {"ул. Гоголя 7": "O2-1"}),
+    ]
+    assert groups.row_count == len(ROWS)
+
+
+def test_group_by_code_joins_addresses_of_object():
+    groups = list(AddressGroups(ROWS, group_by="code"))
+    assert [list(group) for group, _ in groups] == [
+        ["ул. Ленина 1"], ["ул. Ленина 2"], ["ул. Гоголя 7"]]
+
+    rows = [("O1", "ул. Ленина 1", "X"), ("O1", "ул. Ленина 2", "X"),
+            ("O1", "ул. Ленина 1", "Y"), ("O2", "ул. Гоголя 7", "X")]
+    group, codes = next(iter(AddressGroups(rows, group_by="code")))
+    assert group == {"ул. Ленина 1": {"X": 1, "Y": 1}, "ул. Ленина 2": {"X": 1}}
+    assert codes == {"ул. Ленина 1": "O1", "ул. Ленина 2": "O1"}
+
+
+def test_address_after_its_group_is_an_error():
+    rows = ROWS + [("O1-1", " ул. Ленина 1", "X")]
+    with pytest.raises(ValueError, match="Адрес ул. Ленина 1 в строке 8 .* по адресу"):
+        list(AddressGroups(rows))
+
+
+def test_equal_hashes_are_not_mistaken_for_repeats(monkeypatch):
+    # Адреса сравниваются сами: совпадение хэшей разных адресов не ошибка
+    monkeypatch.setattr(stream, "hash", lambda value: 0, raising=False)
+    assert [list(group) for group, _ in AddressGroups(ROWS)] == [
+        ["ул. Ленина 1"], ["ул. Ленина 2"], ["ул. Гоголя 7"]]
+
+
+def test_unknown_order():
+    with pytest.raises(ValueError, match="Неизвестный порядок"):
+        AddressGroups(ROWS, group_by="model")
@@ -0,0 +1,63 @@
+"""Способы записи ведомости: книги xlsxwriter и потоковой записи совпадают с openpyxl
+
+Эталон - обычная книга openpyxl. В данных есть модель вне каталога -
+проверяется и сдвиг столбцов коммутаторов.
+"""
+import random
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.styles import Font
+
+from pipeline import ExcelReportGenerator
+from workbooks import merges, workbook_diffs
+
+EXTRA_MODEL = "Камера вне каталога"
+MODELS = ExcelReportGenerator.HEADERS[2:16] + [EXTRA_MODEL]
+ADDRESSES = 300
+
+
+def make_address_data(addresses, models):
+    rnd = random.Random(addresses)
+    address_data = {}
+    object_codes = {}
+    for i in range(addresses):
+        address = f"г. Брест, ул. Тестовая, д. {i}"
+        address_data[address] = {
+            model: rnd.randint(1, 4) for model in rnd.sample(models, 3)}
+        object_codes[address] = f"O{i % 9 + 1}-{i}"
+    return address_data, object_codes
+
+
+def write_report(path, writer, streaming, totals):
+    address_data, object_codes = make_address_data(ADDRESSES, MODELS)
+    generator = ExcelReportGenerator(address_data, MODELS, object_codes, None,
+                                     streaming=streaming, writer=writer, totals=totals)
+    generator.create_report().save(path)
+    return path
+
+
+@pytest.mark.parametrize("totals", ["values", "formulas"])
+@pytest.mark.parametrize("writer, streaming", [
+    ("openpyxl", True),
+    ("xlsxwriter", False),
+    ("xlsxwriter", True),
+])
+def test_workbook_matches_openpyxl(tmp_path, writer, streaming, totals):
+    golden = write_report(tmp_path / "golden.xlsx", "openpyxl", False, totals)
+    other = write_report(tmp_path / "other.xlsx", writer, streaming, totals)
+
+    assert merges(load_workbook(golden).active)
+    assert workbook_diffs(golden, other) == []
+
+
+def test_comparison_sees_style_difference(tmp_path):
+    golden = write_report(tmp_path / "golden.xlsx", "openpyxl", False, "values")
+    workbook = load_workbook(golden)
+    workbook.active["B10"].font = Font(size=30)
+    workbook.active.unmerge_cells(sorted(merges(workbook.active))[0])
+    workbook.save(tmp_path / "other.xlsx")
+
+    diffs = workbook_diffs(golden, tmp_path / "other.xlsx", limit=1000)
+    assert any(diff.startswith("объединения") for diff in diffs)
+    assert any(diff.startswith("B10:") for diff in diffs)
@@ -0,0 +1,65 @@
+"""Сравнение книг ведомости, записанных разными способами
+
+Книги читаются openpyxl и сравниваются поячеечно: значения и формулы,
+объединения, оформление (шрифт, границы, заливка, выравнивание
+и поворот, формат чисел), ширина столбцов и высота строк.
+"""
+from openpyxl import load_workbook
+
+
+def cell_signature(cell):
+    """Значение и оформление ячейки в виде, не зависящем от способа записи"""
+    font, border, alignment = cell.font, cell.border, cell.alignment
+    return (
+        cell.value,
+        bool(font.b), bool(font.i), float(font.sz or 11),
+        tuple(getattr(border, side).style for side in ("left", "right", "top", "bottom")),
+        cell.fill.fill_type,
+        cell.number_format,
+        alignment.horizontal, alignment.vertical, bool(alignment.wrap_text),
+        int(alignment.textRotation or 0),
+    )
+
+
+def column_widths(ws):
+    widths = {}
+    for dimension in ws.column_dimensions.values():
+        if dimension.customWidth:
+            for col in range(dimension.min, dimension.max + 1):
+                widths[col] = round(dimension.width, 4)
+    return widths
+
+
+def row_heights(ws):
+    return {row: dimension.height for row, dimension in ws.row_dimensions.items()
+            if dimension.height}
+
+
+def merges(ws):
+    return {str(cell_range) for cell_range in ws.merged_cells.ranges}
+
+
+def workbook_diffs(golden_path, path, limit=10):
+    """Первые limit отличий книги path от эталонной golden_path"""
+    golden = load_workbook(golden_path).active
+    other = load_workbook(path).active
+    diffs = []
+    if golden.title != other.title:
+        diffs.append(f"лист: {golden.title!r} != {other.title!r}")
+    if golden.dimensions != other.dimensions:
+        diffs.append(f"размер: {golden.dimensions} != {other.dimensions}")
+    if merges(golden) != merges(other):
+        diffs.append(f"объединения: {sorted(merges(golden) ^ merges(other))}")
+    if column_widths(golden) != column_widths(other):
+        diffs.append(f"ширина столбцов: {column_widths(golden)} != {column_widths(other)}")
+    if row_heights(golden) != row_heights(other):
+        diffs.append(f"высота строк: {row_heights(golden)} != {row_heights(other)}")
+
+    for golden_row, other_row in zip(golden.iter_rows(), other.iter_rows()):
+        for golden_cell, other_cell in zip(golden_row, other_row):
+            expected, actual = cell_signature(golden_cell), cell_signature(other_cell)
+            if expected != actual:
+                diffs.append(f"{golden_cell.coordinate}: {expected} != {actual}")
+                if len(diffs) >= limit:
+                    return diffs
+    return diffs